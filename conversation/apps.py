@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ConversationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'conversation'
\ No newline at end of file
+    name = 'conversation'
+
+    def ready(self):
+        import conversation.signals  # noqa: F401
@@ -0,0 +1,23 @@
+from django.db.models import Case, F, Q, Sum, When
+from django.utils.functional import SimpleLazyObject
+
+from .models import Conversation
+
+
+def unread_messages(request):
+    """Adds ``inbox_unread``: total unread messages for the navbar badge.
+
+    Evaluated lazily, and with a single aggregate over the denormalized
+    counters, so pages that never render the badge pay nothing.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'inbox_unread': 0}
+
+    def count():
+        total = Conversation.objects.filter(
+            Q(buyer=user, buyer_unread__gt=0) | Q(seller=user, seller_unread__gt=0)
+        ).aggregate(total=Sum(Case(When(buyer=user, then=F('buyer_unread')), default=F('seller_unread'))))['total']
+        return total or 0
+
+    return {'inbox_unread': SimpleLazyObject(count)}
@@ -0,0 +1,161 @@
+"""Push delivery of new messages to open conversation threads.
+
+New messages are published to a per-conversation channel once their
+transaction commits (see ``conversation.signals``), and the
+``conversation:stream`` view relays them to the browser as Server-Sent
+Events. Each open chat is one idle asyncio task waiting on a queue, so
+this must be served by the ASGI app (``core.asgi``), e.g.
+``uvicorn core.asgi:application``.
+
+The pub/sub broker is pluggable through ``CONVERSATION_EVENTS['BROKER']``:
+
+- ``InProcessBroker`` (default) fans events out inside one process. Fine
+  for a single ASGI worker or for development.
+- ``RedisBroker`` relays events between processes through Redis pub/sub
+  (needs the optional ``redis`` package), with one Redis connection per
+  process rather than one per open chat.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+QUEUE_SIZE = 100
+
+
+def channel_name(conversation_id):
+    return f'conversation.{conversation_id}'
+
+
+def message_event(message):
+    """JSON-serializable payload for a Message (its sender must be loaded or cheap to load)."""
+    return {
+        'id': message.pk,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'body': message.body,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+class Subscription:
+    """A subscriber's bounded event queue, bound to the event loop that created it."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        # Set when events were dropped; the reader should resync from the database
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans events out to subscribers in this process. ``publish`` is safe from any thread."""
+
+    def __init__(self, **options):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The subscriber's event loop is gone
+                self.unsubscribe(subscription)
+
+    async def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class RedisBroker(InProcessBroker):
+    """Publishes through Redis; one pattern subscription per process feeds local subscribers."""
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='livelens:', **options):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisBroker requires the "redis" package.') from exc
+        super().__init__(**options)
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis
+        self._publisher = redis.Redis.from_url(url)
+        self._readers = {}
+
+    def publish(self, channel, event):
+        self._publisher.publish(self.prefix + channel, json.dumps(event))
+
+    async def subscribe(self, channel):
+        loop = asyncio.get_running_loop()
+        reader = self._readers.get(loop)
+        if reader is None or reader.done():
+            self._readers[loop] = loop.create_task(self._read())
+        return await super().subscribe(channel)
+
+    async def _read(self):
+        client = self._redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(self.prefix + '*')
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                self._deliver(channel[len(self.prefix):], json.loads(message['data']))
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    """Returns the configured broker (created once per process)."""
+    global _broker
+    if _broker is None:
+        options = dict(getattr(settings, 'CONVERSATION_EVENTS', {}))
+        broker_class = import_string(options.pop('BROKER', 'conversation.events.InProcessBroker'))
+        _broker = broker_class(**options.get('OPTIONS', {}))
+    return _broker
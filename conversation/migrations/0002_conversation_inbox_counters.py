@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('conversation', 'Conversation')
+    Message = apps.get_model('conversation', 'Message')
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id').values('id')[:1]
+    Conversation.objects.update(last_message=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='buyer_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='conversation.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='seller_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
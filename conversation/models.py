@@ -10,6 +10,11 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized inbox state, maintained by conversation.signals and the detail view
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    buyer_unread = models.PositiveIntegerField(default=0)
+    seller_unread = models.PositiveIntegerField(default=0)
+
     class Meta:
         # One conversation per buyer-seller-item combo
         unique_together = ('item', 'seller', 'buyer')
@@ -18,6 +23,13 @@ class Conversation(models.Model):
     def __str__(self):
         return f"{self.buyer.username} ↔ {self.seller.username} about {self.item.title}"
 
+    def unread_field(self, user_id):
+        """Name of the unread counter belonging to the given participant."""
+        return 'buyer_unread' if user_id == self.buyer_id else 'seller_unread'
+
+    def unread_for(self, user):
+        return getattr(self, self.unread_field(user.pk))
+
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
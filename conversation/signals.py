@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .events import channel_name, get_broker, message_event
+from .models import Conversation, Message
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_message(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    conversation = instance.conversation
+    # The recipient gets one more unread message; also bumps the thread to the top of the inbox
+    recipient_field = 'seller_unread' if instance.sender_id == conversation.buyer_id else 'buyer_unread'
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message=instance,
+        updated_at=instance.created_at,
+        **{recipient_field: F(recipient_field) + 1},
+    )
+
+    # Push to open threads once the message is actually visible to readers
+    event = message_event(instance)
+    transaction.on_commit(lambda: get_broker().publish(channel_name(conversation.pk), event))
+
+
+@receiver(post_delete, sender=Message)
+def repoint_last_message(sender, instance, **kwargs):
+    latest = Message.objects.filter(conversation_id=instance.conversation_id).order_by('-created_at', '-id').first()
+    Conversation.objects.filter(pk=instance.conversation_id, last_message__isnull=True).update(last_message=latest)
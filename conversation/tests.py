@@ -0,0 +1,252 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import Category, Item
+from . import events
+from .events import QUEUE_SIZE, InProcessBroker, RedisBroker, get_broker
+from .models import Conversation, Message
+
+User = get_user_model()
+
+
+class ConversationTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='password123')
+        cls.buyer = User.objects.create_user(username='buyer', password='password123')
+        cls.category = Category.objects.create(name='Books', slug='books')
+
+    @classmethod
+    def make_conversation(cls, title, buyer=None, messages=0):
+        item = Item.objects.create(
+            seller=cls.seller, category=cls.category, title=title, description='For sale', price=Decimal(10),
+        )
+        conversation = Conversation.objects.create(item=item, seller=cls.seller, buyer=buyer or cls.buyer)
+        for i in range(messages):
+            sender = conversation.buyer if i % 2 == 0 else cls.seller
+            Message.objects.create(conversation=conversation, sender=sender, body=f'Message {i}')
+        return conversation
+
+
+class UnreadCounterTests(ConversationTestMixin, TestCase):
+
+    def setUp(self):
+        self.conversation = self.make_conversation('Atlas')
+
+    def refreshed(self):
+        self.conversation.refresh_from_db()
+        return self.conversation
+
+    def test_send_counts_for_the_recipient_and_sets_last_message(self):
+        first = Message.objects.create(conversation=self.conversation, sender=self.buyer, body='Still available?')
+        second = Message.objects.create(conversation=self.conversation, sender=self.buyer, body='Hello?')
+        conversation = self.refreshed()
+        self.assertEqual((conversation.seller_unread, conversation.buyer_unread), (2, 0))
+        self.assertEqual(conversation.last_message_id, second.pk)
+        self.assertGreater(second.pk, first.pk)
+
+        reply = Message.objects.create(conversation=self.conversation, sender=self.seller, body='Yes')
+        conversation = self.refreshed()
+        self.assertEqual((conversation.seller_unread, conversation.buyer_unread), (2, 1))
+        self.assertEqual(conversation.last_message_id, reply.pk)
+
+    def test_opening_the_thread_clears_only_the_readers_counter(self):
+        Message.objects.create(conversation=self.conversation, sender=self.buyer, body='Still available?')
+        Message.objects.create(conversation=self.conversation, sender=self.seller, body='Yes')
+
+        self.client.force_login(self.seller)
+        self.client.get(reverse('conversation:detail', args=[self.conversation.pk]))
+        conversation = self.refreshed()
+        self.assertEqual((conversation.seller_unread, conversation.buyer_unread), (0, 1))
+
+        # Already read: opening it again writes nothing
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('conversation:detail', args=[self.conversation.pk]))
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+
+    def test_reply_from_the_thread_counts_for_the_other_side(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post(reverse('conversation:detail', args=[self.conversation.pk]), {'body': 'Offer: 8'})
+        self.assertRedirects(response, reverse('conversation:detail', args=[self.conversation.pk]))
+        conversation = self.refreshed()
+        self.assertEqual((conversation.seller_unread, conversation.buyer_unread), (1, 0))
+        self.assertEqual(conversation.last_message.body, 'Offer: 8')
+
+    def test_deleting_the_last_message_repoints_to_the_previous_one(self):
+        first = Message.objects.create(conversation=self.conversation, sender=self.buyer, body='Still available?')
+        second = Message.objects.create(conversation=self.conversation, sender=self.seller, body='Yes')
+        second.delete()
+        self.assertEqual(self.refreshed().last_message_id, first.pk)
+
+    def test_navbar_badge_sums_the_users_counters(self):
+        other = self.make_conversation('Globe')
+        Message.objects.create(conversation=self.conversation, sender=self.buyer, body='One')
+        Message.objects.create(conversation=other, sender=self.buyer, body='Two')
+        Message.objects.create(conversation=other, sender=self.buyer, body='Three')
+
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('conversation:inbox'))
+        self.assertEqual(response.context['inbox_unread'], 3)
+        self.assertEqual(
+            {convo.pk: convo.unread for convo in response.context['conversations']},
+            {self.conversation.pk: 1, other.pk: 2},
+        )
+
+
+class ConversationQueryCountTests(ConversationTestMixin, TestCase):
+
+    def get(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_inbox_query_count_does_not_grow_with_conversations(self):
+        buyers = [User.objects.create_user(username=f'buyer-{i}', password='password123') for i in range(6)]
+        self.make_conversation('First', buyer=buyers[0], messages=2)
+        few = self.get(self.seller, reverse('conversation:inbox'))
+        for i, buyer in enumerate(buyers[1:], start=1):
+            self.make_conversation(f'Item {i}', buyer=buyer, messages=2)
+        self.assertEqual(self.get(self.seller, reverse('conversation:inbox')), few)
+
+    def test_thread_query_count_does_not_grow_with_messages(self):
+        short = self.make_conversation('Short', messages=2)
+        long = self.make_conversation('Long', messages=20)
+        # Open each once so the unread counters are already cleared when measured
+        for conversation in (short, long):
+            self.get(self.buyer, reverse('conversation:detail', args=[conversation.pk]))
+        self.assertEqual(
+            self.get(self.buyer, reverse('conversation:detail', args=[long.pk])),
+            self.get(self.buyer, reverse('conversation:detail', args=[short.pk])),
+        )
+
+
+class InProcessBrokerTests(SimpleTestCase):
+
+    async def test_publish_reaches_subscribers_of_that_channel_only(self):
+        broker = InProcessBroker()
+        first = await broker.subscribe('conversation.1')
+        other = await broker.subscribe('conversation.2')
+        # Publishers are request threads, not the subscriber's event loop
+        thread = threading.Thread(target=broker.publish, args=('conversation.1', {'id': 7}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await first.get(timeout=1), {'id': 7})
+        self.assertIsNone(await other.get(timeout=0.01))
+
+        await first.close()
+        await other.close()
+        self.assertEqual(broker._subscribers, {})
+
+    async def test_full_queue_flags_the_subscription(self):
+        broker = InProcessBroker()
+        subscription = await broker.subscribe('conversation.1')
+        for i in range(QUEUE_SIZE + 1):
+            broker.publish('conversation.1', {'id': i})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.queue.qsize(), QUEUE_SIZE)
+        await subscription.close()
+
+
+class RedisBrokerTests(SimpleTestCase):
+
+    def test_missing_package_is_a_configuration_error(self):
+        with mock.patch.dict(sys.modules, {'redis': None, 'redis.asyncio': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                RedisBroker()
+
+    @unittest.skipUnless(os.environ.get('REDIS_URL'), 'set REDIS_URL to test against a Redis server')
+    async def test_publish_round_trips_through_redis(self):
+        broker = RedisBroker(url=os.environ['REDIS_URL'], prefix='livelens-test:')
+        subscription = await broker.subscribe('conversation.1')
+        try:
+            # The pattern subscription is set up by a background task
+            for _ in range(50):
+                await sync_to_async(broker.publish)('conversation.1', {'id': 7})
+                event = await subscription.get(timeout=0.1)
+                if event is not None:
+                    break
+            self.assertEqual(event, {'id': 7})
+        finally:
+            await subscription.close()
+            for reader in broker._readers.values():
+                reader.cancel()
+
+
+@override_settings(CONVERSATION_EVENTS={
+    'BROKER': 'conversation.events.InProcessBroker', 'HEARTBEAT': 1, 'MAX_DURATION': 5,
+})
+class MessageStreamTests(ConversationTestMixin, TestCase):
+
+    def setUp(self):
+        # Each test gets a broker built from its own settings
+        events._broker = None
+        self.addCleanup(setattr, events, '_broker', None)
+        self.conversation = self.make_conversation('Atlas', messages=1)
+        self.url = reverse('conversation:stream', args=[self.conversation.pk])
+
+    def send(self, body):
+        # The signal publishes once the message's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(conversation=self.conversation, sender=self.seller, body=body)
+
+    async def next_frame(self, stream):
+        return (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+
+    async def test_stream_sends_backlog_then_published_messages(self):
+        await self.async_client.aforce_login(self.buyer)
+        response = await self.async_client.get(self.url, {'after': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await self.next_frame(stream)).startswith('retry:'))
+            backlog = await self.next_frame(stream)
+            self.assertIn('"body": "Message 0"', backlog)
+
+            message = await sync_to_async(self.send)('Yes, still available')
+            frame = await self.next_frame(stream)
+            self.assertTrue(frame.startswith(f'id: {message.pk}\nevent: message\n'))
+            self.assertIn('"body": "Yes, still available"', frame)
+            self.assertIn('"sender": "seller"', frame)
+        finally:
+            await stream.aclose()
+
+    async def test_reconnect_resumes_after_last_event_id(self):
+        latest = await sync_to_async(self.send)('Second')
+        await self.async_client.aforce_login(self.buyer)
+        response = await self.async_client.get(self.url, headers={'Last-Event-ID': str(latest.pk - 1)})
+        stream = aiter(response.streaming_content)
+        try:
+            await self.next_frame(stream)
+            self.assertTrue((await self.next_frame(stream)).startswith(f'id: {latest.pk}\n'))
+            self.assertEqual(await self.next_frame(stream), ': keep-alive\n\n')
+        finally:
+            await stream.aclose()
+
+    async def test_stream_rejects_non_participants(self):
+        outsider = await User.objects.acreate_user(username='outsider', password='password123')
+        await self.async_client.aforce_login(outsider)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(get_broker()._subscribers, {})
+
+        await self.async_client.alogout()
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 302)
@@ -6,5 +6,6 @@ app_name = 'conversation'
 urlpatterns = [
     path('', views.inbox, name='inbox'),
     path('<int:pk>/', views.conversation_detail, name='detail'),
+    path('<int:pk>/stream/', views.conversation_stream, name='stream'),
     path('new/<int:item_pk>/', views.new_conversation, name='new'),
 ]
\ No newline at end of file
@@ -1,8 +1,15 @@
+import json
+import time
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
 
 from market.models import Item
+from market.pagination import CursorPaginator
+from .events import channel_name, get_broker, message_event
 from .models import Conversation, Message
 from .forms import MessageForm
 
@@ -12,10 +19,16 @@ def inbox(request):
     """Shows all conversations for the logged-in user (as buyer or seller)."""
     conversations = Conversation.objects.filter(
         Q(buyer=request.user) | Q(seller=request.user)
-    ).select_related('item', 'buyer', 'seller').order_by('-updated_at')
+    ).select_related('item', 'buyer', 'seller', 'last_message__sender')
+
+    paginator = CursorPaginator(conversations, ('-updated_at', '-id'), 20)
+    page_obj = paginator.page(request.GET.get('cursor'))
+    for convo in page_obj:
+        convo.unread = convo.unread_for(request.user)
 
     return render(request, 'conversation/inbox.html', {
-        'conversations': conversations,
+        'conversations': page_obj,
+        'page_obj': page_obj,
     })
 
 
@@ -32,6 +45,11 @@ def conversation_detail(request, pk):
 
     form = MessageForm()
 
+    # Opening the thread marks it read for this participant (no write if already read)
+    unread_field = conversation.unread_field(request.user.pk)
+    if getattr(conversation, unread_field):
+        Conversation.objects.filter(pk=conversation.pk).update(**{unread_field: 0})
+
     if request.method == 'POST':
         form = MessageForm(request.POST)
         if form.is_valid():
@@ -40,17 +58,80 @@ def conversation_detail(request, pk):
                 sender=request.user,
                 body=form.cleaned_data['body']
             )
-            # Bump updated_at so it appears at top of inbox
-            conversation.save()
+            # conversation.signals bumps updated_at so it appears at top of inbox
             return redirect('conversation:detail', pk=pk)
 
+    thread = list(conversation.messages.select_related('sender'))
     return render(request, 'conversation/detail.html', {
         'conversation': conversation,
         'form': form,
-        'messages': conversation.messages.all(),
+        'messages': thread,
+        'last_message_id': thread[-1].pk if thread else 0,
     })
 
 
+def _sse(event):
+    return f"id: {event['id']}\nevent: message\ndata: {json.dumps(event)}\n\n"
+
+
+async def _message_stream(conversation_id, last_id):
+    """Yields SSE frames for messages newer than ``last_id``: backlog first, then live."""
+    options = getattr(settings, 'CONVERSATION_EVENTS', {})
+    heartbeat = options.get('HEARTBEAT', 15)
+    deadline = time.monotonic() + options.get('MAX_DURATION', 600)
+
+    async def backlog(after):
+        messages = Message.objects.filter(conversation_id=conversation_id, pk__gt=after).select_related('sender')
+        return [message_event(m) async for m in messages.order_by('pk').aiterator()]
+
+    # Subscribe before reading the backlog so nothing slips in between
+    subscription = await get_broker().subscribe(channel_name(conversation_id))
+    try:
+        yield f"retry: {heartbeat * 1000}\n\n"
+        for event in await backlog(last_id):
+            last_id = event['id']
+            yield _sse(event)
+
+        while time.monotonic() < deadline:
+            event = await subscription.get(timeout=heartbeat)
+            if subscription.overflowed:
+                # Events were dropped for this slow reader: resync from the database
+                subscription.overflowed = False
+                for missed in await backlog(last_id):
+                    last_id = missed['id']
+                    yield _sse(missed)
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif event['id'] > last_id:
+                last_id = event['id']
+                yield _sse(event)
+        # The browser's EventSource reconnects with Last-Event-ID, recycling long-lived streams
+    finally:
+        await subscription.close()
+
+
+@login_required
+async def conversation_stream(request, pk):
+    """Server-Sent Events stream of new messages in a conversation (serve via ASGI)."""
+    user = await request.auser()
+    conversation = await Conversation.objects.filter(
+        Q(buyer=user) | Q(seller=user), pk=pk
+    ).only('pk').afirst()
+    if conversation is None:
+        raise Http404
+
+    # EventSource sends Last-Event-ID on reconnect; first connections pass ?after=<id>
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('after') or 0)
+    except ValueError:
+        last_id = 0
+
+    response = StreamingHttpResponse(_message_stream(conversation.pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def new_conversation(request, item_pk):
     """Starts a new conversation OR redirects to existing one."""
@@ -75,7 +156,6 @@ def new_conversation(request, item_pk):
                 sender=request.user,
                 body=form.cleaned_data['body']
             )
-            conversation.save()
             return redirect('conversation:detail', pk=conversation.pk)
     else:
         form = MessageForm()
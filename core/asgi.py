@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Async views such as the conversation event stream (``conversation:stream``)
+only scale when served from here, e.g. ``uvicorn core.asgi:application``;
+under WSGI each open stream would hold a worker thread. The same goes for
+the async catalog API under ``/api/async/items/`` (see market.views).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,33 @@
+"""Version numbers kept in the cache for invalidating derived entries.
+
+The category catalog, item cards, facet counts and role lookups key their
+cached data on a shared version number that committed changes bump. The
+number lives in the cache itself, so it can be evicted like any other
+entry. A counter that restarted at 1 would then come back to numbers that
+old entries are still stored under, and serve them as current.
+
+A missing version is therefore seeded from the clock in microseconds, and
+bumps add one. A reseeded version is larger than any number handed out
+before unless the old one was bumped more than a million times a second.
+"""
+import time
+
+
+def _seed():
+    return time.time_ns() // 1000
+
+
+def current_version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), None)
+        version = cache.get(key)
+    # A cache that keeps nothing (DummyCache) gets a fresh version every time
+    return _seed() if version is None else version
+
+
+def bump_version(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _seed(), None)
@@ -0,0 +1,229 @@
+"""Per-request query and timing instrumentation.
+
+``RequestMetricsMiddleware`` measures, for a sample of requests, the number
+of SQL queries, time spent in the database, time spent rendering
+templates, and total wall time. It then:
+
+- adds a ``Server-Timing`` header, which browser dev tools show per request;
+- accumulates totals per resolved URL name (see ``get_url_stats``);
+- logs requests over the query or latency budget on the ``core.metrics``
+  logger. With ``RECORD_STATEMENTS`` on, the warning also lists SQL
+  statements that ran more than once (the usual N+1 signature).
+
+Configure with the ``REQUEST_METRICS`` setting. By default one request in
+a hundred is sampled and statements are not recorded; unsampled requests
+only pay for one ``random()`` call. Raise ``SAMPLE_RATE`` and turn on
+``RECORD_STATEMENTS`` while chasing a slow page.
+
+Template time is measured by wrapping the Django template backend's
+``render``; the wrapper is installed when the middleware is first
+created, so processes that do not use the middleware are left alone.
+
+Other code can attach its own counters to the current request with
+``current_metrics().incr(name)``; they are reported in ``Server-Timing``.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger('core.metrics')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.01,
+    'QUERY_BUDGET': 50,
+    'TIME_BUDGET_MS': 500,
+    'LOG_OVER_BUDGET': True,
+    'RECORD_STATEMENTS': False,
+    'SERVER_TIMING': True,
+}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'template_time', 'statements', 'counters', '_template_depth')
+
+    def __init__(self, record_statements=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter() if record_statements else None
+        self.counters = {}
+        self._template_depth = 0
+
+    def incr(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def duplicates(self, min_count=2):
+        if not self.statements:
+            return []
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= min_count]
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, or None when it is not sampled."""
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+        if metrics.statements is not None:
+            metrics.statements[sql] += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed once per connection object so it also covers threads used by
+    # sync_to_async; it is a no-op outside sampled requests.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+_original_template_render = DjangoTemplate.render
+
+
+def _timed_template_render(self, context=None, request=None):
+    metrics = _current.get()
+    if metrics is None:
+        return _original_template_render(self, context, request)
+    metrics._template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_template_render(self, context, request)
+    finally:
+        metrics._template_depth -= 1
+        if metrics._template_depth == 0:
+            metrics.template_time += time.perf_counter() - start
+
+
+def install_template_timer():
+    if DjangoTemplate.render is not _timed_template_render:
+        DjangoTemplate.render = _timed_template_render
+
+
+_url_stats = {}
+_url_stats_lock = threading.Lock()
+
+
+def _record_url_stats(url_name, metrics, total):
+    with _url_stats_lock:
+        stats = _url_stats.get(url_name)
+        if stats is None:
+            stats = _url_stats[url_name] = {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'db_ms': 0.0, 'template_ms': 0.0, 'total_ms': 0.0, 'max_total_ms': 0.0,
+            }
+        stats['requests'] += 1
+        stats['queries'] += metrics.queries
+        stats['max_queries'] = max(stats['max_queries'], metrics.queries)
+        stats['db_ms'] += metrics.db_time * 1000
+        stats['template_ms'] += metrics.template_time * 1000
+        stats['total_ms'] += total * 1000
+        stats['max_total_ms'] = max(stats['max_total_ms'], total * 1000)
+
+
+def get_url_stats():
+    """Snapshot of per-URL-name totals accumulated by this process."""
+    with _url_stats_lock:
+        return {name: dict(stats) for name, stats in _url_stats.items()}
+
+
+def reset_url_stats():
+    with _url_stats_lock:
+        _url_stats.clear()
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened before this module was imported missed the signal
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+        install_template_timer()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self):
+        options = metrics_settings()
+        if not options['ENABLED'] or random.random() >= options['SAMPLE_RATE']:
+            return None, None, options
+        metrics = RequestMetrics(record_statements=options['LOG_OVER_BUDGET'] and options['RECORD_STATEMENTS'])
+        return metrics, _current.set(metrics), options
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token, options = self._start()
+        if metrics is None:
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, metrics, time.perf_counter() - start, options)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token, options = self._start()
+        if metrics is None:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, metrics, time.perf_counter() - start, options)
+        return response
+
+    def _finish(self, request, response, metrics, total, options):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else 'unresolved'
+        _record_url_stats(url_name, metrics, total)
+
+        if options['SERVER_TIMING']:
+            parts = [
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ]
+            parts += [f'{name};desc="{value}"' for name, value in sorted(metrics.counters.items())]
+            response['Server-Timing'] = ', '.join(parts)
+
+        over_queries = metrics.queries > options['QUERY_BUDGET']
+        over_time = total * 1000 > options['TIME_BUDGET_MS']
+        if options['LOG_OVER_BUDGET'] and (over_queries or over_time):
+            duplicates = metrics.duplicates()
+            logger.warning(
+                '%s %s [%s] over budget: %d queries, db %.1fms, templates %.1fms, total %.1fms%s',
+                request.method, request.path, url_name, metrics.queries,
+                metrics.db_time * 1000, metrics.template_time * 1000, total * 1000,
+                ''.join(f'\n  {n}x {sql}' for sql, n in duplicates[:10]),
+            )
@@ -0,0 +1,199 @@
+"""Primary/replica database routing.
+
+Writes always go to the primary (``default``). Reads go to a read replica
+only inside a request that ``ReplicaRoutingMiddleware`` marked as
+read-only; everything else (management commands, the ``market.tasks``
+worker threads, shell sessions) keeps reading from the primary, where
+its own writes are visible.
+
+A request reads from the primary when:
+
+- its method is not GET/HEAD/OPTIONS, so form posts see their own writes;
+- it already wrote (the router saw a ``db_for_write``), or the primary has
+  an open transaction;
+- it carries the pin cookie, which the middleware sets for
+  ``PIN_SECONDS`` after any request that wrote. Replication lag then
+  cannot hide a user's wishlist click or new listing from the next page.
+
+Some reads always use the primary, even in read-only requests:
+
+- models in ``PRIMARY_MODELS`` (default: sessions and the user model). A
+  session or user row that has not replicated yet would log the user out;
+- reads inside ``read_from_primary()``. Code that rebuilds a shared cache
+  entry after a version bump uses it, or a lagging replica would store old
+  rows under the new version until the next bump.
+
+Each read-only request sticks to one randomly chosen replica. Configure
+aliases, primary-only models and the pin with ``DATABASE_ROUTING``;
+replica aliases are ordinary ``DATABASES`` entries.
+"""
+import contextlib
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULTS = {
+    'REPLICAS': [],
+    'PIN_SECONDS': 10,
+    'PIN_COOKIE': 'db_pin',
+    # ``app_label.ModelName`` labels; None means sessions and AUTH_USER_MODEL
+    'PRIMARY_MODELS': None,
+}
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def routing_settings():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_ROUTING', {})}
+
+
+class RoutingState:
+    """Per-request routing decision: the replica to read from (None = primary) and whether it wrote."""
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+def current_routing():
+    return _state.get()
+
+
+@contextlib.contextmanager
+def read_from_primary():
+    """Routes the reads inside the block to the primary; a no-op outside replica requests."""
+    state = _state.get()
+    if state is None or state.replica is None:
+        yield
+        return
+    inner = RoutingState()
+    token = _state.set(inner)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        state.wrote = state.wrote or inner.wrote
+
+
+class PrimaryReplicaRouter:
+    """Sends writes to ``primary`` and reads in read-only requests to one of ``replicas``."""
+
+    def __init__(self, primary=DEFAULT_DB_ALIAS, replicas=None):
+        options = routing_settings()
+        self.primary = primary
+        self.replicas = list(options['REPLICAS'] if replicas is None else replicas)
+        labels = options['PRIMARY_MODELS']
+        if labels is None:
+            labels = ['sessions.Session', settings.AUTH_USER_MODEL]
+        self.primary_models = {label.lower() for label in labels}
+
+    def choose_replica(self):
+        return random.choice(self.replicas) if self.replicas else None
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or state.wrote:
+            return self.primary
+        if model._meta.label_lower in self.primary_models:
+            return self.primary
+        if connections[self.primary].in_atomic_block:
+            return self.primary
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {self.primary, *self.replicas}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication
+        if db in self.replicas:
+            return False
+        return None
+
+
+def _router():
+    from django.db import router
+
+    for candidate in router.routers:
+        if isinstance(candidate, PrimaryReplicaRouter):
+            return candidate
+    return None
+
+
+def _routed_chunks(content, state):
+    # Streaming bodies are consumed after the middleware returned; route each chunk's reads
+    iterator = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware:
+    """Marks read-only requests for replica reads and pins writers to the primary."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        options = routing_settings()
+        router = _router()
+        replica = None
+        if (
+            router is not None
+            and request.method in READ_ONLY_METHODS
+            and options['PIN_COOKIE'] not in request.COOKIES
+        ):
+            replica = router.choose_replica()
+        state = RoutingState(replica)
+        return state, _state.set(state), options
+
+    def _finish(self, response, state, options):
+        if state.wrote:
+            response.set_cookie(
+                options['PIN_COOKIE'], '1', max_age=options['PIN_SECONDS'], httponly=True, samesite='Lax',
+            )
+        elif state.replica is not None and response.streaming and not response.is_async:
+            response.streaming_content = _routed_chunks(response.streaming_content, state)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state, token, options = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state, options)
+
+    async def __acall__(self, request):
+        state, token, options = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state, options)
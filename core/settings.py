@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -65,6 +67,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "conversation.context_processors.unread_messages",
+                "market.context_processors.categories",
             ],
         },
     },
@@ -83,6 +87,17 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated database files in DATABASE_REPLICAS, added as
+# replica1, replica2, ... and used by core.routers for read-only requests.
+for _n, _path in enumerate(filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")), start=1):
+    DATABASES[f"replica{_n}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": _path.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,4 +153,111 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+
+# MARKET SEARCH
+# SQLiteFTSBackend needs the FTS5 table created by market migration 0005;
+# use 'market.search.BasicSearchBackend' on databases without FTS5.
+MARKET_SEARCH_BACKEND = 'market.search.SQLiteFTSBackend'
+
+# BARCODE LOOKUP CACHE (per process; TTLs in seconds)
+BARCODE_CACHE = {
+    'MAX_SIZE': 4096,
+    'TTL': 300,
+    'NEGATIVE_TTL': 60,
+}
+
+# CONVERSATION EVENTS (Server-Sent Events over ASGI)
+# Use 'conversation.events.RedisBroker' with OPTIONS={'url': 'redis://...'}
+# when running more than one ASGI worker process.
+CONVERSATION_EVENTS = {
+    'BROKER': 'conversation.events.InProcessBroker',
+    'OPTIONS': {},
+    'HEARTBEAT': 15,
+    'MAX_DURATION': 600,
+}
+
+# REQUEST METRICS (see core/middleware.py)
+# Samples 1% of requests; budgets control the over-budget warnings logged on
+# the 'core.metrics' logger. Raise SAMPLE_RATE and turn on RECORD_STATEMENTS
+# (duplicate SQL in the warnings) while investigating a slow page.
+REQUEST_METRICS = {
+    'SAMPLE_RATE': 0.01,
+    'QUERY_BUDGET': 50,
+    'TIME_BUDGET_MS': 500,
+    'LOG_OVER_BUDGET': True,
+    'RECORD_STATEMENTS': False,
+    'SERVER_TIMING': True,
+}
+
+# MARKET BACKGROUND TASKS (thumbnail generation, see market/tasks.py)
+# ALWAYS_EAGER runs tasks inline, which is handy in tests and shell sessions.
+MARKET_TASKS = {
+    'WORKERS': 2,
+    'ALWAYS_EAGER': False,
+}
+
+# ITEM CARD FRAGMENT CACHE (see market/cards.py)
+# Uses the named cache from CACHES; share it between processes (e.g. Redis or
+# Memcached) so invalidations reach every worker.
+MARKET_CARD_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+# CATEGORY CATALOG (see market/categories.py)
+# The version stamp lives in this cache; it must be shared between workers.
+MARKET_CATEGORIES = {
+    'CACHE': 'default',
+}
+
+# CATALOG CHANGE STAMP for API/export ETags (see market/catalog_stamp.py)
+MARKET_CATALOG_STAMP = {
+    'CACHE': 'default',
+}
+
+# WISHLIST MEMBERSHIP CACHE (see market/wishlists.py)
+MARKET_WISHLIST_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+# SIMILAR ITEMS (see market/similarity.py)
+# The batch command build_similar_items needs numpy and scipy.
+MARKET_SIMILARITY = {
+    'NEIGHBOURS': 6,
+    'MAX_DF': 0.2,
+    'CHUNK_SIZE': 500,
+    'CANDIDATES': 200,
+}
+
+# BROWSE FACET COUNTS (see market/facets.py; TIMEOUT in seconds)
+MARKET_FACETS = {
+    'CACHE': 'default',
+    'TIMEOUT': 120,
+}
+
+# BULK ITEM IMPORT (see market/imports.py)
+# MAX_ERRORS caps the row errors kept in the report; all of them are counted.
+MARKET_IMPORT = {
+    'BATCH_SIZE': 1000,
+    'MAX_ERRORS': 1000,
+}
+
+# ROLE CACHE (see users/roles.py; TIMEOUT in seconds)
+# The version stamp lives in this cache; it must be shared between workers.
+USER_ROLES = {
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60,
+}
+
+# READ REPLICA ROUTING (see core/routers.py)
+# After a request writes, the client reads from the primary for PIN_SECONDS.
+DATABASE_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': 10,
+    'PIN_COOKIE': 'db_pin',
+    # Always read from the primary; None means sessions and AUTH_USER_MODEL
+    'PRIMARY_MODELS': None,
+}
@@ -0,0 +1,83 @@
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import Category
+
+from .middleware import DEFAULTS, RequestMetricsMiddleware, get_url_stats, reset_url_stats
+
+SAMPLE_ALL = {'SAMPLE_RATE': 1.0, 'LOG_OVER_BUDGET': False}
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        reset_url_stats()
+        self.addCleanup(reset_url_stats)
+
+    def test_defaults_sample_sparingly_without_recording_statements(self):
+        self.assertLess(DEFAULTS['SAMPLE_RATE'], 1.0)
+        self.assertFalse(DEFAULTS['RECORD_STATEMENTS'])
+
+    @override_settings(REQUEST_METRICS=SAMPLE_ALL)
+    def test_server_timing_reports_queries_templates_and_total(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('market:index'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(REQUEST_METRICS={**SAMPLE_ALL, 'SAMPLE_RATE': 0.0})
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse('market:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(get_url_stats(), {})
+
+    @override_settings(REQUEST_METRICS={**SAMPLE_ALL, 'SERVER_TIMING': False})
+    def test_totals_accumulate_per_url_name(self):
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('market:index'))
+            counts.append(len(ctx.captured_queries))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+        stats = get_url_stats()['market:index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queries'], sum(counts))
+        self.assertEqual(stats['max_queries'], max(counts))
+        self.assertGreaterEqual(stats['total_ms'], stats['db_ms'])
+        self.assertGreaterEqual(stats['max_total_ms'], stats['total_ms'] / 2)
+
+    def repeat_query(self, request):
+        for _ in range(3):
+            Category.objects.count()
+        return HttpResponse()
+
+    def request_over_budget(self, **options):
+        middleware = RequestMetricsMiddleware(self.repeat_query)
+        with override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0, 'QUERY_BUDGET': 2, **options}):
+            with self.assertLogs('core.metrics', 'WARNING') as logs:
+                middleware(RequestFactory().get('/slow/'))
+        [message] = logs.output
+        return message
+
+    def test_over_budget_requests_are_logged(self):
+        message = self.request_over_budget()
+        self.assertIn('GET /slow/ [unresolved] over budget: 3 queries', message)
+        # Statements are only kept when RECORD_STATEMENTS is on
+        self.assertNotIn('3x SELECT', message)
+
+    def test_over_budget_log_lists_repeated_statements_when_recording(self):
+        message = self.request_over_budget(RECORD_STATEMENTS=True)
+        self.assertIn('3x SELECT COUNT(*)', message)
+
+    def test_requests_within_budget_are_not_logged(self):
+        middleware = RequestMetricsMiddleware(self.repeat_query)
+        with override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0, 'QUERY_BUDGET': 3}):
+            with self.assertNoLogs('core.metrics', 'WARNING'):
+                middleware(RequestFactory().get('/slow/'))
@@ -0,0 +1,178 @@
+"""Primary/replica routing against two real SQLite files.
+
+The test registers two extra connection aliases, each backed by its own
+database file holding a ``market_category`` table. Rows that only exist in
+one file show which database a query went to.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.sessions.models import Session
+from django.db import connections, router, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from market.categories import get_catalog, invalidate_catalog
+from market.models import Category
+
+from .routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware, read_from_primary
+
+PRIMARY = 'router_primary'
+REPLICA = 'router_replica'
+ROUTING = {'REPLICAS': [REPLICA], 'PIN_SECONDS': 10, 'PIN_COOKIE': 'db_pin'}
+
+
+def add_sqlite_alias(alias, path):
+    configured = connections.configure_settings({
+        **connections.settings, alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)},
+    })
+    connections.settings[alias] = configured[alias]
+
+
+def remove_alias(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+@override_settings(
+    DATABASE_ROUTERS=[PrimaryReplicaRouter(primary=PRIMARY, replicas=[REPLICA])],
+    DATABASE_ROUTING=ROUTING,
+)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    # The aliases only exist while this class runs, so they are allowed here
+    # rather than in ``databases`` (the runner would try to set them up).
+    # Queries on ``default`` still fail.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.databases = cls.databases | {PRIMARY, REPLICA}
+        cls.tmpdir = Path(tempfile.mkdtemp())
+        for alias in (PRIMARY, REPLICA):
+            add_sqlite_alias(alias, cls.tmpdir / f'{alias}.sqlite3')
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(Category)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in (PRIMARY, REPLICA):
+            remove_alias(alias)
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        for alias in (PRIMARY, REPLICA):
+            # Plain SQL: a model delete would also look for items to detach
+            with connections[alias].cursor() as cursor:
+                cursor.execute('DELETE FROM market_category')
+        # The replica "lags": it only has the row that existed before
+        Category.objects.using(PRIMARY).create(name='Books', slug='books')
+        Category.objects.using(PRIMARY).create(name='Toys', slug='toys')
+        Category.objects.using(REPLICA).create(name='Books', slug='books')
+
+    def run_view(self, view, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def slugs(self):
+        return sorted(Category.objects.values_list('slug', flat=True))
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.slugs(), ['books', 'toys'])
+
+    def test_read_only_request_reads_replica(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.slugs())
+            return HttpResponse()
+
+        response = self.run_view(view)
+        self.assertEqual(seen, [['books']])
+        self.assertNotIn('db_pin', response.cookies)
+
+    def test_write_goes_to_primary_and_pins(self):
+        seen = []
+
+        def view(request):
+            Category.objects.create(name='Home', slug='home')
+            # Read-your-writes for the rest of the request
+            seen.append(self.slugs())
+            return HttpResponse()
+
+        response = self.run_view(view)
+        self.assertEqual(seen, [['books', 'home', 'toys']])
+        self.assertFalse(Category.objects.using(REPLICA).filter(slug='home').exists())
+        self.assertEqual(response.cookies['db_pin']['max-age'], 10)
+
+    def test_pin_cookie_and_unsafe_methods_read_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.slugs())
+            return HttpResponse()
+
+        self.run_view(view, cookies={'db_pin': '1'})
+        self.run_view(view, method='post')
+        self.assertEqual(seen, [['books', 'toys'], ['books', 'toys']])
+
+    def test_open_primary_transaction_reads_primary(self):
+        seen = []
+
+        def view(request):
+            with transaction.atomic(using=PRIMARY):
+                seen.append(self.slugs())
+            return HttpResponse()
+
+        self.run_view(view)
+        self.assertEqual(seen, [['books', 'toys']])
+
+    def test_streaming_body_reads_replica(self):
+        def view(request):
+            return StreamingHttpResponse(slug + '\n' for slug in Category.objects.values_list('slug', flat=True))
+
+        response = self.run_view(view)
+        self.assertEqual(b''.join(response.streaming_content), b'books\n')
+
+    def test_read_from_primary_inside_a_read_only_request(self):
+        seen = []
+
+        def view(request):
+            with read_from_primary():
+                seen.append(self.slugs())
+            seen.append(self.slugs())
+            return HttpResponse()
+
+        self.run_view(view)
+        self.assertEqual(seen, [['books', 'toys'], ['books']])
+
+    def test_cache_rebuild_after_a_bump_reads_primary(self):
+        # Otherwise the lagging replica's rows would be cached under the new version
+        self.addCleanup(invalidate_catalog)
+        invalidate_catalog()
+        seen = []
+
+        def view(request):
+            seen.append(sorted(category.slug for category in get_catalog()))
+            return HttpResponse()
+
+        self.run_view(view)
+        self.assertEqual(seen, [['books', 'toys']])
+
+    def test_sessions_and_users_read_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append((router.db_for_read(Session), router.db_for_read(Category)))
+            return HttpResponse()
+
+        self.run_view(view)
+        self.assertEqual(seen, [(PRIMARY, REPLICA)])
+
+    def test_replicas_are_not_migrated(self):
+        router = PrimaryReplicaRouter(primary=PRIMARY, replicas=[REPLICA])
+        self.assertFalse(router.allow_migrate(REPLICA, 'market'))
+        self.assertIsNone(router.allow_migrate(PRIMARY, 'market'))
@@ -0,0 +1,142 @@
+"""Barcode lookups for the Live-Lens scanner.
+
+Scanned codes are normalized (``normalize_barcode``) and resolved through
+an in-process LRU cache in front of the ``barcode_normalized`` index,
+which is unique among unsold items. Misses are cached too, so a shelf of unknown products does not hit
+the database on every frame. Committed item saves and deletes invalidate the entries
+for their old and new codes (see ``market.signals``); entries also expire
+after a TTL so other worker processes converge on changes.
+
+Configure with the ``BARCODE_CACHE`` setting (``MAX_SIZE``, ``TTL`` and
+``NEGATIVE_TTL`` in seconds).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.routers import read_from_primary
+
+from .models import Item, normalize_barcode
+from .serializers import ItemSerializer
+
+_MISSING = object()
+
+
+class BarcodeCache:
+    """Thread-safe LRU mapping normalized barcode -> serialized item, or None for a known miss."""
+
+    def __init__(self, max_size=4096, ttl=300, negative_ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code):
+        """Returns the cached value, or ``_MISSING`` if the code has to be looked up."""
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(code, None)
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(code)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, code, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[code] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *codes):
+        with self._lock:
+            for code in codes:
+                if code is not None:
+                    self._entries.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _build_cache():
+    options = getattr(settings, 'BARCODE_CACHE', {})
+    return BarcodeCache(
+        max_size=options.get('MAX_SIZE', 4096),
+        ttl=options.get('TTL', 300),
+        negative_ttl=options.get('NEGATIVE_TTL', 60),
+    )
+
+
+barcode_cache = _build_cache()
+
+
+def _from_cache(codes):
+    """``(results, codes to fetch)`` for the normalized ``codes`` after consulting the cache."""
+    results = {}
+    to_fetch = []
+    for code in {normalize_barcode(c) for c in codes} - {None}:
+        value = barcode_cache.get(code)
+        if value is _MISSING:
+            to_fetch.append(code)
+        else:
+            results[code] = value
+    return results, to_fetch
+
+
+def _fetch_query(to_fetch):
+    return Item.objects.filter(barcode_normalized__in=to_fetch, is_sold=False)
+
+
+def _store(results, to_fetch, items):
+    found = {item.barcode_normalized: ItemSerializer(item).data for item in items}
+    for code in to_fetch:
+        results[code] = found.get(code)
+        barcode_cache.set(code, results[code])
+    return results
+
+
+def lookup_barcodes(codes):
+    """Resolves many scanned codes at once.
+
+    Returns a dict mapping each normalized code to the serialized unsold item
+    or None. Cache misses are fetched with a single ``IN`` query.
+    """
+    results, to_fetch = _from_cache(codes)
+    if to_fetch:
+        # Cached for the TTL, so read the primary rather than a lagging replica
+        with read_from_primary():
+            _store(results, to_fetch, _fetch_query(to_fetch))
+    return results
+
+
+async def alookup_barcodes(codes):
+    """Async ``lookup_barcodes``; only cache misses wait on the database."""
+    results, to_fetch = _from_cache(codes)
+    if to_fetch:
+        with read_from_primary():
+            _store(results, to_fetch, [item async for item in _fetch_query(to_fetch)])
+    return results
+
+
+def lookup_barcode(code):
+    """Single-code version of ``lookup_barcodes``; returns the item data or None."""
+    code = normalize_barcode(code)
+    if code is None:
+        return None
+    return lookup_barcodes([code]).get(code)
+
+
+async def alookup_barcode(code):
+    code = normalize_barcode(code)
+    if code is None:
+        return None
+    return (await alookup_barcodes([code])).get(code)
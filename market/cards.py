@@ -0,0 +1,126 @@
+"""Cached HTML for item cards in listing grids.
+
+A grid page used to render the same card markup for every item on every
+request (image variant lookup, several ``{% url %}`` tags, category name).
+``render_cards`` renders each card once per item version and keeps the
+HTML in the cache:
+
+    key = card:<CARD_VERSION>:<generation>:<style>:<item id>:<updated_at>
+
+- Item saves change ``updated_at`` (``auto_now``), so edited items get a
+  fresh key without explicit invalidation. Old entries simply expire.
+- Changes that affect many cards at once (e.g. renaming a category) bump
+  the shared generation number (``invalidate_cards``, see market.signals).
+  An evicted generation is reseeded, never reused (core.cache_versions).
+- Per-viewer or fast-changing bits are left as slots (``<!--card:name-->``)
+  in the cached HTML and filled per request: the seller's rating stars and
+  name, and the wishlist heart.
+
+Styles map to ``templates/market/partials/cards/<style>.html``. Hits and
+misses are counted per process (``card_cache_stats``) and reported on the
+request's Server-Timing header via ``core.middleware``.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.cache_versions import bump_version, current_version
+from core.middleware import current_metrics
+
+from .categories import get_catalog
+
+# Bump when the card templates change in a way old cached HTML should not survive
+CARD_VERSION = 1
+GENERATION_KEY = 'market:cards:generation'
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'MARKET_CARD_CACHE', {})}
+
+
+def _cache():
+    return caches[_options()['CACHE']]
+
+
+def card_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(hits, misses):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.incr('card_hit', hits)
+        metrics.incr('card_miss', misses)
+
+
+def invalidate_cards():
+    """Orphans every cached card (used when shared data such as categories changes)."""
+    bump_version(_cache(), GENERATION_KEY)
+
+
+def card_key(style, item, generation):
+    stamp = item.updated_at.timestamp() if item.updated_at else 0
+    return f'market:card:{CARD_VERSION}:{generation}:{style}:{item.pk}:{stamp:.6f}'
+
+
+def _fill_slots(html, item):
+    if '<!--card:' not in html:
+        return html
+    html = html.replace('<!--card:stars-->', escape(getattr(item, 'seller_star_str', '') or '—'))
+    if '<!--card:seller-->' in html:
+        html = html.replace('<!--card:seller-->', escape(item.seller.username))
+    # ``is_wishlisted`` is set by views that know the viewer's wishlist; unknown keeps the plain heart
+    wishlisted = getattr(item, 'is_wishlisted', None)
+    return html.replace('<!--card:wishlist-->', '🤍' if wishlisted is False else '❤️')
+
+
+def render_cards(items, style):
+    """Returns ``[(item, html), ...]`` for ``items`` rendered with the ``style`` card.
+
+    Cached cards are fetched with a single ``get_many``; only misses are
+    rendered, and written back with one ``set_many``.
+    """
+    items = list(items)
+    template_name = f'market/partials/cards/{style}.html'
+    options = _options()
+    if not options['ENABLED']:
+        return [(item, mark_safe(_fill_slots(render_to_string(template_name, {'item': item}), item))) for item in items]
+
+    cache = _cache()
+    generation = current_version(cache, GENERATION_KEY)
+    keys = [card_key(style, item, generation) for item in items]
+    cached = cache.get_many(keys) if keys else {}
+
+    missing = {}
+    cards = []
+    for item, key in zip(items, keys):
+        html = cached.get(key)
+        if html is None:
+            if item.category_id is not None:
+                # The name comes from the primary-backed catalog: the item row may be
+                # from a replica that has not seen the rename behind this generation
+                item.category = get_catalog().get(item.category_id) or item.category
+            html = missing[key] = render_to_string(template_name, {'item': item})
+        cards.append((item, mark_safe(_fill_slots(html, item))))
+
+    if missing:
+        cache.set_many(missing, options['TIMEOUT'])
+    _count(len(items) - len(missing), len(missing))
+    return cards
@@ -0,0 +1,54 @@
+"""Change stamp for the item catalog, used for ETag/Last-Modified.
+
+Conditional GETs on the items API and the export must not cost more than
+the 304 they save, so the catalog state is not aggregated per request.
+One cache entry holds ``{'last_modified': <datetime>, 'token': <hex>}``:
+
+- ``touch_catalog`` replaces it with a new random token and the current
+  time. Committed item saves and deletes and category changes call it (see
+  market.signals); writers that skip signals (imports, thumbnail updates,
+  bulk seeding) call it themselves.
+- On a miss (first request, eviction) it is seeded once from the newest
+  ``updated_at``, an index lookup, with a fresh token so it never matches
+  an ETag issued before the eviction.
+
+Configure with ``MARKET_CATALOG_STAMP`` (``CACHE``); share that cache
+between workers so every process sees the same stamp.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+
+from core.routers import read_from_primary
+
+from .models import Item
+
+STAMP_KEY = 'market:catalog:stamp'
+
+
+def _cache():
+    return caches[getattr(settings, 'MARKET_CATALOG_STAMP', {}).get('CACHE', 'default')]
+
+
+def _new_stamp(last_modified):
+    return {'last_modified': last_modified, 'token': uuid.uuid4().hex}
+
+
+def get_catalog_stamp():
+    """The current stamp; ``last_modified`` is None while the catalog is empty."""
+    cache = _cache()
+    stamp = cache.get(STAMP_KEY)
+    if stamp is None:
+        with read_from_primary():
+            last_modified = Item.objects.aggregate(last_modified=Max('updated_at'))['last_modified']
+        # add(), so a concurrent touch_catalog is not overwritten by an older value
+        cache.add(STAMP_KEY, _new_stamp(last_modified), None)
+        stamp = cache.get(STAMP_KEY) or _new_stamp(last_modified)
+    return stamp
+
+
+def touch_catalog():
+    _cache().set(STAMP_KEY, _new_stamp(timezone.now()), None)
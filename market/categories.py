@@ -0,0 +1,97 @@
+"""Process-wide category catalog.
+
+Categories almost never change but every page needs them (navigation,
+browse filters, item forms, category-name search). ``get_catalog`` keeps
+them in memory and serves lookups by id, slug and case-insensitive name
+without touching the database.
+
+Invalidation goes through a version number stored in the cache backend
+(``MARKET_CATEGORIES['CACHE']``). ``Category`` save/delete signals bump it
+(see market.signals); every process compares its snapshot's version with
+the shared one on access and reloads when it is behind. A version that
+was evicted is reseeded from the clock, never back to an old number (see
+core.cache_versions). Use a cache that is shared between workers (Redis,
+Memcached, database) in production; with the default per-process
+LocMemCache only the local process sees the bump.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache_versions import bump_version, current_version
+from core.routers import read_from_primary
+
+from .models import Category
+
+VERSION_KEY = 'market:categories:version'
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'MARKET_CATEGORIES', {}).get('CACHE', 'default')]
+
+
+class CategoryCatalog:
+    """Immutable snapshot of all categories at one version."""
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.categories = tuple(categories)
+        self._by_id = {c.pk: c for c in self.categories}
+        self._by_slug = {c.slug: c for c in self.categories}
+        self._by_name = {}
+        for c in self.categories:
+            # First one wins if two names only differ by case
+            self._by_name.setdefault(c.name.casefold(), c)
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def get(self, pk):
+        try:
+            return self._by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def by_slug(self, slug):
+        return self._by_slug.get(slug)
+
+    def by_name(self, name):
+        """Case-insensitive exact name match, like ``name__iexact``."""
+        return self._by_name.get(name.strip().casefold()) if name else None
+
+    def id_for_name(self, name):
+        category = self.by_name(name)
+        return category.pk if category else None
+
+    def id_for_slug(self, slug):
+        category = self.by_slug(slug)
+        return category.pk if category else None
+
+
+def get_catalog():
+    """The current CategoryCatalog; costs one cache read when nothing changed."""
+    global _snapshot
+    version = current_version(_cache(), VERSION_KEY)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            # Not from a replica: an old row would stay cached until the next bump
+            with read_from_primary():
+                _snapshot = CategoryCatalog(version, list(Category.objects.order_by('id')))
+        return _snapshot
+
+
+def invalidate_catalog():
+    """Marks every process's snapshot stale."""
+    global _snapshot
+    bump_version(_cache(), VERSION_KEY)
+    _snapshot = None
@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .categories import get_catalog
+
+
+def categories(request):
+    """Adds ``categories``: the cached category catalog (see market.categories)."""
+    return {'categories': SimpleLazyObject(get_catalog)}
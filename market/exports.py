@@ -0,0 +1,126 @@
+"""Streaming catalog export (CSV or NDJSON, optionally gzip-compressed).
+
+``api_item_list`` serializes model instances through DRF, which is fine
+for a page but not for a partner pulling the whole catalog. The export
+reads plain ``values_list()`` rows with ``.iterator(chunk_size=...)`` and
+encodes them a chunk at a time, so memory stays flat however large the
+catalog is. The same generator feeds the ``export_items`` view (through
+``StreamingHttpResponse``) and the ``export_catalog`` command.
+
+``updated_since`` limits the export to items changed after a date or
+datetime, for incremental syncs.
+"""
+import csv
+import datetime
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Item
+
+# Column name -> lookup; related rows are exported by name rather than id
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'condition': 'condition',
+    'barcode': 'barcode',
+    'category': 'category__name',
+    'seller': 'seller__username',
+    'image': 'image',
+    'is_sold': 'is_sold',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+GZIP_LEVEL = 6
+
+
+def parse_updated_since(value):
+    """Aware datetime from an ISO date or datetime string; None if blank, ValueError if invalid."""
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        since = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, datetime.timezone.utc)
+    return since
+
+
+def export_queryset(updated_since=None, include_sold=False):
+    items = Item.objects.all()
+    if not include_sold:
+        items = items.filter(is_sold=False)
+    if updated_since is not None:
+        items = items.filter(updated_at__gt=updated_since)
+    # The primary key order needs no sort and keeps repeated exports comparable
+    return items.order_by('id').values_list(*EXPORT_COLUMNS.values())
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+class _LineBuffer:
+    """File-like object whose ``write`` returns the text, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(rows, chunk_size):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _ndjson_chunks(rows, chunk_size):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    columns = tuple(EXPORT_COLUMNS)
+    chunk = []
+    for row in rows:
+        chunk.append(encoder.encode(dict(zip(columns, row))) + '\n')
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """Compresses an iterable of byte strings into one gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(fmt, updated_since=None, include_sold=False, compress=False, chunk_size=CHUNK_SIZE):
+    """Yields the export as byte strings, ``chunk_size`` rows at a time."""
+    rows = export_queryset(updated_since, include_sold).iterator(chunk_size=chunk_size)
+    encode = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+    chunks = (text.encode() for text in encode(rows, chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
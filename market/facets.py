@@ -0,0 +1,147 @@
+"""Faceted counts (category, condition, price range) for the browse sidebar.
+
+All counts come from one grouped aggregate over the search results, a
+category x condition x price-bucket cross-tab:
+
+    SELECT category_id, condition, <bucket>, COUNT(*) ... GROUP BY 1, 2, 3
+
+Each facet is then summed in Python with the *other* facets' filters
+applied, so picking a category still shows how many items every other
+category has (and the total replaces a separate COUNT query).
+
+The cross-tab only depends on the search text, so it is cached under the
+normalized query (sorted, lower-cased tokens) for a short TTL. Committed item
+saves and deletes bump a generation number in the key (see market.signals), so
+counts never lag behind edits for long even with a long TTL. An evicted
+generation is reseeded rather than reused (see core.cache_versions).
+Configure with ``MARKET_FACETS`` (``CACHE`` and ``TIMEOUT``).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, CharField, Count, Value, When
+
+from core.cache_versions import bump_version, current_version
+from core.routers import read_from_primary
+
+from .categories import get_catalog
+from .models import Item
+from .search import tokenize
+
+GENERATION_KEY = 'market:facets:generation'
+
+# (key, label, min price inclusive, max price exclusive)
+PRICE_BUCKETS = (
+    ('0-25', 'Under $25', None, 25),
+    ('25-50', '$25 to $50', 25, 50),
+    ('50-100', '$50 to $100', 50, 100),
+    ('100-250', '$100 to $250', 100, 250),
+    ('250+', '$250 and up', 250, None),
+)
+PRICE_BUCKET_KEYS = {key for key, _, _, _ in PRICE_BUCKETS}
+CONDITIONS = dict(Item.CONDITION_CHOICES)
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TIMEOUT': 120,
+}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'MARKET_FACETS', {})}
+
+
+def _cache():
+    return caches[_options()['CACHE']]
+
+
+def price_bucket_filter(key):
+    """Filter kwargs for a price bucket key, or None for an unknown key."""
+    for bucket, _, low, high in PRICE_BUCKETS:
+        if bucket == key:
+            lookups = {}
+            if low is not None:
+                lookups['price__gte'] = low
+            if high is not None:
+                lookups['price__lt'] = high
+            return lookups
+    return None
+
+
+def _bucket_expression():
+    whens = [When(price__lt=high, then=Value(key)) for key, _, _, high in PRICE_BUCKETS if high is not None]
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def invalidate_facets():
+    bump_version(_cache(), GENERATION_KEY)
+
+
+def facet_key(query, generation):
+    normalized = ' '.join(sorted(set(tokenize(query))))
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f'market:facets:{generation}:{digest}'
+
+
+def _count_rows(queryset):
+    return [
+        (row['category_id'], row['condition'], row['bucket'], row['n'])
+        for row in queryset.values('category_id', 'condition', bucket=_bucket_expression())
+        .annotate(n=Count('id')).order_by()
+    ]
+
+
+def crosstab(queryset, query=''):
+    """``[(category_id, condition, bucket, count), ...]`` for ``queryset``, cached by ``query``.
+
+    ``queryset`` must already be filtered by the search text and by nothing
+    that varies independently of ``query`` (facet filters are applied later).
+    """
+    if query and not tokenize(query):
+        # e.g. "!!!": search_items matches nothing, but the normalized key
+        # would be plain browsing's, so never cache these counts
+        return _count_rows(queryset)
+    cache = _cache()
+    key = facet_key(query, current_version(cache, GENERATION_KEY))
+    rows = cache.get(key)
+    if rows is None:
+        # Counted on the primary, so a lagging replica cannot cache old counts under the new generation
+        with read_from_primary():
+            rows = _count_rows(queryset)
+        cache.set(key, rows, _options()['TIMEOUT'])
+    return rows
+
+
+def build_facets(rows, category_id=None, condition=None, price=None):
+    """Sidebar counts from a cross-tab; each facet ignores its own selection."""
+    categories, conditions, prices = {}, {}, {}
+    total = 0
+    for cat, cond, bucket, n in rows:
+        cat_ok = not category_id or cat == category_id
+        cond_ok = not condition or cond == condition
+        price_ok = not price or bucket == price
+        if cond_ok and price_ok:
+            categories[cat] = categories.get(cat, 0) + n
+        if cat_ok and price_ok:
+            conditions[cond] = conditions.get(cond, 0) + n
+        if cat_ok and cond_ok:
+            prices[bucket] = prices.get(bucket, 0) + n
+        if cat_ok and cond_ok and price_ok:
+            total += n
+
+    return {
+        'total': total,
+        'categories': [
+            {'id': c.pk, 'name': c.name, 'count': categories.get(c.pk, 0), 'selected': c.pk == category_id}
+            for c in get_catalog()
+        ],
+        'conditions': [
+            {'value': value, 'label': label, 'count': conditions.get(value, 0), 'selected': value == condition}
+            for value, label in Item.CONDITION_CHOICES
+        ],
+        'prices': [
+            {'value': key, 'label': label, 'count': prices.get(key, 0), 'selected': key == price}
+            for key, label, _, _ in PRICE_BUCKETS
+        ],
+    }
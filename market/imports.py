@@ -0,0 +1,289 @@
+"""Bulk item import from CSV or JSON Lines files.
+
+Resellers upload whole inventories (tens of thousands of rows), which
+would take one form post per item through ``market.views.new``.
+``import_items`` streams the file instead: rows are parsed one at a time,
+validated with ``ItemImportForm`` (the ``NewItemForm`` rules, minus the
+image upload) and written with one ``bulk_create`` and one ``bulk_update``
+per batch.
+
+Rows are upserted on the barcode: a row whose barcode matches one of the
+seller's unsold items updates it in place, so re-uploading a corrected
+inventory does not duplicate listings. Sold items are left alone, so their
+products are relisted as new items. Barcodes of another seller's unsold item
+are rejected, also when a concurrent listing takes the barcode while the
+file is imported. Rows without a barcode are always inserted.
+
+Columns (CSV header or JSON object keys): ``title``, ``description``,
+``price``, ``category`` (id, slug or name), and optionally ``barcode`` and
+``condition``. Invalid rows are reported with their line number and the
+rest of the file is still imported.
+
+``bulk_create`` skips save signals, so each batch is added to the search
+index in its transaction and the barcode lookup cache, facet counts,
+catalog stamp and seller totals are refreshed here. Similar-item lists are not; run
+``build_similar_items`` after large imports. Configure with
+``MARKET_IMPORT`` (``BATCH_SIZE`` and ``MAX_ERRORS``, the number of row
+errors kept in the report).
+"""
+import codecs
+import csv
+import json
+import os
+import time
+
+from django import forms
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .barcodes import barcode_cache
+from .categories import get_catalog
+from .catalog_stamp import touch_catalog
+from .facets import invalidate_facets
+from .forms import NewItemForm
+from .models import Item, normalize_barcode
+from .search import get_backend
+from .stats import refresh_seller_stats
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'MAX_ERRORS': 1000,
+}
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Columns a row overwrites on an existing listing; seller, is_sold and created_at stay as they were
+UPDATE_FIELDS = ('category', 'title', 'description', 'price', 'barcode', 'condition', 'updated_at')
+
+
+def import_settings():
+    return {**DEFAULTS, **getattr(settings, 'MARKET_IMPORT', {})}
+
+
+class ItemImportForm(NewItemForm):
+    """``NewItemForm`` for one imported row.
+
+    The category is resolved through the in-memory catalog by id, slug or
+    name, so validating a row does not query the database.
+    """
+    category = forms.CharField()
+
+    class Meta(NewItemForm.Meta):
+        fields = ('title', 'description', 'price', 'barcode', 'condition')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['condition'].required = False
+
+    def clean_category(self):
+        value = self.cleaned_data['category'].strip()
+        catalog = get_catalog()
+        category = catalog.get(value) if value.isdigit() else None
+        category = category or catalog.by_slug(value) or catalog.by_name(value)
+        if category is None:
+            raise forms.ValidationError(f'Unknown category "{value}".')
+        return category
+
+    def clean_condition(self):
+        return self.cleaned_data['condition'] or Item._meta.get_field('condition').default
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'category' in cleaned_data:
+            self.instance.category = cleaned_data['category']
+        return cleaned_data
+
+    def validate_unique(self):
+        # Barcode clashes are resolved per batch (update the seller's own listing,
+        # reject another seller's), not as per-row form errors
+        pass
+
+
+class ImportReport:
+    """Counts, row errors and timing of one import run."""
+
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        # Set when unreadable input stopped the import part way
+        self.error = None
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'error': self.error,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def detect_format(filename):
+    """``'csv'`` or ``'jsonl'`` from a file name, or None."""
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def decode_lines(stream, encoding='utf-8-sig'):
+    """Text lines from a binary line iterator, such as an ``UploadedFile``."""
+    return codecs.iterdecode(stream, encoding)
+
+
+def iter_rows(lines, fmt):
+    """Yields ``(line number, row dict)``; the dict is None for a line that is not a JSON object."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Short rows fill with None, extra cells land under the None key
+            yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def _form_data(row):
+    return {key: '' if value is None else str(value) for key, value in row.items()}
+
+
+def _listed_barcodes(codes):
+    """``{barcode: (pk, seller id)}`` of the unsold listings holding ``codes``."""
+    # Only unsold listings own a barcode (see Item.Meta.constraints)
+    return {
+        code: (pk, owner)
+        for pk, code, owner in Item.objects.filter(barcode_normalized__in=codes, is_sold=False)
+        .values_list('pk', 'barcode_normalized', 'seller_id')
+    }
+
+
+def _write_rows(batch, seller, backend):
+    """Writes ``(line number, unsaved Item)`` pairs in one transaction.
+
+    Returns the created items, the updated items and the row errors. Raises
+    IntegrityError, with nothing written, if a barcode was listed after the
+    check.
+    """
+    codes = [item.barcode_normalized for _, item in batch if item.barcode_normalized]
+    with transaction.atomic():
+        listed = _listed_barcodes(codes)
+        now = timezone.now()
+        created, updated, errors = [], [], []
+        for line, item in batch:
+            pk, owner = listed.get(item.barcode_normalized, (None, None))
+            # Also clears a primary key left by an earlier, rolled back attempt
+            item.pk = pk
+            if owner is None:
+                created.append(item)
+            elif owner != seller.pk:
+                errors.append((line, {'barcode': ['This barcode is already listed by another seller.']}))
+            else:
+                item.updated_at = now
+                updated.append(item)
+        Item.objects.bulk_create(created)
+        Item.objects.bulk_update(updated, UPDATE_FIELDS)
+        backend.index_items(created + updated)
+    return created, updated, errors
+
+
+def _write_batch(batch, seller, report, backend):
+    """Inserts or updates one batch of ``(line number, unsaved Item)`` pairs."""
+    try:
+        results = [_write_rows(batch, seller, backend)]
+    except IntegrityError:
+        # Another request listed one of the barcodes after the check; redo the
+        # batch row by row so only the clashing rows are rejected
+        results = []
+        for line, item in batch:
+            try:
+                results.append(_write_rows([(line, item)], seller, backend))
+            except IntegrityError:
+                results.append(([], [], [(line, {'barcode': ['This barcode was listed while the file was imported.']})]))
+    for created, updated, errors in results:
+        report.created += len(created)
+        report.updated += len(updated)
+        for line, error in errors:
+            report.add_error(line, error)
+    # Misses are cached too, so new codes need dropping as well as changed ones
+    barcode_cache.invalidate(*(item.barcode_normalized for _, item in batch if item.barcode_normalized))
+
+
+def import_items(lines, fmt, seller, batch_size=None, max_errors=None):
+    """Imports rows from ``lines`` (an iterable of text lines) for ``seller``.
+
+    ``fmt`` is ``'csv'`` or ``'jsonl'``. Returns an ``ImportReport``. Input
+    that cannot be read (bad encoding, broken CSV quoting) stops the import
+    with ``report.error`` set; batches written before it stay imported.
+    """
+    options = import_settings()
+    batch_size = max(1, batch_size or options['BATCH_SIZE'])
+    report = ImportReport(options['MAX_ERRORS'] if max_errors is None else max_errors)
+    backend = get_backend()
+    # Line of the first row seen with each barcode; a file may not list one twice
+    seen = {}
+    batch = []
+    line = 0
+    try:
+        try:
+            for line, row in iter_rows(lines, fmt):
+                report.rows += 1
+                if row is None:
+                    report.add_error(line, {'__all__': ['Not a JSON object.']})
+                    continue
+                form = ItemImportForm(_form_data(row))
+                if not form.is_valid():
+                    report.add_error(line, {field: list(messages) for field, messages in form.errors.items()})
+                    continue
+                item = form.save(commit=False)
+                item.seller = seller
+                item.barcode_normalized = normalize_barcode(item.barcode)
+                code = item.barcode_normalized
+                if code is not None:
+                    if code in seen:
+                        report.add_error(line, {'barcode': [f'Duplicate of line {seen[code]}.']})
+                        continue
+                    seen[code] = line
+                batch.append((line, item))
+                if len(batch) >= batch_size:
+                    _write_batch(batch, seller, report, backend)
+                    batch = []
+        except UnicodeDecodeError:
+            report.error = f'Input is not UTF-8 encoded after line {line}.'
+        except csv.Error as exc:
+            report.error = f'Unreadable CSV after line {line}: {exc}'
+        if batch:
+            _write_batch(batch, seller, report, backend)
+    finally:
+        # Also after a failure: earlier batches are committed
+        if report.created or report.updated:
+            refresh_seller_stats(seller.pk)
+            invalidate_facets()
+            touch_catalog()
+        report.elapsed = time.monotonic() - report.started
+    return report
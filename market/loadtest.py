@@ -0,0 +1,331 @@
+"""Synthetic load tests for the hot pages and API endpoints.
+
+``generate_dataset`` fills the (throwaway) database with users, items,
+reviews, wishlists, conversations and messages using ``bulk_create`` and
+no network access, then rebuilds the summaries that bulk writes skip
+(seller stats, rating summaries, conversation inbox state, the search
+index and similar items). ``build_scenarios`` turns the dataset into a
+list of ``Scenario`` objects, one per hot URL shape, and ``run_scenario``
+drives one through the Django test client.
+
+Query counts and database/template time come from the same per-URL
+totals ``core.middleware.RequestMetricsMiddleware`` collects in
+production, so the numbers are comparable with ``Server-Timing``.
+Memory is measured in a separate, shorter pass under ``tracemalloc``,
+which slows requests down too much to share a pass with the timings.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils.text import slugify
+
+from conversation.models import Conversation, Message
+from core.middleware import get_url_stats, reset_url_stats
+from users.models import Review
+from users.ratings import refresh_seller_rating
+
+from .management.commands.seed_market import BULK_ADJECTIVES, BULK_CATALOG
+from .models import Category, Item, Wishlist, normalize_barcode
+from .pagination import CursorPaginator, ITEM_ORDERINGS
+from .search import get_backend
+from .similarity import build_similar_items, has_numpy
+from .stats import refresh_seller_stats
+
+DATASET_DEFAULTS = {
+    'users': 200,
+    'sellers': 20,
+    'items': 5000,
+    'reviews': 2000,
+    'wishlists': 10,
+    'conversations': 500,
+    'messages': 8,
+}
+BATCH_SIZE = 2000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def latency_summary(latencies, elapsed=None):
+    """Request count, mean and p50/p95/p99 of ``latencies`` (seconds) in milliseconds."""
+    summary = {'requests': len(latencies)}
+    if elapsed is not None:
+        summary['requests_per_second'] = round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    summary.update({
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    })
+    return summary
+
+
+def _create_users(count, rng):
+    User = get_user_model()
+    # One shared unusable password: the load test logs in with force_login
+    password = make_password(None)
+    users = [
+        User(username=f'load{n:06d}', email=f'load{n:06d}@example.com', password=password)
+        for n in range(count)
+    ]
+    return User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+
+
+def _create_items(count, sellers, rng):
+    categories = [
+        Category.objects.get_or_create(slug=slugify(name), defaults={'name': name})[0]
+        for name in BULK_CATALOG
+    ]
+    conditions = [choice for choice, _ in Item.CONDITION_CHOICES]
+    backend = get_backend()
+    items = []
+    for start in range(0, count, BATCH_SIZE):
+        batch = []
+        for n in range(start, min(start + BATCH_SIZE, count)):
+            category = categories[n % len(categories)]
+            nouns, (low, high) = BULK_CATALOG[category.name]
+            noun, adjective = rng.choice(nouns), rng.choice(BULK_ADJECTIVES)
+            barcode = f'77{n:011d}'
+            batch.append(Item(
+                seller=sellers[n % len(sellers)],
+                category=category,
+                title=f'{adjective} {noun} #{n + 1}',
+                description=f'{adjective} {noun.lower()} in the {category.name.lower()} section, load-test sample #{n + 1}.',
+                price=Decimal(str(round(rng.uniform(low, high), 2))),
+                barcode=barcode,
+                barcode_normalized=normalize_barcode(barcode),
+                condition=rng.choice(conditions),
+                is_sold=rng.random() < 0.1,
+            ))
+        with transaction.atomic():
+            Item.objects.bulk_create(batch)
+            backend.index_items(batch)
+        items.extend(batch)
+    return items
+
+
+def _create_reviews(count, users, sellers, rng):
+    pairs = set()
+    # (seller, reviewer) is unique; stop early on small datasets
+    for _ in range(count * 3):
+        if len(pairs) >= count:
+            break
+        seller, reviewer = rng.choice(sellers), rng.choice(users)
+        if seller.pk != reviewer.pk:
+            pairs.add((seller.pk, reviewer.pk))
+    Review.objects.bulk_create(
+        [
+            Review(seller_id=seller_id, reviewer_id=reviewer_id, rating=rng.randint(1, 5), comment='Smooth sale.')
+            for seller_id, reviewer_id in sorted(pairs)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return len(pairs)
+
+
+def _create_wishlists(per_user, users, items, rng):
+    rows = [
+        Wishlist(user=user, item=item)
+        for user in users
+        for item in rng.sample(items, min(per_user, len(items)))
+    ]
+    Wishlist.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(rows)
+
+
+def _create_conversations(count, per_conversation, users, items, rng):
+    triples = {}
+    for _ in range(count * 3):
+        if len(triples) >= count:
+            break
+        item, buyer = rng.choice(items), rng.choice(users)
+        if buyer.pk != item.seller_id:
+            triples[(item.pk, item.seller_id, buyer.pk)] = None
+    conversations = Conversation.objects.bulk_create(
+        [Conversation(item_id=i, seller_id=s, buyer_id=b) for i, s, b in triples],
+        batch_size=BATCH_SIZE,
+    )
+
+    messages = []
+    for conversation in conversations:
+        for n in range(per_conversation):
+            sender = conversation.buyer_id if n % 2 == 0 else conversation.seller_id
+            messages.append(Message(conversation=conversation, sender_id=sender, body=f'Message {n + 1}: is this still available?'))
+    Message.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+    # bulk_create skips the signal that keeps the inbox columns current
+    last = {}
+    for message in messages:
+        last[message.conversation_id] = message
+    for conversation in conversations:
+        message = last.get(conversation.pk)
+        conversation.last_message = message
+        unread = 1 if message is not None else 0
+        if message is not None and message.sender_id == conversation.buyer_id:
+            conversation.seller_unread = unread
+        else:
+            conversation.buyer_unread = unread
+    Conversation.objects.bulk_update(
+        conversations, ['last_message', 'buyer_unread', 'seller_unread'], batch_size=BATCH_SIZE,
+    )
+    return len(conversations), len(messages)
+
+
+def generate_dataset(seed=0, **sizes):
+    """Creates a synthetic dataset; returns the counts actually created.
+
+    ``sizes`` override ``DATASET_DEFAULTS``. ``wishlists`` and ``messages``
+    are per user and per conversation.
+    """
+    sizes = {**DATASET_DEFAULTS, **sizes}
+    rng = random.Random(seed)
+    users = _create_users(max(2, sizes['users']), rng)
+    sellers = users[:max(1, min(sizes['sellers'], len(users)))]
+    items = _create_items(max(1, sizes['items']), sellers, rng)
+    reviews = _create_reviews(sizes['reviews'], users, sellers, rng)
+    wishlists = _create_wishlists(sizes['wishlists'], users, items, rng)
+    conversations, messages = _create_conversations(sizes['conversations'], sizes['messages'], users, items, rng)
+
+    for seller in sellers:
+        refresh_seller_stats(seller.pk)
+        refresh_seller_rating(seller.pk)
+    if has_numpy():
+        build_similar_items()
+
+    return {
+        'users': len(users), 'sellers': len(sellers), 'items': len(items), 'reviews': reviews,
+        'wishlists': wishlists, 'conversations': conversations, 'messages': messages,
+    }
+
+
+class Scenario:
+    """One hot URL shape: the view name, who requests it and the query strings to cycle through."""
+
+    def __init__(self, name, url_name, urls, user=None):
+        self.name = name
+        self.url_name = url_name
+        self.urls = urls
+        self.user = user
+
+    def client(self):
+        client = Client()
+        if self.user is not None:
+            client.force_login(self.user)
+        return client
+
+
+def _deep_cursor(queryset, ordering, offset):
+    # The cursor a visitor would hold after paging past ``offset`` rows
+    return CursorPaginator(queryset, ordering, offset).page().next_cursor
+
+
+def build_scenarios(deep_offset=600, rng=None):
+    """Scenarios for the hot pages, built from whatever the database holds."""
+    rng = rng or random.Random(0)
+    User = get_user_model()
+    # The busiest seller: most listings, also used as the logged-in visitor
+    seller = User.objects.annotate(listings=Count('items')).order_by('-listings', 'pk').first()
+    trader = (
+        Conversation.objects.values('seller_id').annotate(n=Count('id')).order_by('-n').values_list('seller_id', flat=True).first()
+    )
+    trader = User.objects.get(pk=trader) if trader else seller
+
+    unsold = Item.objects.filter(is_sold=False)
+    item_ids = list(unsold.values_list('pk', flat=True)[:5000])
+    codes = list(unsold.exclude(barcode_normalized=None).values_list('barcode_normalized', flat=True)[:200])
+    categories = list(Category.objects.values_list('pk', 'name'))
+    words = [noun.lower() for nouns, _ in BULK_CATALOG.values() for noun in nouns]
+
+    def url(name, *args, **params):
+        path = reverse(name, args=args)
+        if params:
+            path += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return path
+
+    newest = ITEM_ORDERINGS['newest']
+    deep = _deep_cursor(unsold, newest, deep_offset)
+    deep_category = _deep_cursor(unsold.filter(category_id=categories[0][0]), newest, deep_offset // len(categories))
+    deep_dashboard = _deep_cursor(Item.objects.filter(seller=seller), newest, deep_offset // 10)
+
+    scenarios = [
+        Scenario('index', 'market:index', [url('market:index')]),
+        Scenario('index_logged_in', 'market:index', [url('market:index')], user=seller),
+        Scenario('browse', 'market:browse', [url('market:browse')]),
+        Scenario('browse_search', 'market:browse', [url('market:browse', query=word) for word in words]),
+        Scenario('browse_filtered', 'market:browse', [
+            url('market:browse', category=pk, condition='used_good', sort='price_asc') for pk, _ in categories
+        ]),
+        Scenario('browse_deep', 'market:browse', [url('market:browse', cursor=deep)]),
+        Scenario('browse_deep_category', 'market:browse', [url('market:browse', category=categories[0][0], cursor=deep_category)]),
+        Scenario('detail', 'market:detail', [url('market:detail', pk) for pk in rng.sample(item_ids, min(100, len(item_ids)))]),
+        Scenario('dashboard', 'market:dashboard', [url('market:dashboard')], user=seller),
+        Scenario('dashboard_deep', 'market:dashboard', [url('market:dashboard', cursor=deep_dashboard)], user=seller),
+        Scenario('inbox', 'conversation:inbox', [url('conversation:inbox')], user=trader),
+        Scenario('seller_profile', 'users:seller_profile', [url('users:seller_profile', seller.username)]),
+        Scenario('api_item_list', 'market:api_item_list', [
+            url('market:api_item_list', page_size=20),
+            url('market:api_item_list', page_size=50, sort='price_asc', fields='id,title,price'),
+        ]),
+        Scenario('api_item_lookup', 'market:api_item_lookup', [url('market:api_item_lookup', barcode=code) for code in codes]),
+    ]
+    # A cursor is None when the dataset is smaller than the requested depth
+    return [scenario for scenario in scenarios if all('cursor=None' not in u for u in scenario.urls)]
+
+
+def _get(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'{path} answered {response.status_code}')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_scenario(scenario, requests=200, warmup=5, memory_requests=5):
+    """Latency, per-request query/db/template figures and peak traced memory for one scenario."""
+    client = scenario.client()
+    for n in range(warmup):
+        _get(client, scenario.urls[n % len(scenario.urls)])
+
+    reset_url_stats()
+    latencies = []
+    for n in range(requests):
+        started = time.perf_counter()
+        _get(client, scenario.urls[n % len(scenario.urls)])
+        latencies.append(time.perf_counter() - started)
+    result = latency_summary(latencies)
+
+    stats = get_url_stats().get(scenario.url_name)
+    if stats:
+        result.update({
+            'queries_per_request': round(stats['queries'] / stats['requests'], 2),
+            'max_queries': stats['max_queries'],
+            'db_ms_mean': round(stats['db_ms'] / stats['requests'], 2),
+            'template_ms_mean': round(stats['template_ms'] / stats['requests'], 2),
+        })
+
+    if memory_requests:
+        peaks = []
+        tracemalloc.start()
+        try:
+            for n in range(memory_requests):
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                _get(client, scenario.urls[n % len(scenario.urls)])
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+        result['peak_memory_kib'] = round(max(peaks) / 1024, 1)
+    return result
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from market.loadtest import latency_summary
+from market.models import Item
+
+ENDPOINTS = ('list', 'lookup', 'batch')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and latency of the sync API endpoints and their async '
+        'counterparts at a given concurrency, in-process, against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=ENDPOINTS, action='append', help='Endpoint to benchmark (repeatable; default: all)')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        total = max(1, options['requests'])
+        concurrency = max(1, min(options['concurrency'], total))
+        codes = list(
+            Item.objects.filter(is_sold=False, barcode_normalized__isnull=False)
+            .values_list('barcode_normalized', flat=True)[:20]
+        )
+        if not codes:
+            raise CommandError('No unsold items with barcodes; run seed_market --bulk first.')
+
+        results = {}
+        # The test clients talk to 'testserver'
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for endpoint in options['endpoint'] or ENDPOINTS:
+                sync_request, async_request = self._requests(endpoint, codes)
+                results[endpoint] = {
+                    'sync': self._run_sync(sync_request, total, concurrency),
+                    'async': asyncio.run(self._run_async(async_request, total, concurrency)),
+                }
+
+        if options['json']:
+            self.stdout.write(json.dumps({'concurrency': concurrency, 'results': results}, indent=2))
+            return
+        for endpoint, modes in results.items():
+            for mode, row in modes.items():
+                self.stdout.write(
+                    f"{endpoint:<7}{mode:<6} {row['requests_per_second']:>8} req/s  "
+                    f"p50 {row['p50_ms']}ms  p95 {row['p95_ms']}ms  p99 {row['p99_ms']}ms"
+                )
+
+    def _requests(self, endpoint, codes):
+        """``(sync, async)`` callables issuing request number ``i`` with a given client."""
+        if endpoint == 'list':
+            params = {'page_size': 20}
+            sync_url, async_url = reverse('market:api_item_list'), reverse('market:api_item_list_async')
+            return (
+                lambda client, i: client.get(sync_url, params),
+                lambda client, i: client.get(async_url, params),
+            )
+        if endpoint == 'lookup':
+            sync_url, async_url = reverse('market:api_item_lookup'), reverse('market:api_item_lookup_async')
+            return (
+                lambda client, i: client.get(sync_url, {'barcode': codes[i % len(codes)]}),
+                lambda client, i: client.get(async_url, {'barcode': codes[i % len(codes)]}),
+            )
+        body = json.dumps({'barcodes': codes})
+        sync_url, async_url = reverse('market:api_item_lookup_batch'), reverse('market:api_item_lookup_batch_async')
+        return (
+            lambda client, i: client.post(sync_url, body, content_type='application/json'),
+            lambda client, i: client.post(async_url, body, content_type='application/json'),
+        )
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'{response.request["PATH_INFO"]} answered {response.status_code}')
+
+    def _run_sync(self, send, total, concurrency):
+        def worker(offset):
+            client = Client()
+            latencies = []
+            try:
+                for i in range(offset, total, concurrency):
+                    started = time.perf_counter()
+                    self._check(send(client, i))
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            return latencies
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = [value for chunk in pool.map(worker, range(concurrency)) for value in chunk]
+        return latency_summary(latencies, time.perf_counter() - started)
+
+    async def _run_async(self, send, total, concurrency):
+        # Async ORM calls still run in Django's single thread-sensitive executor
+        # thread, so the database work itself is serialized; the gain is in
+        # everything around it (cache hits, serialization, I/O waits).
+        async def worker(offset):
+            client = AsyncClient()
+            latencies = []
+            for i in range(offset, total, concurrency):
+                started = time.perf_counter()
+                self._check(await send(client, i))
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        started = time.perf_counter()
+        chunks = await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        return latency_summary([value for chunk in chunks for value in chunk], time.perf_counter() - started)
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market.similarity import build_similar_items, has_numpy
+
+
+class Command(BaseCommand):
+    help = 'Precompute the most similar items for every unsold item (needs numpy and scipy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, help='Neighbours stored per item (default: MARKET_SIMILARITY)')
+        parser.add_argument('--chunk-size', type=int, help='Rows compared per sparse matrix product')
+        parser.add_argument('--max-df', type=float, help='Ignore terms found in more than this share of items')
+
+    def handle(self, *args, **options):
+        if not has_numpy():
+            raise CommandError('numpy and scipy are required: pip install numpy scipy')
+        started = time.monotonic()
+        count = build_similar_items(
+            neighbours=options['neighbours'], max_df=options['max_df'], chunk_size=options['chunk_size'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Computed neighbours for {count} items in {elapsed:.2f}s.'))
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market.exports import EXPORT_FORMATS, export_chunks, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = 'Stream the item catalog to a CSV or NDJSON file (optionally gzipped) with flat memory use.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--format', dest='fmt', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format (default: csv)')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--updated-since', help='Only items updated after this ISO date or datetime')
+        parser.add_argument('--include-sold', action='store_true', help='Also export sold items')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched and encoded per chunk (default: 2000)')
+
+    def handle(self, *args, **options):
+        try:
+            updated_since = parse_updated_since(options['updated_since'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        chunks = export_chunks(
+            options['fmt'], updated_since, options['include_sold'], options['gzip'], max(1, options['chunk_size']),
+        )
+        started = time.monotonic()
+        written = 0
+        path = options['output']
+        out = open(path, 'wb') if path else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if path:
+                out.close()
+            else:
+                out.flush()
+        if path:
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {written} bytes to {path} in {time.monotonic() - started:.1f}s.'
+            ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from market.models import Item
+from market.thumbnails import generate_thumbnails, thumbnails_stale
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnail variants for item images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants even if they are up to date')
+
+    def handle(self, *args, **options):
+        items = Item.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'thumbnails')
+        started = time.monotonic()
+        done = skipped = 0
+        for item in items.iterator(chunk_size=500):
+            if not options['force'] and not thumbnails_stale(item):
+                skipped += 1
+                continue
+            # Inline on purpose: the command is the batch worker
+            generate_thumbnails(item.pk)
+            done += 1
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated thumbnails for {done} items ({skipped} up to date) in {elapsed:.2f}s.'
+        ))
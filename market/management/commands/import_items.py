@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from market.imports import detect_format, import_items
+
+
+class Command(BaseCommand):
+    help = 'Create or update a seller\'s items from a CSV or JSON Lines file, upserting on barcode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a .jsonl/.ndjson file')
+        parser.add_argument('--seller', required=True, help='Username that will own the items')
+        parser.add_argument('--format', dest='fmt', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, help='Rows written per transaction (default: MARKET_IMPORT BATCH_SIZE)')
+        parser.add_argument('--max-errors', type=int, default=50, help='Row errors to print (default: 50)')
+
+    def handle(self, *args, **options):
+        seller = get_user_model().objects.filter(username=options['seller']).first()
+        if seller is None:
+            raise CommandError(f"Unknown user: {options['seller']}")
+        fmt = options['fmt'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                report = import_items(fh, fmt, seller, batch_size=options['batch_size'], max_errors=options['max_errors'])
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+        for error in report.errors:
+            messages = '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {messages}"))
+        if report.error_count > len(report.errors):
+            self.stdout.write(self.style.WARNING(f'... and {report.error_count - len(report.errors)} more errors'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.rows} rows in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s): '
+            f'{report.created} created, {report.updated} updated, {report.error_count} rejected.'
+        ))
+        if report.error:
+            raise CommandError(f'{options["path"]}: {report.error}')
@@ -0,0 +1,85 @@
+import json
+import platform
+import random
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from core.middleware import metrics_settings
+from market.loadtest import DATASET_DEFAULTS, build_scenarios, generate_dataset, run_scenario
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset in a throwaway test database, drive the hot pages and '
+        'API endpoints through the test client, and report latency percentiles, queries per '
+        'request and peak memory as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DATASET_DEFAULTS.items():
+            per = {'wishlists': ' per user', 'messages': ' per conversation'}.get(name, '')
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'Synthetic {name}{per} (default: {default})')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset (default: 0)')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario (default: 200)')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario first (default: 5)')
+        parser.add_argument('--memory-requests', type=int, default=5, help='Requests per scenario traced for peak memory; 0 skips (default: 5)')
+        parser.add_argument('--deep-offset', type=int, default=600, help='Rows skipped by the deep-page scenarios (default: 600)')
+        parser.add_argument('--scenario', action='append', help='Only run this scenario (repeatable)')
+        parser.add_argument('--output', '-o', help='Write the JSON report to this file (default: stdout)')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in DATASET_DEFAULTS}
+        # Every request is measured; statement logging would only add overhead
+        metrics = {**metrics_settings(), 'ENABLED': True, 'SAMPLE_RATE': 1.0, 'LOG_OVER_BUDGET': False, 'RECORD_STATEMENTS': False}
+
+        with override_settings(ALLOWED_HOSTS=['testserver'], REQUEST_METRICS=metrics):
+            old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+            try:
+                for alias in settings.CACHES:
+                    caches[alias].clear()
+                self.stderr.write('Generating dataset...')
+                dataset = generate_dataset(seed=options['seed'], **sizes)
+                scenarios = build_scenarios(options['deep_offset'], random.Random(options['seed']))
+                if options['scenario']:
+                    unknown = set(options['scenario']) - {s.name for s in scenarios}
+                    if unknown:
+                        raise CommandError(f'Unknown scenario(s): {", ".join(sorted(unknown))}')
+                    scenarios = [s for s in scenarios if s.name in options['scenario']]
+
+                results = {}
+                for scenario in scenarios:
+                    self.stderr.write(f'  {scenario.name}')
+                    try:
+                        results[scenario.name] = run_scenario(
+                            scenario, max(1, options['requests']), max(0, options['warmup']),
+                            max(0, options['memory_requests']),
+                        )
+                    except RuntimeError as exc:
+                        raise CommandError(str(exc))
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'options': {
+                name: options[name]
+                for name in ('seed', 'requests', 'warmup', 'memory_requests', 'deep_offset')
+            },
+            'dataset': dataset,
+            'scenarios': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(text + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Wrote report to {options["output"]}'))
+        else:
+            self.stdout.write(text)
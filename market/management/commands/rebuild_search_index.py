@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from market.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all market items in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        started = time.monotonic()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} items with {backend.__class__.__name__} in {elapsed:.2f}s.'
+        ))
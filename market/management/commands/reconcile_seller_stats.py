@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from market.models import Item, SellerStats
+from market.stats import STAT_FIELDS, clean_totals, stat_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-seller dashboard stats from the items table and repair any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seller', help='Only reconcile this username')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+
+    def handle(self, *args, **options):
+        items = Item.objects.all()
+        stats = SellerStats.objects.all()
+        if options['seller']:
+            user = get_user_model().objects.filter(username=options['seller']).first()
+            if user is None:
+                raise CommandError(f"Unknown user: {options['seller']}")
+            items = items.filter(seller=user)
+            stats = stats.filter(seller=user)
+
+        # One grouped aggregate for every seller instead of one query each
+        actual = {
+            row['seller_id']: clean_totals(row)
+            for row in items.values('seller_id').annotate(**stat_aggregates()).order_by()
+        }
+        stored = {row['seller_id']: clean_totals(row) for row in stats.values('seller_id', *STAT_FIELDS)}
+        empty = clean_totals({})
+
+        to_create, to_update = [], []
+        for seller_id in actual.keys() | stored.keys():
+            expected = actual.get(seller_id, empty)
+            current = stored.get(seller_id)
+            if current is None:
+                to_create.append(SellerStats(seller_id=seller_id, **expected))
+            elif current != expected:
+                self.stdout.write(self.style.WARNING(f'Seller {seller_id}: {current} -> {expected}'))
+                to_update.append(SellerStats(seller_id=seller_id, **expected))
+
+        if not options['dry_run']:
+            SellerStats.objects.bulk_create(to_create, batch_size=1000)
+            SellerStats.objects.bulk_update(to_update, STAT_FIELDS, batch_size=1000)
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(actual.keys() | stored.keys())} sellers. {verb} {len(to_update)}, created {len(to_create)}.'
+        ))
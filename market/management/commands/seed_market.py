@@ -9,12 +9,35 @@ import random
 import urllib.request
 import json
 
-from django.core.management.base import BaseCommand
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.conf import settings
+from django.db import transaction
 from django.utils.text import slugify
 
-from market.models import Category, Item
+from market.cards import invalidate_cards
+from market.catalog_stamp import touch_catalog
+from market.facets import invalidate_facets
+from market.models import Category, Item, normalize_barcode
+from market.search import get_backend
+from market.stats import refresh_seller_stats
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+# Vocabulary and price ranges for --bulk synthetic items
+BULK_CATALOG = {
+    'Electronics': (['Headphones', 'Phone', 'Tablet', 'Camera', 'Speaker', 'Charger', 'Monitor', 'Keyboard'], (20, 300)),
+    'Books': (['Novel', 'Cookbook', 'Textbook', 'Biography', 'Comic', 'Atlas', 'Guide', 'Anthology'], (5, 60)),
+    'Clothing': (['Jacket', 'Shirt', 'Jeans', 'Sneakers', 'Dress', 'Hoodie', 'Scarf', 'Boots'], (10, 120)),
+    'Home': (['Lamp', 'Chair', 'Kettle', 'Rug', 'Mirror', 'Blender', 'Shelf', 'Vase'], (8, 150)),
+    'Toys': (['Puzzle', 'Robot', 'Doll', 'Blocks', 'Kite', 'Drone', 'Train Set', 'Board Game'], (5, 80)),
+}
+BULK_ADJECTIVES = ['Vintage', 'Compact', 'Classic', 'Wireless', 'Handmade', 'Deluxe', 'Refurbished', 'Portable', 'Rare', 'Modern']
 
 
 class Command(BaseCommand):
@@ -25,6 +48,12 @@ class Command(BaseCommand):
         parser.add_argument('--api-url', help='Custom API URL that returns a JSON array of products')
         parser.add_argument('--remove-local', action='store_true', help='Remove the first 20 locally seeded placeholder items per category')
         parser.add_argument('--per-category', action='store_true', help='Fetch products from the API separately for each existing Category')
+        parser.add_argument('--bulk', type=int, metavar='N', help='Insert N synthetic items with bulk_create (for load-test databases)')
+        parser.add_argument('--image-dir', help='With --bulk: reuse images from this local directory instead of downloading (no network)')
+        parser.add_argument('--images', type=int, default=50, help='With --bulk: number of distinct images to download (default: 50)')
+        parser.add_argument('--sellers', type=int, default=1, help='With --bulk: spread items over this many seller accounts (default: 1)')
+        parser.add_argument('--workers', type=int, default=8, help='With --bulk: concurrent image downloads/copies (default: 8)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='With --bulk: rows inserted per transaction (default: 5000)')
 
     def handle(self, *args, **options):
         User = get_user_model()
@@ -39,6 +68,10 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS(f'Using existing user: {user.username}'))
 
+        if options.get('bulk'):
+            self._seed_bulk(user, options)
+            return
+
         # If remove-local flag passed, delete the placeholder items
         if options.get('remove_local'):
             self._remove_local_seed(user)
@@ -121,6 +154,169 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS('Seeding complete.'))
 
+    def _seed_bulk(self, user, options):
+        """Inserts ``--bulk`` synthetic items as fast as the database allows.
+
+        Images are fetched (or copied from ``--image-dir``) once into a small
+        pool by a bounded thread pool and shared between items. The pool fills
+        while rows go in with ``bulk_create``, one transaction per batch, and
+        are added to the search index in the same transaction since
+        ``bulk_create`` skips save signals. Images are then attached with
+        ``bulk_update``, so inserts never wait on the network. Seller dashboard
+        totals, facet counts, cached cards and the catalog stamp are refreshed
+        at the end. Thumbnails are left to the lazy backfill (or
+        ``generate_thumbnails``).
+        """
+        total = options['bulk']
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+
+        categories = []
+        for name in BULK_CATALOG:
+            cat, _ = Category.objects.get_or_create(slug=slugify(name), defaults={'name': name})
+            categories.append(cat)
+
+        sellers = [user] + self._bulk_sellers(options['sellers'] - 1)
+        jobs = self._bulk_image_jobs(options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeding {total} items over {len(sellers)} sellers, fetching {len(jobs)} images...'
+        ))
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            fetches = [pool.submit(fetch, src, dest) for fetch, src, dest in jobs]
+            item_ids = self._bulk_insert(total, batch_size, categories, sellers, started)
+            images = self._bulk_images(jobs, [future.result() for future in fetches])
+        if images:
+            self._bulk_attach_images(item_ids, images, batch_size)
+
+        # Bulk writes bypass the signals and views that keep these current
+        for seller in sellers:
+            refresh_seller_stats(seller.pk)
+        invalidate_facets()
+        invalidate_cards()
+        touch_catalog()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Bulk seeding complete: {len(item_ids)} items in {elapsed:.1f}s.'))
+
+    def _bulk_insert(self, total, batch_size, categories, sellers, started):
+        """Inserts ``total`` items without images; returns their ids in creation order."""
+        backend = get_backend()
+        # Barcodes are unique: give every run its own prefix
+        run = f'{int(time.time()) % 10 ** 8:08d}'
+        conditions = [choice for choice, _ in Item.CONDITION_CHOICES]
+        item_ids = []
+        created = 0
+        while created < total:
+            batch = []
+            for n in range(created, min(created + batch_size, total)):
+                cat = categories[n % len(categories)]
+                nouns, (low, high) = BULK_CATALOG.get(cat.name, BULK_CATALOG['Toys'])
+                noun = random.choice(nouns)
+                adjective = random.choice(BULK_ADJECTIVES)
+                barcode = f'99{run}{n:09d}'
+                batch.append(Item(
+                    seller=sellers[n % len(sellers)],
+                    category=cat,
+                    title=f'{adjective} {noun} #{n + 1}',
+                    description=f'{adjective} {noun.lower()} in the {cat.name.lower()} section, bulk sample #{n + 1}.',
+                    price=Decimal(str(round(random.uniform(low, high), 2))),
+                    barcode=barcode,
+                    barcode_normalized=normalize_barcode(barcode),
+                    condition=random.choice(conditions),
+                    is_sold=random.random() < 0.1,
+                ))
+            with transaction.atomic():
+                Item.objects.bulk_create(batch, batch_size=batch_size)
+                backend.index_items(batch)
+            item_ids.extend(item.pk for item in batch)
+            created += len(batch)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  {created}/{total} items ({created / elapsed:.0f} rows/s)')
+        return item_ids
+
+    def _bulk_attach_images(self, item_ids, images, batch_size):
+        """Gives item number ``n`` image ``n % len(images)`` with one ``bulk_update`` per batch."""
+        for start in range(0, len(item_ids), batch_size):
+            Item.objects.bulk_update(
+                [
+                    Item(pk=pk, image=images[n % len(images)])
+                    for n, pk in enumerate(item_ids[start:start + batch_size], start)
+                ],
+                ['image'],
+            )
+        self.stdout.write(f'  attached {len(images)} images to {len(item_ids)} items')
+
+    def _bulk_sellers(self, count):
+        """Returns ``count`` seller accounts, creating the missing ones in one query."""
+        User = get_user_model()
+        if count <= 0:
+            return []
+        usernames = [f'bulkseller{i}' for i in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Hashing is deliberately slow, so every account shares one hash
+        password = make_password('password123')
+        User.objects.bulk_create([
+            User(username=name, email=f'{name}@example.com', password=password, is_seller=True)
+            for name in usernames if name not in existing
+        ], batch_size=1000)
+        return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+    def _bulk_image_jobs(self, options):
+        """``(fetch, source, destination)`` for every image of the shared pool."""
+        seed_dir = os.path.join(settings.MEDIA_ROOT, 'item_images', 'seed')
+        os.makedirs(seed_dir, exist_ok=True)
+
+        image_dir = options.get('image_dir')
+        if image_dir:
+            if not os.path.isdir(image_dir):
+                raise CommandError(f'Image directory not found: {image_dir}')
+            sources = sorted(
+                os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not sources:
+                raise CommandError(f'No images found in {image_dir}')
+            jobs = [(self._copy_image, src, os.path.join(seed_dir, os.path.basename(src))) for src in sources]
+        else:
+            jobs = [
+                (self._download_image, f'https://picsum.photos/seed/bulk-{i}/800/600', os.path.join(seed_dir, f'bulk-{i}.jpg'))
+                for i in range(1, options['images'] + 1)
+            ]
+        return jobs
+
+    def _bulk_images(self, jobs, results):
+        """The storage names of the images that were fetched."""
+        failed = results.count(False)
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} of {len(jobs)} images could not be fetched'))
+        return [
+            f'item_images/seed/{os.path.basename(dest)}'
+            for (_, _, dest), ok in zip(jobs, results) if ok
+        ]
+
+    @staticmethod
+    def _copy_image(src, dest):
+        try:
+            if not os.path.exists(dest):
+                shutil.copyfile(src, dest)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _download_image(url, dest):
+        if os.path.exists(dest):
+            return True
+        try:
+            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (seed-script)'})
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                data = resp.read()
+            with open(dest, 'wb') as out_f:
+                out_f.write(data)
+            return True
+        except Exception:
+            return False
+
     def _remove_local_seed(self, user):
         """Removes the placeholder items seeded locally (titles like "<Category> Item N").
 
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+FTS_TABLE = 'market_item_fts'
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 only exists on SQLite; other databases use BasicSearchBackend.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, category, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, description, category) "
+        "SELECT i.id, i.title, i.description, COALESCE(c.name, '') "
+        "FROM market_item i LEFT JOIN market_category c ON c.id = i.category_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0004_item_barcode'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
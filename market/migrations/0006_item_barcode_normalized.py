@@ -0,0 +1,52 @@
+import re
+
+from django.db import migrations, models
+
+BARCODE_STRIP_RE = re.compile(r'[\s\-]+')
+
+
+def normalize_barcode(code):
+    if code is None:
+        return None
+    code = BARCODE_STRIP_RE.sub('', str(code)).casefold()
+    return code or None
+
+
+def backfill_barcode_normalized(apps, schema_editor):
+    Item = apps.get_model('market', 'Item')
+    seen = set()
+    batch = []
+    # Oldest listing keeps a duplicated code; later duplicates stay unindexed
+    for item in Item.objects.exclude(barcode__isnull=True).exclude(barcode='').order_by('id').iterator():
+        code = normalize_barcode(item.barcode)
+        if code is None or code in seen:
+            continue
+        seen.add(code)
+        item.barcode_normalized = code
+        batch.append(item)
+        if len(batch) >= 1000:
+            Item.objects.bulk_update(batch, ['barcode_normalized'])
+            batch = []
+    if batch:
+        Item.objects.bulk_update(batch, ['barcode_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0005_item_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='barcode_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=128, null=True),
+        ),
+        migrations.RunPython(backfill_barcode_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='item',
+            name='barcode_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=128, null=True, unique=True),
+        ),
+    ]
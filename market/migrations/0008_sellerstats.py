@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_seller_stats(apps, schema_editor):
+    Item = apps.get_model('market', 'Item')
+    SellerStats = apps.get_model('market', 'SellerStats')
+    rows = Item.objects.values('seller_id').annotate(
+        total_items=Count('id'),
+        sold_items=Count('id', filter=Q(is_sold=True)),
+        revenue=Sum('price', filter=Q(is_sold=True)),
+        potential_revenue=Sum('price', filter=Q(is_sold=False)),
+    )
+    SellerStats.objects.bulk_create([
+        SellerStats(
+            seller_id=row['seller_id'],
+            total_items=row['total_items'],
+            sold_items=row['sold_items'],
+            revenue=row['revenue'] or 0,
+            potential_revenue=row['potential_revenue'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0007_item_thumbnails'),
+        ('users', '0004_sellerrating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerStats',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='market_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_items', models.PositiveIntegerField(default=0)),
+                ('sold_items', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('potential_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Seller stats',
+            },
+        ),
+        migrations.RunPython(backfill_seller_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0008_sellerstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='market.item')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='market.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'rank'], name='market_simi_item_id_967d57_idx')],
+                'unique_together': {('item', 'similar')},
+            },
+        ),
+    ]
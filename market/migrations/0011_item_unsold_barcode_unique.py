@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:15
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+BARCODE_STRIP_RE = re.compile(r'[\s\-]+')
+
+
+def normalize_barcode(code):
+    if code is None:
+        return None
+    code = BARCODE_STRIP_RE.sub('', str(code)).casefold()
+    return code or None
+
+
+def backfill_unindexed_barcodes(apps, schema_editor):
+    # 0006 left later duplicates NULL. Sold rows no longer compete for the code;
+    # an unsold duplicate is indexed only if no other unsold item holds it.
+    Item = apps.get_model('market', 'Item')
+    taken = set(
+        Item.objects.filter(is_sold=False).exclude(barcode_normalized=None).values_list('barcode_normalized', flat=True)
+    )
+    batch = []
+    for item in Item.objects.filter(barcode_normalized=None).exclude(barcode=None).exclude(barcode='').order_by('id').iterator():
+        code = normalize_barcode(item.barcode)
+        if code is None or (not item.is_sold and code in taken):
+            continue
+        if not item.is_sold:
+            taken.add(code)
+        item.barcode_normalized = code
+        batch.append(item)
+        if len(batch) >= 1000:
+            Item.objects.bulk_update(batch, ['barcode_normalized'])
+            batch = []
+    if batch:
+        Item.objects.bulk_update(batch, ['barcode_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0010_item_listing_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='barcode_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=128, null=True),
+        ),
+        migrations.RunPython(backfill_unindexed_barcodes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_sold', False)), fields=('barcode_normalized',), name='item_unsold_barcode_uniq'),
+        ),
+    ]
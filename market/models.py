@@ -1,6 +1,20 @@
+import re
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.db import models
 from django.conf import settings
 
+BARCODE_STRIP_RE = re.compile(r'[\s\-]+')
+
+
+def normalize_barcode(code):
+    """Canonical lookup form of a barcode: no spaces or dashes, case-folded. Blank -> None."""
+    if code is None:
+        return None
+    code = BARCODE_STRIP_RE.sub('', str(code)).casefold()
+    return code or None
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
@@ -25,16 +39,107 @@ class Item(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     barcode = models.CharField(max_length=128, blank=True, null=True, db_index=True)
+    # Filled from `barcode` on save; unique among unsold items (see Meta.constraints), so a
+    # sold listing does not block relisting the same product
+    barcode_normalized = models.CharField(max_length=128, blank=True, null=True, editable=False)
     image = models.ImageField(upload_to='item_images/', blank=True, null=True)
+    # Generated variants, see market/thumbnails.py: {'src': <image name>, '<variant>': <file name>}
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='used_good')
     is_sold = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Listing access paths (browse, index, API): unsold items by newest or by price,
+            # optionally within one category. Partial where the database supports it.
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_sold=False), name='item_unsold_newest_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_sold=False), name='item_unsold_price_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], condition=models.Q(is_sold=False), name='item_unsold_cat_newest_idx'),
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(is_sold=False), name='item_unsold_cat_price_idx'),
+            # Seller pages: the dashboard (all items) and the storefront (unsold)
+            models.Index(fields=['seller', 'created_at', 'id'], name='item_seller_newest_idx'),
+            models.Index(fields=['seller', 'created_at', 'id'], condition=models.Q(is_sold=False), name='item_seller_unsold_idx'),
+            # Newest change (catalog stamp seed) and export ``updated_since``
+            models.Index(fields=['updated_at'], name='item_updated_idx'),
+        ]
+        constraints = [
+            # Barcode lookups only consider unsold items; this is also their index
+            models.UniqueConstraint(
+                fields=['barcode_normalized'], condition=models.Q(is_sold=False), name='item_unsold_barcode_uniq',
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
+    def barcode_conflict(self):
+        """Another unsold item with this item's normalized barcode, or None."""
+        code = normalize_barcode(self.barcode)
+        if code is None or self.is_sold:
+            return None
+        return Item.objects.filter(barcode_normalized=code, is_sold=False).exclude(pk=self.pk).first()
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude=exclude)
+        # ``barcode_normalized`` is not editable, so forms skip its constraint; check the source field
+        if self.barcode_conflict() is not None:
+            key = NON_FIELD_ERRORS if exclude and 'barcode' in exclude else 'barcode'
+            raise ValidationError({key: ValidationError('Another active listing already uses this barcode.', code='unique')})
+
+    def save(self, *args, **kwargs):
+        # Remember the old code so the barcode lookup cache can drop both entries
+        self._previous_barcode_normalized = self.barcode_normalized
+        self.barcode_normalized = normalize_barcode(self.barcode)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'barcode' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'barcode_normalized'}
+        super().save(*args, **kwargs)
+
+
+class SellerStats(models.Model):
+    """Per-seller dashboard totals, kept current by ``market.stats``.
+
+    Updated with ``F()`` expressions in the same transaction as the item
+    write, so the dashboard header is a single-row read. Run
+    ``reconcile_seller_stats`` to repair drift after raw SQL or bulk loads.
+    """
+    seller = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='market_stats')
+    total_items = models.PositiveIntegerField(default=0)
+    sold_items = models.PositiveIntegerField(default=0)
+    # Sum of prices of sold items / of items still for sale
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    potential_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Seller stats"
+
+    def __str__(self):
+        return f"{self.seller_id}: {self.sold_items}/{self.total_items} sold"
+
+    @property
+    def active_items(self):
+        return self.total_items - self.sold_items
+
+
+class SimilarItem(models.Model):
+    """Precomputed nearest neighbours of an item, see market/similarity.py."""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='neighbours')
+    similar = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+    # 1 = most similar
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('item', 'similar')
+        indexes = [models.Index(fields=['item', 'rank'])]
+
+    def __str__(self):
+        return f"{self.item_id} ~ {self.similar_id} ({self.score:.3f})"
+
 
 # NEW: Wishlist Model
 class Wishlist(models.Model):
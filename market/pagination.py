@@ -0,0 +1,231 @@
+"""Keyset (cursor) pagination.
+
+``Paginator`` needs a ``COUNT(*)`` and an ``OFFSET`` scan, so deep pages get
+slower the further a visitor (or crawler) walks. ``CursorPaginator`` instead
+remembers the sort key of the last row shown and asks for the rows after
+it, so every page costs the same as the first one.
+
+Cursors are opaque URL-safe strings; a broken or tampered cursor simply
+falls back to the first page, like ``Paginator.get_page`` does.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Orderings shared by browse and the items API. The last field must be unique.
+ITEM_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'relevance': ('search_rank', '-id'),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': [_dump_value(v) for v in values], 'r': int(reverse)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload['v']), bool(payload.get('r'))
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(str(exc))
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginates ``queryset`` by ``ordering`` (e.g. ``('-created_at', '-id')``).
+
+    ``with_count`` adds the total row count to each page; leave it off for
+    pages that do not display it, since it is the one query that still grows
+    with the size of the result set.
+    """
+
+    def __init__(self, queryset, ordering, per_page, with_count=False):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.with_count = with_count
+        self.fields = [(f.lstrip('-'), f.startswith('-')) for f in self.ordering]
+
+    def _keyset_filter(self, values, reverse):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), per field direction
+        clauses = []
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {field: value for (field, _), value in zip(self.fields[:i], values)}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        return reduce(or_, clauses)
+
+    def _output_field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        model = self.queryset.model
+        *path, last = name.split('__')
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(last)
+
+    def _coerce(self, values):
+        """Cursor values as the ordering fields' Python types; a tampered cursor raises InvalidCursor."""
+        if len(values) != len(self.fields):
+            raise InvalidCursor('cursor does not match ordering')
+        coerced = []
+        for (name, _), value in zip(self.fields, values):
+            if value is None or isinstance(value, (dict, list)):
+                raise InvalidCursor(f'bad value for {name}')
+            try:
+                coerced.append(self._output_field(name).to_python(value))
+            except (ValidationError, TypeError, ValueError) as exc:
+                raise InvalidCursor(f'bad value for {name}') from exc
+        return coerced
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields]
+
+    def _page_query(self, cursor):
+        """``(sliced queryset, cursor values, reverse)`` for the page after ``cursor``."""
+        values, reverse = None, False
+        if cursor:
+            try:
+                values, reverse = decode_cursor(cursor)
+                values = self._coerce(values)
+            except InvalidCursor:
+                values, reverse = None, False
+
+        queryset = self.queryset
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, reverse))
+        return queryset.order_by(*ordering)[:self.per_page + 1], values, reverse
+
+    def page(self, cursor=None):
+        queryset, values, reverse = self._page_query(cursor)
+        count = self.queryset.count() if self.with_count else None
+        return self._make_page(list(queryset), values, reverse, count)
+
+    async def apage(self, cursor=None):
+        """Async ``page`` for async views."""
+        queryset, values, reverse = self._page_query(cursor)
+        rows = [obj async for obj in queryset]
+        count = await self.queryset.acount() if self.with_count else None
+        return self._make_page(rows, values, reverse, count)
+
+    def _make_page(self, rows, values, reverse, count):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if (has_more and not reverse) or (reverse and values is not None):
+                next_cursor = encode_cursor(self._values(rows[-1]))
+            if (values is not None and not reverse) or (reverse and has_more):
+                previous_cursor = encode_cursor(self._values(rows[0]), reverse=True)
+
+        return CursorPage(rows, next_cursor, previous_cursor, count=count)
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination class that wraps ``CursorPaginator``."""
+
+    page_size = 20
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=ITEM_ORDERINGS['newest'], with_count=False):
+        self.ordering = ordering
+        self.with_count = with_count
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _paginator(self, queryset, request):
+        # ``request.GET`` so plain Django requests (async views) work as well
+        self.request = request
+        return CursorPaginator(queryset, self.ordering, self.get_page_size(request), with_count=self.with_count)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page = self._paginator(queryset, request).page(request.GET.get(self.cursor_query_param))
+        return self.page.object_list
+
+    async def apaginate_queryset(self, queryset, request):
+        self.page = await self._paginator(queryset, request).apage(request.GET.get(self.cursor_query_param))
+        return self.page.object_list
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_data(self, data):
+        body = {
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'next_cursor': self.page.next_cursor,
+            'previous_cursor': self.page.previous_cursor,
+        }
+        if self.page.count is not None:
+            body['count'] = self.page.count
+        body['results'] = data
+        return body
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
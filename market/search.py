@@ -0,0 +1,231 @@
+"""Full-text search for market listings.
+
+Views never build search filters themselves; they hand a queryset and the
+raw user query to ``search_items`` and get back a filtered queryset
+annotated with ``search_rank`` (lower is more relevant). By default every
+token must match; ``match_any=True`` matches items with at least one token
+(used to gather candidates for ``market.similarity``).
+
+The engine is pluggable through the ``MARKET_SEARCH_BACKEND`` setting:
+
+- ``market.search.SQLiteFTSBackend`` keeps an FTS5 virtual table in sync
+  with ``Item`` (see ``market.signals``) and ranks matches with bm25. The
+  match runs once per query, joined to the items on rowid.
+- ``market.search.BasicSearchBackend`` needs no index and falls back to
+  ``icontains`` lookups, for databases without FTS5.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import Expression
+from django.db.models.sql.constants import INNER
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class _RankJoin:
+    """``INNER JOIN (<match subquery>) <alias> ON <alias>.rowid = <parent>.<pk>``.
+
+    Implements the parts of ``django.db.models.sql.datastructures.Join``
+    that the query compiler uses, so the match subquery can be joined like
+    a table and relabeled when the queryset is nested in another query.
+    """
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+    table_name = 'search_match'
+
+    def __init__(self, sql, params, parent_alias, pk_column, table_alias=None):
+        self.sql = sql
+        self.params = tuple(params)
+        self.parent_alias = parent_alias
+        self.pk_column = pk_column
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        alias = qn(self.table_alias)
+        return (
+            f'{self.join_type} ({self.sql}) {alias} '
+            f'ON ({alias}.rowid = {qn(self.parent_alias)}.{qn(self.pk_column)})'
+        ), list(self.params)
+
+    def relabeled_clone(self, change_map):
+        clone = self.__class__(
+            self.sql, self.params, change_map.get(self.parent_alias, self.parent_alias),
+            self.pk_column, change_map.get(self.table_alias, self.table_alias),
+        )
+        clone.join_type = self.join_type
+        return clone
+
+    @property
+    def identity(self):
+        return self.__class__, self.sql, self.params, self.parent_alias, self.table_alias
+
+    def __eq__(self, other):
+        if not isinstance(other, _RankJoin):
+            return NotImplemented
+        return self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+    def demote(self):
+        return self.relabeled_clone({})
+
+    def promote(self):
+        # Matching is the filter; the join never becomes optional
+        return self.relabeled_clone({})
+
+
+class _RankRef(Expression):
+    """The ``rank`` column of a ``_RankJoin``; follows the join when aliases change."""
+    output_field = FloatField()
+
+    def __init__(self, alias):
+        super().__init__()
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.rank', []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+def tokenize(text):
+    """Split a user query into lowercase word tokens."""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class BasicSearchBackend:
+    """Index-free backend: tokens must appear in a searchable field."""
+
+    def search(self, queryset, query, match_any=False):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        clauses = [
+            Q(title__icontains=token) | Q(description__icontains=token) | Q(category__name__icontains=token)
+            for token in tokens
+        ]
+        if match_any:
+            queryset = queryset.filter(reduce(or_, clauses))
+        else:
+            for clause in clauses:
+                queryset = queryset.filter(clause)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_items(self, items):
+        pass
+
+    def index_queryset(self, queryset, batch_size=1000):
+        return 0
+
+    def remove_items(self, item_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        return 0
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    """FTS5-backed backend. The index rowid is the ``Item`` primary key."""
+
+    table = 'market_item_fts'
+    # bm25 column weights: title, description, category
+    weights = (10.0, 1.0, 5.0)
+
+    def match_expression(self, query, match_any=False):
+        # Quote every token so user input can never be parsed as FTS syntax,
+        # and prefix-match so results show up while the user is still typing.
+        return (' OR ' if match_any else ' ').join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query, match_any=False):
+        match = self.match_expression(query, match_any=match_any)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(w) for w in self.weights)
+        # One MATCH for the whole query, joined on rowid; the inner join is also the filter
+        queryset = queryset.all()
+        alias = queryset.query.join(_RankJoin(
+            f'SELECT rowid, bm25({self.table}, {weights}) AS rank FROM {self.table} WHERE {self.table} MATCH %s',
+            (match,),
+            queryset.query.get_initial_alias(),
+            queryset.model._meta.pk.column,
+        ))
+        return queryset.annotate(search_rank=_RankRef(alias))
+
+    def _write_rows(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {self.table} (rowid, title, description, category) VALUES (%s, %s, %s, %s)',
+            [(pk, title, description or '', category or '') for pk, title, description, category in rows],
+        )
+
+    def index_items(self, items):
+        rows = [
+            (item.pk, item.title, item.description, item.category.name if item.category_id else '')
+            for item in items
+        ]
+        if rows:
+            with connection.cursor() as cursor:
+                self._write_rows(cursor, rows)
+
+    def index_queryset(self, queryset, batch_size=1000):
+        """Re-index every item in ``queryset`` in batches; returns the row count."""
+        values = queryset.values_list('id', 'title', 'description', 'category__name')
+        count = 0
+        batch = []
+        with connection.cursor() as cursor:
+            for row in values.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._write_rows(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self._write_rows(cursor, batch)
+                count += len(batch)
+        return count
+
+    def remove_items(self, item_ids):
+        item_ids = [(pk,) for pk in item_ids if pk is not None]
+        if item_ids:
+            with connection.cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', item_ids)
+
+    def rebuild(self, batch_size=1000):
+        from .models import Item
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        count = self.index_queryset(Item.objects.order_by('id'), batch_size=batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return count
+
+
+_backend = None
+
+
+def get_backend():
+    """Returns the configured search backend instance (created once per process)."""
+    global _backend
+    path = getattr(settings, 'MARKET_SEARCH_BACKEND', 'market.search.SQLiteFTSBackend')
+    if _backend is None or _backend.__class__.__module__ + '.' + _backend.__class__.__name__ != path:
+        _backend = import_string(path)()
+    return _backend
+
+
+def search_items(queryset, query, match_any=False):
+    """Filters ``queryset`` down to items matching ``query``, annotated with ``search_rank``."""
+    return get_backend().search(queryset, query, match_any=match_any)
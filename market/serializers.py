@@ -1,7 +1,23 @@
 from rest_framework import serializers
 from .models import Item
 
-class ItemSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """Lets callers pick a subset of fields: ``ItemSerializer(item, fields=['id', 'title'])``.
+
+    Unknown names are ignored; an empty selection keeps every field.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            allowed = set(fields) & set(self.fields)
+            if allowed:
+                for name in set(self.fields) - allowed:
+                    self.fields.pop(name)
+
+
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Item
         # These are the fields the Mobile App will see
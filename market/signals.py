@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .barcodes import barcode_cache
+from .cards import invalidate_cards
+from .catalog_stamp import touch_catalog
+from .categories import invalidate_catalog
+from .facets import invalidate_facets
+from .models import Category, Item, Wishlist
+from .search import get_backend
+from .similarity import update_item_neighbours
+from .tasks import submit_on_commit
+from .thumbnails import queue_thumbnails, thumbnails_stale
+from .wishlists import invalidate_wishlist
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_backend().index_items([instance])
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    get_backend().remove_items([instance.pk])
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_barcode_cache(sender, instance, using, **kwargs):
+    # After commit, or a concurrent lookup could cache the old row until the TTL expires
+    codes = (instance.barcode_normalized, getattr(instance, '_previous_barcode_normalized', None))
+    transaction.on_commit(lambda: barcode_cache.invalidate(*codes), using=using)
+
+
+@receiver(post_save, sender=Item)
+def refresh_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw and thumbnails_stale(instance):
+        queue_thumbnails(instance, on_commit=True)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_item_facets(sender, instance, using, **kwargs):
+    # After commit, or a concurrent browse could cache the old counts under the new generation
+    transaction.on_commit(invalidate_facets, using=using)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def touch_item_catalog(sender, instance, using, **kwargs):
+    # The items API and export revalidate against this stamp
+    transaction.on_commit(touch_catalog, using=using)
+
+
+@receiver(post_save, sender=Item)
+def refresh_similar_items(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Only content changes move an item's neighbours (not e.g. mark_sold)
+    if raw or instance.is_sold:
+        return
+    if created or update_fields is None or {'title', 'description', 'price', 'condition', 'category'} & set(update_fields):
+        submit_on_commit(update_item_neighbours, instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, raw=False, **kwargs):
+    # The category name is part of every item's searchable text
+    if raw or created:
+        return
+    get_backend().index_queryset(Item.objects.filter(category=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_items(sender, instance, **kwargs):
+    # Items are detached with SET_NULL (a plain UPDATE, no signals), so note them now
+    instance._search_item_ids = list(instance.items.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_orphaned_items(sender, instance, **kwargs):
+    item_ids = getattr(instance, '_search_item_ids', None)
+    if item_ids:
+        get_backend().index_queryset(Item.objects.filter(id__in=item_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_caches(sender, instance, using, raw=False, **kwargs):
+    # After commit, or another request could reload the old rows under the new version
+    transaction.on_commit(invalidate_catalog, using=using)
+    # Deleting a category detaches its items without item signals
+    transaction.on_commit(invalidate_facets, using=using)
+    # Exported rows carry the category name
+    transaction.on_commit(touch_catalog, using=using)
+    # Cards show the category name, which is not part of their cache key
+    if not raw:
+        transaction.on_commit(invalidate_cards, using=using)
+
+
+@receiver(post_save, sender=Wishlist)
+def cache_wishlist_added(sender, instance, created, using, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: invalidate_wishlist(instance.user_id), using=using)
+
+
+@receiver(post_delete, sender=Wishlist)
+def cache_wishlist_removed(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: invalidate_wishlist(instance.user_id), using=using)
@@ -0,0 +1,264 @@
+"""Precomputed "more like this" neighbours for item pages.
+
+Items are compared on their text and on two attributes:
+
+- title, description and category as a TF-IDF vector (sublinear term
+  frequency, title words counted twice, very common terms dropped),
+  compared by cosine similarity;
+- price, as the gap between log prices (a $20 and a $25 item are closer
+  than a $20 and a $200 one);
+- condition, as an exact match.
+
+``combine_scores`` blends the three. ``build_similar_items`` computes the
+top neighbours of every unsold item in one pass with NumPy/SciPy sparse
+matrices and stores them in ``SimilarItem``; the item page then reads them
+with a single indexed query (``similar_items``).
+
+NumPy and SciPy are optional: without them the batch command refuses to
+run and item pages keep the old same-category fallback. New and edited
+items get neighbours incrementally (``update_item_neighbours``, run on the
+``market.tasks`` pool) without NumPy: candidates come from the search
+index and are scored in Python against IDF weights computed over them.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Item, SimilarItem
+from .search import search_items, tokenize
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional dependency
+    np = sparse = None
+
+DEFAULTS = {
+    'NEIGHBOURS': 6,
+    # Terms found in more than this share of items carry no signal and make the products dense
+    'MAX_DF': 0.2,
+    'CHUNK_SIZE': 500,
+    # Incremental updates score at most this many search candidates
+    'CANDIDATES': 200,
+}
+
+TEXT_WEIGHT = 0.8
+PRICE_WEIGHT = 0.15
+CONDITION_WEIGHT = 0.05
+TITLE_REPEAT = 2
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the this to with'.split()
+)
+FIELDS = ('id', 'title', 'description', 'category_id', 'price', 'condition')
+
+
+def similarity_settings():
+    return {**DEFAULTS, **getattr(settings, 'MARKET_SIMILARITY', {})}
+
+
+def has_numpy():
+    return np is not None
+
+
+def document_terms(title, description, category_id):
+    words = [t for t in tokenize(title) if len(t) > 1 and t not in STOPWORDS] * TITLE_REPEAT
+    words += [t for t in tokenize(description) if len(t) > 1 and t not in STOPWORDS]
+    if category_id:
+        # ':' never appears in word tokens, so this cannot collide with text
+        words.append(f'cat:{category_id}')
+    return words
+
+
+def log_price(price):
+    return math.log1p(float(price or 0))
+
+
+def combine_scores(text_similarity, log_price_gap, same_condition):
+    """Final score; works on floats and on NumPy arrays alike."""
+    return (
+        TEXT_WEIGHT * text_similarity
+        + PRICE_WEIGHT / (1 + abs(log_price_gap))
+        + CONDITION_WEIGHT * same_condition
+    )
+
+
+def _term_weights(counts, idf):
+    """L2-normalized sublinear TF-IDF weights for one document."""
+    weights = {term: (1 + math.log(n)) * idf[term] for term, n in counts.items() if term in idf}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {term: w / norm for term, w in weights.items()}
+
+
+def store_neighbours(results):
+    """Replaces the stored neighbours of each ``(item_id, [(similar_id, score), ...])``."""
+    results = list(results)
+    if not results:
+        return
+    with transaction.atomic():
+        SimilarItem.objects.filter(item_id__in=[item_id for item_id, _ in results]).delete()
+        SimilarItem.objects.bulk_create([
+            SimilarItem(item_id=item_id, similar_id=similar_id, score=score, rank=rank)
+            for item_id, neighbours in results
+            for rank, (similar_id, score) in enumerate(neighbours, start=1)
+        ], batch_size=1000)
+
+
+def compute_neighbours(neighbours=None, max_df=None, chunk_size=None):
+    """Yields lists of ``(item_id, [(similar_id, score), ...])`` for all unsold items.
+
+    Needs NumPy and SciPy. Memory grows with the catalog (one sparse row per
+    item); similarities are computed ``chunk_size`` rows at a time.
+    """
+    if not has_numpy():
+        raise RuntimeError('Similar item computation requires numpy and scipy.')
+    options = similarity_settings()
+    k = neighbours or options['NEIGHBOURS']
+    max_df = max_df or options['MAX_DF']
+    chunk_size = chunk_size or options['CHUNK_SIZE']
+
+    ids, docs, prices, conditions = [], [], [], []
+    rows = Item.objects.filter(is_sold=False).order_by('id').values_list(*FIELDS)
+    for pk, title, description, category_id, price, condition in rows.iterator(chunk_size=2000):
+        ids.append(pk)
+        docs.append(Counter(document_terms(title, description, category_id)))
+        prices.append(log_price(price))
+        conditions.append(condition)
+    n = len(ids)
+    if n < 2:
+        return
+
+    df = Counter()
+    for counts in docs:
+        df.update(counts.keys())
+    # Terms in one document cannot link two items
+    limit = max(2, max_df * n)
+    vocabulary = {}
+    for term, count in df.items():
+        if 1 < count <= limit:
+            vocabulary[term] = len(vocabulary)
+    if not vocabulary:
+        return
+    idf = {term: math.log((1 + n) / (1 + df[term])) + 1 for term in vocabulary}
+
+    indptr, indices, data = [0], [], []
+    for counts in docs:
+        for term, weight in _term_weights(counts, idf).items():
+            indices.append(vocabulary[term])
+            data.append(weight)
+        indptr.append(len(indices))
+    docs = None
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(n, len(vocabulary)),
+    )
+    transposed = matrix.T.tocsr()
+    ids = np.array(ids, dtype=np.int64)
+    prices = np.array(prices)
+    condition_codes = {value: code for code, value in enumerate(sorted(set(conditions)))}
+    conditions = np.array([condition_codes[c] for c in conditions])
+
+    for start in range(0, n, chunk_size):
+        products = (matrix[start:start + chunk_size] @ transposed).tocsr()
+        batch = []
+        for row in range(products.shape[0]):
+            i = start + row
+            cols = products.indices[products.indptr[row]:products.indptr[row + 1]]
+            sims = products.data[products.indptr[row]:products.indptr[row + 1]]
+            keep = cols != i
+            cols, sims = cols[keep], sims[keep]
+            if not len(cols):
+                batch.append((int(ids[i]), []))
+                continue
+            scores = combine_scores(sims, prices[cols] - prices[i], conditions[cols] == conditions[i])
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind='stable')]
+            batch.append((int(ids[i]), [(int(ids[cols[j]]), float(scores[j])) for j in top]))
+        yield batch
+
+
+def build_similar_items(neighbours=None, max_df=None, chunk_size=None):
+    """Recomputes and stores neighbours for every unsold item; returns the item count."""
+    count = 0
+    for batch in compute_neighbours(neighbours, max_df, chunk_size):
+        store_neighbours(batch)
+        count += len(batch)
+    # Sold and deleted items are not in the corpus; drop their stale lists
+    SimilarItem.objects.filter(item__is_sold=True).delete()
+    return count
+
+
+def _score_candidates(row, candidates, k):
+    """Pure-Python scoring of ``row`` against candidate rows (both ``FIELDS`` tuples)."""
+    docs = [Counter(document_terms(r[1], r[2], r[3])) for r in [row] + candidates]
+    df = Counter()
+    for counts in docs:
+        df.update(counts.keys())
+    n = len(docs)
+    idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+    target = _term_weights(docs[0], idf)
+    own_price = log_price(row[4])
+
+    scored = []
+    for candidate, counts in zip(candidates, docs[1:]):
+        weights = _term_weights(counts, idf)
+        text = sum(w * weights[term] for term, w in target.items() if term in weights)
+        if text <= 0:
+            continue
+        score = combine_scores(text, log_price(candidate[4]) - own_price, candidate[5] == row[5])
+        scored.append((candidate[0], score))
+    scored.sort(key=lambda pair: -pair[1])
+    return scored[:k]
+
+
+def update_item_neighbours(item_id):
+    """Computes one item's neighbours and offers it to theirs (similarity is symmetric)."""
+    options = similarity_settings()
+    k = options['NEIGHBOURS']
+    row = Item.objects.filter(pk=item_id, is_sold=False).values_list(*FIELDS).first()
+    if row is None:
+        return []
+    # Distinct words, title first, as an OR query against the search index
+    terms = dict.fromkeys(t for t in tokenize(f'{row[1]} {row[2]}') if len(t) > 1 and t not in STOPWORDS)
+    query = ' '.join(list(terms)[:16])
+    candidates = []
+    if query:
+        candidates = list(
+            search_items(Item.objects.filter(is_sold=False).exclude(pk=item_id), query, match_any=True)
+            .order_by('search_rank').values_list(*FIELDS)[:options['CANDIDATES']]
+        )
+    neighbours = _score_candidates(row, candidates, k)
+    store_neighbours([(item_id, neighbours)])
+
+    # Insert this item into neighbour lists where it now ranks in the top k
+    scores = dict(neighbours)
+    current = {}
+    for owner, similar, score in SimilarItem.objects.filter(item_id__in=scores).order_by('rank').values_list('item_id', 'similar_id', 'score'):
+        current.setdefault(owner, []).append((similar, score))
+    updates = []
+    for owner, score in scores.items():
+        entries = [(s, v) for s, v in current.get(owner, []) if s != item_id] + [(item_id, score)]
+        entries.sort(key=lambda pair: -pair[1])
+        if (item_id, score) in entries[:k]:
+            updates.append((owner, entries[:k]))
+    store_neighbours(updates)
+    return neighbours
+
+
+def similar_items(item, limit=3):
+    """Unsold neighbours of ``item`` in rank order, or same-category items if none are stored."""
+    neighbours = list(
+        Item.objects.filter(neighbour_of__item=item, is_sold=False)
+        .select_related('category')
+        .order_by('neighbour_of__rank')[:limit]
+    )
+    if neighbours:
+        return neighbours
+    return list(
+        Item.objects.filter(category_id=item.category_id, is_sold=False)
+        .exclude(pk=item.pk).select_related('category')[:limit]
+    )
@@ -0,0 +1,99 @@
+"""Maintenance and lookup helpers for the SellerStats dashboard totals.
+
+The item views call ``record_item_created``, ``record_item_changed`` and
+``record_item_deleted`` inside the transaction that writes the item. Each
+applies the item's contribution as an ``F()`` delta, so concurrent writes
+for the same seller never lose updates. ``refresh_seller_stats`` recomputes
+a seller from scratch and is what the reconcile command uses.
+
+Item writes that bypass those views (the admin, ``bulk_create`` loads, raw
+SQL) do not touch the counters; run ``reconcile_seller_stats`` after them.
+A seller without a SellerStats row gets one computed from the items table
+the first time a view records a change, so those counters start out right.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Item, SellerStats
+
+ZERO = Decimal('0')
+
+STAT_FIELDS = ('total_items', 'sold_items', 'revenue', 'potential_revenue')
+
+
+def stats_snapshot(item):
+    """What ``item`` currently contributes to its seller's totals.
+
+    Take this before binding a form to an existing item: ``ModelForm``
+    validation writes the new values onto the instance.
+    """
+    price = item.price or ZERO
+    return {
+        'total_items': 1,
+        'sold_items': 1 if item.is_sold else 0,
+        'revenue': price if item.is_sold else ZERO,
+        'potential_revenue': ZERO if item.is_sold else price,
+    }
+
+
+def _apply(seller_id, deltas):
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if not updates:
+        return
+    with transaction.atomic():
+        if not SellerStats.objects.filter(seller_id=seller_id).update(**updates):
+            # The items table already includes this write, so skip the delta
+            refresh_seller_stats(seller_id)
+
+
+def record_item_created(item):
+    _apply(item.seller_id, stats_snapshot(item))
+
+
+def record_item_deleted(item):
+    _apply(item.seller_id, {name: -value for name, value in stats_snapshot(item).items()})
+
+
+def record_item_changed(before, item):
+    """``before`` is the ``stats_snapshot`` taken before ``item`` was modified."""
+    after = stats_snapshot(item)
+    _apply(item.seller_id, {name: after[name] - before[name] for name in STAT_FIELDS})
+
+
+def stat_aggregates():
+    """Aggregate expressions matching STAT_FIELDS, for ``aggregate()`` or ``annotate()``."""
+    return {
+        'total_items': Count('id'),
+        'sold_items': Count('id', filter=Q(is_sold=True)),
+        'revenue': Sum('price', filter=Q(is_sold=True)),
+        'potential_revenue': Sum('price', filter=Q(is_sold=False)),
+    }
+
+
+def clean_totals(row):
+    """STAT_FIELDS from an aggregate row, with empty sums turned into zeros."""
+    return {name: row.get(name) or (ZERO if 'revenue' in name else 0) for name in STAT_FIELDS}
+
+
+def compute_seller_stats(items):
+    """Totals for an Item queryset, straight from the items table."""
+    return clean_totals(items.aggregate(**stat_aggregates()))
+
+
+def refresh_seller_stats(seller_id):
+    """Recomputes one seller's totals from their items and returns the record."""
+    with transaction.atomic():
+        stats, _ = SellerStats.objects.update_or_create(
+            seller_id=seller_id, defaults=compute_seller_stats(Item.objects.filter(seller_id=seller_id)),
+        )
+    return stats
+
+
+def get_seller_stats(user):
+    """Returns the user's SellerStats, building it on first use."""
+    try:
+        return user.market_stats
+    except SellerStats.DoesNotExist:
+        return refresh_seller_stats(user.pk)
@@ -0,0 +1,53 @@
+"""Background work for the market app.
+
+A small process-wide thread pool runs work that should not hold up a
+request (thumbnail generation, similarity updates, ...). Configure it with
+``MARKET_TASKS``: ``WORKERS`` sets the pool size, and ``ALWAYS_EAGER``
+runs tasks inline, which is handy for tests and bulk scripts.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _options():
+    return {'WORKERS': 2, 'ALWAYS_EAGER': False, **getattr(settings, 'MARKET_TASKS', {})}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_options()['WORKERS'], thread_name_prefix='market-task')
+        return _executor
+
+
+def _run(fn, args, kwargs, in_worker=True):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(fn, '__name__', fn))
+    finally:
+        if in_worker:
+            # Worker threads keep their own DB connections; drop stale ones between tasks
+            close_old_connections()
+
+
+def submit(fn, *args, **kwargs):
+    """Runs ``fn(*args, **kwargs)`` on the pool (or inline when ALWAYS_EAGER)."""
+    if _options()['ALWAYS_EAGER']:
+        return _run(fn, args, kwargs, in_worker=False)
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def submit_on_commit(fn, *args, **kwargs):
+    """Like ``submit`` but waits for the current transaction to commit first."""
+    transaction.on_commit(lambda: submit(fn, *args, **kwargs))
@@ -0,0 +1,64 @@
+from django import template
+from django.utils.html import format_html
+
+from market.cards import render_cards
+from market.thumbnails import VARIANTS, thumbnail_url
+
+register = template.Library()
+
+# Grid cards are at most ~400px wide: a third of the container on desktop, full width on phones
+CARD_SIZES = '(min-width: 1024px) 400px, (min-width: 640px) 50vw, 100vw'
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor, param='cursor'):
+    """Current URL's query string with ``param`` set to ``cursor`` (other filters kept)."""
+    params = context['request'].GET.copy()
+    params[param] = cursor
+    params.pop('page', None)
+    return '?' + params.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def facet_url(context, param, value=''):
+    """Current URL's query string with facet ``param`` set to ``value`` (removed if empty).
+
+    Drops the cursor, since the result set changes.
+    """
+    params = context['request'].GET.copy()
+    if value in ('', None, 0):
+        params.pop(param, None)
+    else:
+        params[param] = value
+    params.pop('cursor', None)
+    params.pop('page', None)
+    return '?' + params.urlencode()
+
+
+@register.simple_tag
+def item_img(item, variant='card', css_class=''):
+    """Lazy-loaded ``<img>`` for an item using its generated variants.
+
+    ``card`` also offers ``card_2x`` for high-density screens via ``srcset``.
+    Falls back to the original upload while variants are being generated.
+    """
+    src = thumbnail_url(item, variant)
+    if not src:
+        return ''
+    hires = thumbnail_url(item, f'{variant}_2x') if f'{variant}_2x' in VARIANTS else src
+    if hires == src:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            src, item.title, css_class,
+        )
+    width = VARIANTS[variant][0]
+    return format_html(
+        '<img src="{}" srcset="{} {}w, {} {}w" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+        src, src, width, hires, width * 2, CARD_SIZES, item.title, css_class,
+    )
+
+
+@register.simple_tag
+def item_cards(items, style):
+    """``[(item, html), ...]`` for a grid, served from the card cache (see market.cards)."""
+    return render_cards(items, style)
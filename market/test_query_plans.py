@@ -0,0 +1,106 @@
+"""Query-plan regression tests for the hot listing queries.
+
+Each test requests a page and captures the listing queries it ran against
+``market_item``, i.e. the ones with an ``ORDER BY``. It then runs
+SQLite's ``EXPLAIN QUERY PLAN`` on each and checks two things: the item
+table is read through an index (no bare ``SCAN market_item``), and rows
+come out in index order (no ``USE TEMP B-TREE FOR ORDER BY``).
+
+Full-text matches are skipped because FTS5 results are sorted after
+matching by design. The same goes for price-bucket filters, where SQLite
+may prefer the price range over the sort order. The facet cross-tab
+aggregate is not a listing query.
+"""
+import unittest
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import User
+
+from .models import Category, Item
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class ListingQueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='planner', password='password123')
+        cls.books = Category.objects.create(name='Books', slug='books')
+        cls.toys = Category.objects.create(name='Toys', slug='toys')
+        Item.objects.bulk_create([
+            Item(
+                seller=cls.seller,
+                category=cls.books if i % 2 else cls.toys,
+                title=f'Plan item {i}',
+                description='Used for query plan checks',
+                price=Decimal(5 + i),
+                is_sold=i % 5 == 0,
+            )
+            for i in range(40)
+        ])
+
+    def listing_plans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        plans = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if 'FROM "market_item"' not in sql or ' ORDER BY ' not in sql or ' MATCH ' in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        self.assertTrue(plans, f'No listing query captured for {url}')
+        return response, plans
+
+    def assertIndexedPlan(self, url):
+        response, plans = self.listing_plans(url)
+        for sql, details in plans:
+            for detail in details:
+                self.assertNotEqual(detail, 'SCAN market_item', f'Full table scan for {url}:\n{sql}\n{details}')
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', detail, f'Sort without index for {url}:\n{sql}\n{details}')
+        return response
+
+    def test_index(self):
+        self.assertIndexedPlan(reverse('market:index'))
+
+    def test_browse_orderings(self):
+        for sort in ('newest', 'price_asc', 'price_desc'):
+            with self.subTest(sort=sort):
+                self.assertIndexedPlan(f"{reverse('market:browse')}?sort={sort}")
+
+    def test_browse_category_orderings(self):
+        for sort in ('newest', 'price_asc', 'price_desc'):
+            with self.subTest(sort=sort):
+                self.assertIndexedPlan(f"{reverse('market:browse')}?sort={sort}&category={self.books.pk}")
+
+    def test_browse_facet_filters(self):
+        self.assertIndexedPlan(f"{reverse('market:browse')}?condition=used_good")
+        self.assertIndexedPlan(f"{reverse('market:browse')}?condition=used_good&category={self.toys.pk}&sort=price_asc")
+
+    def test_browse_next_page(self):
+        response = self.assertIndexedPlan(reverse('market:browse'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertIsNotNone(cursor)
+        self.assertIndexedPlan(f"{reverse('market:browse')}?cursor={cursor}")
+
+    def test_dashboard(self):
+        self.client.force_login(self.seller)
+        self.assertIndexedPlan(reverse('market:dashboard'))
+
+    def test_seller_profile(self):
+        self.assertIndexedPlan(reverse('users:seller_profile', args=[self.seller.username]))
+
+    def test_api_item_list(self):
+        for sort in ('newest', 'price_asc', 'price_desc'):
+            with self.subTest(sort=sort):
+                response = self.assertIndexedPlan(f"{reverse('market:api_item_list')}?sort={sort}&page_size=5")
+                cursor = response.json()['next_cursor']
+                self.assertIndexedPlan(f"{reverse('market:api_item_list')}?sort={sort}&page_size=5&cursor={cursor}")
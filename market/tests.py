@@ -1,3 +1,707 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.forms import modelform_factory
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .barcodes import barcode_cache, lookup_barcode
+from .cards import GENERATION_KEY as CARD_GENERATION_KEY, render_cards
+from .catalog_stamp import STAMP_KEY, get_catalog_stamp, touch_catalog
+from .categories import VERSION_KEY as CATEGORY_VERSION_KEY, get_catalog, invalidate_catalog
+from .facets import GENERATION_KEY as FACET_GENERATION_KEY, invalidate_facets
+from . import imports
+from .imports import import_items
+from .loadtest import build_scenarios, generate_dataset, run_scenario
+from .models import Category, Item, SellerStats, SimilarItem, Wishlist
+from .pagination import encode_cursor
+from .search import search_items
+from .similarity import build_similar_items, has_numpy, similar_items, update_item_neighbours
+from .thumbnails import VARIANTS, generate_thumbnails, thumbnails_stale
+from .wishlists import get_wishlist_ids, invalidate_wishlist
+
+
+class AsyncApiTests(TestCase):
+    """The async endpoints answer exactly like their sync counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Books', slug='books')
+        for i in range(5):
+            Item.objects.create(
+                seller=seller, category=category, title=f'Atlas {i}', description='For sale',
+                price=Decimal(10 + i), barcode=f'400638133393{i}',
+            )
+
+    async def assertSameResponse(self, name, method='get', data=None, **extra):
+        # Both endpoints should reach the database, not each other's cached lookups
+        barcode_cache.clear()
+        sync_response = await sync_to_async(getattr(self.client, method))(reverse(f'market:{name}'), data, **extra)
+        barcode_cache.clear()
+        async_response = await getattr(self.async_client, method)(reverse(f'market:{name}_async'), data, **extra)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        sync_body, async_body = sync_response.json(), async_response.json()
+        for body in (sync_body, async_body):
+            # Page links embed the path, which differs between the two endpoints
+            body.pop('next', None)
+            body.pop('previous', None)
+        self.assertEqual(async_body, sync_body)
+        return async_body
+
+    async def test_item_list_pages_match(self):
+        body = await self.assertSameResponse('api_item_list', data={'page_size': 2, 'sort': 'price_asc', 'fields': 'id,price'})
+        self.assertEqual([row['price'] for row in body['results']], ['10.00', '11.00'])
+        await self.assertSameResponse('api_item_list', data={'page_size': 2, 'sort': 'price_asc', 'cursor': body['next_cursor']})
+
+    async def test_lookups_match(self):
+        await self.assertSameResponse('api_item_lookup', data={'barcode': '4006381333932'})
+        await self.assertSameResponse('api_item_lookup', data={'q': 'atlas'})
+        await self.assertSameResponse('api_item_lookup', data={'q': 'nothing'})
+        body = await self.assertSameResponse(
+            'api_item_lookup_batch', method='post',
+            data=json.dumps({'barcodes': ['4006381333930', '0000000000000']}), content_type='application/json',
+        )
+        self.assertIsNone(body['results']['0000000000000'])
+
+
+class SearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        cls.category = Category.objects.create(name='Lighting', slug='lighting')
+
+    def found(self, query):
+        return list(search_items(Item.objects.all(), query).values_list('title', flat=True))
+
+    def test_index_follows_edits_category_renames_and_deletes(self):
+        item = Item.objects.create(
+            seller=self.seller, category=self.category, title='Vintage Lamp', description='Brass base', price=Decimal('20'),
+        )
+        self.assertEqual(self.found('lamp brass'), ['Vintage Lamp'])
+
+        item.title = 'Copper Kettle'
+        item.save()
+        self.assertEqual(self.found('lamp'), [])
+        self.assertEqual(self.found('kettle'), ['Copper Kettle'])
+
+        self.category.name = 'Kitchen'
+        self.category.save()
+        self.assertEqual(self.found('lighting'), [])
+        self.assertEqual(self.found('kitchen'), ['Copper Kettle'])
+
+        item.delete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM market_item_fts')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_ranked_search_runs_one_match(self):
+        for title, description in (('Brass stand', 'A lamp stand'), ('Desk lamp', 'Brass base'), ('Kettle', 'Copper')):
+            Item.objects.create(seller=self.seller, category=self.category, title=title, description=description, price=Decimal('5'))
+        with CaptureQueriesContext(connection) as ctx:
+            found = list(search_items(Item.objects.all(), 'lamp').order_by('search_rank').values_list('title', flat=True))
+        # Title matches outrank description matches
+        self.assertEqual(found, ['Desk lamp', 'Brass stand'])
+        self.assertEqual(ctx.captured_queries[0]['sql'].count(' MATCH '), 1)
+        nested = Item.objects.filter(pk__in=search_items(Item.objects.all(), 'brass').values('pk'))
+        self.assertEqual(nested.count(), 2)
+
+
+@override_settings(MARKET_TASKS={'ALWAYS_EAGER': True})
+class CatalogEtagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Books', slug='books')
+        cls.item = Item.objects.create(seller=seller, category=category, title='Atlas', description='x', price=Decimal('10'))
+
+    def setUp(self):
+        # Item signals touch the stamp on commit, which tests never reach
+        touch_catalog()
+
+    def test_unchanged_catalog_answers_304_until_an_item_changes(self):
+        url = reverse('market:api_item_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = Decimal('12')
+            self.item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['price'], '12.00')
+
+        # Deletions do not move any remaining updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.create(seller=self.item.seller, title='Globe', description='x', price=Decimal('5'))
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.get(title='Globe').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_evicted_stamp_is_seeded_from_the_newest_change(self):
+        cache.delete(STAMP_KEY)
+        stamp = get_catalog_stamp()
+        self.assertEqual(stamp['last_modified'], Item.objects.get().updated_at)
+        cache.delete(STAMP_KEY)
+        # Same time, new token: ETags issued before the eviction no longer match
+        self.assertNotEqual(get_catalog_stamp()['token'], stamp['token'])
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Books', slug='books')
+        Item.objects.bulk_create([
+            Item(seller=seller, category=category, title=f'Atlas {i}', description='x', price=Decimal(10 + i), is_sold=i >= 5)
+            for i in range(7)
+        ])
+
+    def export(self, **params):
+        response = self.client.get(reverse('market:export_items'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_row_counts(self):
+        rows = list(csv.DictReader(io.StringIO(self.export().decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((rows[0]['title'], rows[0]['category'], rows[0]['seller']), ('Atlas 0', 'Books', 'seller'))
+        self.assertEqual(len(self.export(output='ndjson', include_sold='1').splitlines()), 7)
+        gzipped = self.export(output='ndjson', compress='gzip')
+        self.assertEqual(len(gzip.decompress(gzipped).splitlines()), 5)
+        self.assertEqual(self.export(output='ndjson', updated_since='2999-01-01'), b'')
+
+
+class CategoryCatalogTests(TestCase):
+
+    def test_catalog_is_invalidated_when_the_change_commits(self):
+        category = Category.objects.create(name='Books', slug='books')
+        invalidate_catalog()
+        self.assertEqual(get_catalog().get(category.pk).name, 'Books')
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Novels'
+            category.save()
+            # Not committed yet, so the version is not bumped
+            self.assertEqual(get_catalog().get(category.pk).name, 'Books')
+        self.assertEqual(get_catalog().get(category.pk).name, 'Novels')
+
+    def test_evicted_version_does_not_revive_an_old_snapshot(self):
+        category = Category.objects.create(name='Books', slug='books')
+        cache.delete(CATEGORY_VERSION_KEY)
+        self.assertEqual(get_catalog().get(category.pk).name, 'Books')
+        # A change the process missed, then the version key is evicted
+        Category.objects.filter(pk=category.pk).update(name='Novels')
+        cache.delete(CATEGORY_VERSION_KEY)
+        self.assertEqual(get_catalog().get(category.pk).name, 'Novels')
+
+    def test_cached_cards_show_a_renamed_category_after_commit(self):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Cookbooks', slug='cookbooks')
+        item = Item.objects.create(seller=seller, category=category, title='Atlas', description='For sale', price=Decimal('10.00'))
+
+        def card():
+            return render_cards([Item.objects.select_related('category').get(pk=item.pk)], 'home')[0][1]
+
+        self.assertIn('Cookbooks', card())
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Recipes'
+            category.save()
+            # The generation moves on commit, so nothing is re-cached under it from uncommitted rows
+            self.assertIn('Cookbooks', card())
+        self.assertIn('Recipes', card())
+
+    def test_evicted_card_generation_does_not_revive_old_cards(self):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Cookbooks', slug='cookbooks')
+        item = Item.objects.create(seller=seller, category=category, title='Atlas', description='For sale', price=Decimal('10.00'))
+        invalidate_catalog()
+        cache.delete(CARD_GENERATION_KEY)
+        self.assertIn('Cookbooks', render_cards([item], 'home')[0][1])
+        # A rename whose card bump was missed, then the generation key is evicted
+        Category.objects.filter(pk=category.pk).update(name='Recipes')
+        invalidate_catalog()
+        cache.delete(CARD_GENERATION_KEY)
+        self.assertIn('Recipes', render_cards([item], 'home')[0][1])
+
+class WishlistCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='buyer', password='password123')
+        cls.items = [
+            Item.objects.create(seller=cls.user, title=f'Atlas {i}', description='x', price=Decimal('10'))
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        invalidate_wishlist(self.user.pk)
+
+    def ids(self):
+        return list(get_wishlist_ids(self.user.pk))
+
+    def test_toggles_show_after_commit(self):
+        first, second = self.items
+        self.assertEqual(self.ids(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.create(user=self.user, item=second)
+            Wishlist.objects.create(user=self.user, item=first)
+        self.assertEqual(self.ids(), [first.pk, second.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.filter(user=self.user, item=first).delete()
+        self.assertEqual(self.ids(), [second.pk])
+
+    def test_rebuild_racing_a_toggle_is_not_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.create(user=self.user, item=self.items[0])
+            # A concurrent request rebuilt the array before the add committed
+            cache.set(
+                f"market:wishlist:{self.user.pk}:{cache.get(f'market:wishlist:generation:{self.user.pk}')}",
+                array('Q').tobytes(),
+            )
+            self.assertEqual(self.ids(), [])
+        self.assertEqual(self.ids(), [self.items[0].pk])
+
+
+class TamperedCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        category = Category.objects.create(name='Books', slug='books')
+        Item.objects.create(seller=seller, category=category, title='Atlas', description='For sale', price=Decimal('10.00'))
+
+    def test_cursor_with_wrong_value_types_falls_back_to_first_page(self):
+        for values in (['not-a-date', 'x'], [None, None], [{'a': 1}, 1]):
+            cursor = encode_cursor(values)
+            for name in ('market:browse', 'market:api_item_list'):
+                with self.subTest(values=values, view=name):
+                    response = self.client.get(reverse(name), {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.context['items'] if name == 'market:browse' else response.json()['results']), 1)
+
+
+class SellerStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        cls.category = Category.objects.create(name='Books', slug='books')
+
+    def setUp(self):
+        self.client.force_login(self.seller)
+
+    def totals(self):
+        stats = SellerStats.objects.get(seller=self.seller)
+        return stats.total_items, stats.sold_items, stats.revenue, stats.potential_revenue
+
+    def create(self, price):
+        self.client.post(reverse('market:new'), {
+            'category': self.category.pk, 'title': 'Atlas', 'description': 'For sale', 'price': price,
+        })
+        return Item.objects.latest('id')
+
+    def test_totals_follow_create_sell_and_delete(self):
+        atlas = self.create('10')
+        globe = self.create('25')
+        self.assertEqual(self.totals(), (2, 0, 0, 35))
+        self.client.post(reverse('market:mark_sold', args=[atlas.pk]))
+        self.assertEqual(self.totals(), (2, 1, 10, 25))
+        self.client.post(reverse('market:delete', args=[globe.pk]))
+        self.assertEqual(self.totals(), (1, 1, 10, 0))
+
+    def test_missing_row_is_built_from_existing_items(self):
+        # e.g. added through the admin, which does not record deltas
+        Item.objects.create(seller=self.seller, category=self.category, title='Old', description='x', price=Decimal('7'))
+        self.create('10')
+        self.assertEqual(self.totals(), (2, 0, 0, 17))
+
+
+@override_settings(MARKET_TASKS={'ALWAYS_EAGER': True})
+class BarcodeUniquenessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        cls.category = Category.objects.create(name='Books', slug='books')
+
+    def setUp(self):
+        # Category and item signals invalidate on commit, which tests never reach
+        invalidate_catalog()
+        barcode_cache.clear()
+
+    def make_item(self, barcode, **kwargs):
+        return Item.objects.create(
+            seller=self.seller, category=self.category, title='Atlas', description='For sale',
+            price=Decimal('10.00'), barcode=barcode, **kwargs,
+        )
+
+    def test_sold_listing_does_not_block_relisting(self):
+        self.make_item('123', is_sold=True)
+        relisted = self.make_item('1-23')
+        self.assertEqual(lookup_barcode('123')['id'], relisted.pk)
+
+    def test_duplicate_unsold_barcode_is_a_validation_error(self):
+        self.make_item('123')
+        AdminForm = modelform_factory(Item, exclude=())
+        data = {
+            'seller': self.seller.pk, 'category': self.category.pk, 'title': 'Copy', 'description': 'x',
+            'price': '5', 'barcode': '1 23', 'condition': 'new',
+        }
+        self.assertIn('barcode', AdminForm(data).errors)
+        self.assertTrue(AdminForm({**data, 'is_sold': 'on'}).is_valid())
+
+    def test_edit_of_unindexed_duplicate_shows_error(self):
+        self.make_item('123')
+        legacy = self.make_item(None)
+        Item.objects.filter(pk=legacy.pk).update(barcode='123')
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse('market:edit', args=[legacy.pk]), {
+            'category': self.category.pk, 'title': 'Atlas', 'description': 'For sale', 'price': '10',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+
+    def test_import_relists_sold_items_and_updates_unsold_ones(self):
+        sold = self.make_item('111', is_sold=True)
+        listed = self.make_item('222')
+        lines = ['title,description,price,category,barcode\n', 'New,x,5,books,111\n', 'Fixed,x,6,books,222\n']
+        report = import_items(lines, 'csv', self.seller)
+        self.assertEqual((report.created, report.updated, report.error_count), (1, 1, 0))
+        sold.refresh_from_db()
+        listed.refresh_from_db()
+        self.assertEqual((sold.title, listed.title), ('Atlas', 'Fixed'))
+        self.assertEqual(Item.objects.filter(barcode_normalized='111', is_sold=False).count(), 1)
+
+    def test_relisting_over_an_active_barcode_is_refused(self):
+        sold = self.make_item('123', is_sold=True)
+        self.make_item('123')
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('market:mark_sold', args=[sold.pk]), follow=True)
+        self.assertContains(response, 'cannot be relisted')
+        sold.refresh_from_db()
+        self.assertTrue(sold.is_sold)
+
+    def test_barcode_cache_is_invalidated_when_the_change_commits(self):
+        item = self.make_item('123')
+        self.assertEqual(lookup_barcode('123')['title'], 'Atlas')
+        with self.captureOnCommitCallbacks(execute=True):
+            item.title = 'Globe'
+            item.save()
+            # A lookup before commit repopulates the entry; the commit must still drop it
+            lookup_barcode('123')
+        self.assertEqual(lookup_barcode('123')['title'], 'Globe')
+
+
+# Item saves queue similar-item updates; run them inline instead of on the pool
+@override_settings(MARKET_TASKS={'ALWAYS_EAGER': True})
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = get_user_model().objects.create_user(username='seller', password='password123')
+        cls.category = Category.objects.create(name='Books', slug='books')
+        cls.item = Item.objects.create(
+            seller=seller, category=cls.category, title='Atlas', description='For sale', price=Decimal('10.00'),
+        )
+
+    def setUp(self):
+        # Test rollbacks undo items without bumping the generation
+        invalidate_facets()
+
+    def total(self, **params):
+        return self.client.get(reverse('market:browse'), params).context['facets']['total']
+
+    def test_search_without_tokens_does_not_share_plain_browse_counts(self):
+        self.assertEqual(self.total(query='!!!'), 0)
+        self.assertEqual(self.total(), 1)
+
+    def test_counts_follow_item_changes_after_commit(self):
+        self.assertEqual(self.total(), 1)
+        self.assertEqual(self.total(condition='new'), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.condition = 'new'
+            self.item.save()
+        facets = self.client.get(reverse('market:browse'), {'condition': 'new'}).context['facets']
+        self.assertEqual(facets['total'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.is_sold = True
+            self.item.save()
+        self.assertEqual(self.total(), 0)
+
+    def test_evicted_generation_does_not_revive_old_counts(self):
+        cache.delete(FACET_GENERATION_KEY)
+        self.assertEqual(self.total(), 1)
+        # A change whose bump was missed, then the generation key is evicted
+        Item.objects.filter(pk=self.item.pk).update(is_sold=True)
+        cache.delete(FACET_GENERATION_KEY)
+        self.assertEqual(self.total(), 0)
+
+
+class ImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        Category.objects.create(name='Books', slug='books')
+
+    def setUp(self):
+        invalidate_catalog()
+
+    def upload(self, content):
+        self.client.force_login(self.seller)
+        return self.client.post(reverse('market:api_item_import'), {'file': SimpleUploadedFile('items.csv', content)})
+
+    def test_row_errors_are_reported_and_valid_rows_imported(self):
+        response = self.upload(b'title,description,price,category,barcode\nAtlas,x,5,books,1\nBad,x,cheap,books,2\nAtlas,x,6,toys,3\n')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['rows'], body['created'], body['error_count'], body['error']), (3, 1, 2, None))
+        self.assertEqual([error['line'] for error in body['errors']], [3, 4])
+        self.assertEqual(set(body['errors'][0]['errors']), {'price'})
+
+    def test_unreadable_input_returns_partial_report_and_refreshes_totals(self):
+        self.assertEqual(SellerStats.objects.filter(seller=self.seller).count(), 0)
+        response = self.upload(b'title,description,price,category\nAtlas,x,5,books\nGlobe,x,7,books\n\xff\xfe,x,1,books\n')
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertIn('UTF-8', body['error'])
+        self.assertEqual(body['created'], 2)
+        stats = SellerStats.objects.get(seller=self.seller)
+        self.assertEqual((stats.total_items, stats.potential_revenue), (2, Decimal('12.00')))
+
+    def test_barcode_listed_during_the_import_is_a_row_error(self):
+        rival = get_user_model().objects.create_user(username='rival', password='password123')
+        Item.objects.create(
+            seller=rival, category=Category.objects.get(slug='books'), title='Atlas', description='x',
+            price=Decimal(5), barcode='4006381333931',
+        )
+        real_lookup = imports._listed_barcodes
+        calls = []
+
+        def lookup(codes):
+            # The first check runs before the rival's listing "commits"
+            calls.append(codes)
+            return {} if len(calls) == 1 else real_lookup(codes)
+
+        lines = ['title,description,price,category,barcode\n', 'Atlas,x,5,books,4006381333931\n', 'Globe,x,7,books,\n']
+        with mock.patch.object(imports, '_listed_barcodes', lookup):
+            report = import_items(lines, 'csv', self.seller)
+        self.assertEqual((report.created, report.error_count), (1, 1))
+        self.assertEqual(report.errors, [{'line': 2, 'errors': {'barcode': ['This barcode is already listed by another seller.']}}])
+        self.assertEqual(list(Item.objects.filter(seller=self.seller).values_list('title', flat=True)), ['Globe'])
+        self.assertEqual(search_items(Item.objects.all(), 'globe').count(), 1)
+
+    def test_each_row_is_validated_on_its_own(self):
+        lines = ['title,description,price,category,condition\n', 'Atlas,x,5,books,new\n', 'Globe,x,,books,\n', 'Map,x,3,books,\n']
+        report = import_items(lines, 'csv', self.seller)
+        self.assertEqual(report.errors, [{'line': 3, 'errors': {'price': ['This field is required.']}}])
+        self.assertEqual(
+            dict(Item.objects.filter(seller=self.seller).values_list('title', 'condition')),
+            {'Atlas': 'new', 'Map': Item._meta.get_field('condition').default},
+        )
+
+
+@override_settings(MARKET_TASKS={'ALWAYS_EAGER': True})
+@skipUnless(has_numpy(), 'needs numpy and scipy')
+@override_settings(MARKET_TASKS={'ALWAYS_EAGER': True}, MARKET_SIMILARITY={'MAX_DF': 0.5})
+class SimilarItemsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        outdoor = Category.objects.create(name='Outdoor', slug='outdoor')
+        furniture = Category.objects.create(name='Furniture', slug='furniture')
+        rows = [
+            ('Leather hiking boots', 'Sturdy leather boots for mountain trails', outdoor, 80),
+            ('Waterproof hiking boots', 'Waterproof boots, barely worn on trails', outdoor, 90),
+            ('Trail tent', 'Two person tent for mountain camping', outdoor, 150),
+            ('Oak writing desk', 'Solid oak desk with two drawers', furniture, 200),
+            ('Vintage oak desk', 'Oak desk, vintage, small drawers', furniture, 180),
+            ('Office chair', 'Swivel chair with armrests', furniture, 60),
+        ]
+        cls.items = {
+            title: Item.objects.create(
+                seller=cls.seller, category=category, title=title, description=description, price=Decimal(price),
+            )
+            for title, description, category, price in rows
+        }
+        cls.sold = Item.objects.create(
+            seller=cls.seller, category=outdoor, title='Used hiking boots', description='Leather boots for trails',
+            price=Decimal(40), is_sold=True,
+        )
+
+    def neighbours(self, title):
+        item = self.items[title]
+        return list(Item.objects.filter(neighbour_of__item=item).order_by('neighbour_of__rank').values_list('title', flat=True))
+
+    def test_build_pairs_similar_unsold_items(self):
+        self.assertEqual(build_similar_items(), 6)
+        self.assertEqual(self.neighbours('Leather hiking boots')[0], 'Waterproof hiking boots')
+        self.assertEqual(self.neighbours('Oak writing desk')[0], 'Vintage oak desk')
+        self.assertNotIn('Used hiking boots', self.neighbours('Waterproof hiking boots'))
+        self.assertFalse(SimilarItem.objects.filter(item=self.sold).exists())
+        self.assertEqual(
+            [item.title for item in similar_items(self.items['Vintage oak desk'], limit=1)], ['Oak writing desk'],
+        )
+
+    def test_incremental_updates_follow_new_edited_and_deleted_items(self):
+        build_similar_items()
+        with self.captureOnCommitCallbacks(execute=True):
+            new = Item.objects.create(
+                seller=self.seller, category=self.items['Trail tent'].category, title='Leather hiking boots, size 42',
+                description='Leather boots for mountain trails', price=Decimal(85),
+            )
+        self.assertEqual(
+            list(Item.objects.filter(neighbour_of__item=new).order_by('neighbour_of__rank').values_list('title', flat=True))[0],
+            'Leather hiking boots',
+        )
+        # Similarity is symmetric, so the new item is offered to its neighbours' lists too
+        self.assertIn('Leather hiking boots, size 42', self.neighbours('Leather hiking boots'))
+
+        chair = self.items['Office chair']
+        chair.title, chair.description = 'Oak desk chair', 'Oak chair to go with a writing desk'
+        with self.captureOnCommitCallbacks(execute=True):
+            chair.save()
+        self.assertIn(self.neighbours('Office chair')[0], {'Oak writing desk', 'Vintage oak desk'})
+
+        new.delete()
+        self.assertNotIn('Leather hiking boots, size 42', self.neighbours('Leather hiking boots'))
+        self.assertFalse(SimilarItem.objects.filter(similar_id=new.pk).exists())
+
+    def test_sold_items_get_no_incremental_neighbours(self):
+        self.assertEqual(update_item_neighbours(self.sold.pk), [])
+        self.assertFalse(SimilarItem.objects.filter(item=self.sold).exists())
+
+
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = get_user_model().objects.create_user(username='seller', password='password123')
+        cls.category = Category.objects.create(name='Books', slug='books')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=self.media))
+
+    def make_item(self, data, name='photo.jpg'):
+        return Item.objects.create(
+            seller=self.seller, category=self.category, title='Atlas', description='For sale',
+            price=Decimal(10), image=SimpleUploadedFile(name, data, content_type='image/jpeg'),
+        )
+
+    def jpeg(self, size=(600, 400)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def assertRecordedWithoutVariants(self, item):
+        with self.assertLogs('market.thumbnails', 'WARNING'):
+            names = generate_thumbnails(item.pk)
+        item.refresh_from_db()
+        self.assertEqual(names, {'src': item.image.name})
+        self.assertEqual(item.thumbnails, names)
+        # Recorded, so rendering the item does not queue it again
+        self.assertFalse(thumbnails_stale(item))
+
+    def test_valid_image_gets_every_variant(self):
+        item = self.make_item(self.jpeg())
+        names = generate_thumbnails(item.pk)
+        item.refresh_from_db()
+        self.assertEqual(item.thumbnails, names)
+        self.assertFalse(thumbnails_stale(item))
+        for variant, (width, height, crop) in VARIANTS.items():
+            with Image.open(os.path.join(self.media, names[variant])) as thumb:
+                self.assertLessEqual(thumb.size, (width, height))
+                if crop:
+                    self.assertEqual(thumb.size, (width, height))
+
+    def test_truncated_image_is_recorded(self):
+        data = self.jpeg()
+        self.assertRecordedWithoutVariants(self.make_item(data[:len(data) // 2]))
+
+    def test_image_over_the_pixel_limit_is_recorded(self):
+        item = self.make_item(self.jpeg())
+        # Pillow refuses images far over MAX_IMAGE_PIXELS with DecompressionBombError, not OSError
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertRecordedWithoutVariants(item)
+
+
+class SeedMarketBulkTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=self.media))
+        self.image_dir = os.path.join(self.media, 'source')
+        os.makedirs(self.image_dir)
+        for name, colour in (('a.png', 'red'), ('b.png', 'blue')):
+            Image.new('RGB', (8, 8), colour).save(os.path.join(self.image_dir, name))
+        invalidate_facets()
+
+    def test_offline_bulk_seed(self):
+        browse_total = lambda: self.client.get(reverse('market:browse')).context['facets']['total']
+        self.assertEqual(browse_total(), 0)
+        call_command(
+            'seed_market', bulk=25, image_dir=self.image_dir, sellers=3, batch_size=10, workers=2, stdout=io.StringIO(),
+        )
+
+        self.assertEqual(Item.objects.count(), 25)
+        self.assertEqual(
+            set(Item.objects.values_list('image', flat=True)),
+            {'item_images/seed/a.png', 'item_images/seed/b.png'},
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.media, 'item_images', 'seed', 'a.png')))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM market_item_fts')
+            self.assertEqual(cursor.fetchone()[0], 25)
+        self.assertEqual(search_items(Item.objects.all(), 'bulk sample').count(), 25)
+
+        stats = SellerStats.objects.all()
+        self.assertEqual(len(stats), 3)
+        self.assertEqual(sum(row.total_items for row in stats), 25)
+        # The facet generation was bumped, so browse does not serve the cached zero
+        self.assertEqual(browse_total(), Item.objects.filter(is_sold=False).count())
+
+    def test_missing_image_dir_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_market', bulk=5, image_dir=os.path.join(self.media, 'missing'), stdout=io.StringIO())
+
+
+@override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0, 'LOG_OVER_BUDGET': False})
+class LoadTestTests(TestCase):
+
+    def test_every_scenario_runs_on_a_small_dataset(self):
+        dataset = generate_dataset(users=6, sellers=2, items=40, reviews=5, wishlists=2, conversations=4, messages=3)
+        self.assertEqual((dataset['items'], dataset['messages']), (40, 12))
+        scenarios = build_scenarios(deep_offset=12)
+        self.assertIn('inbox', {scenario.name for scenario in scenarios})
+        for scenario in scenarios:
+            with self.subTest(scenario=scenario.name):
+                result = run_scenario(scenario, requests=2, warmup=0, memory_requests=1)
+                self.assertEqual(result['requests'], 2)
+                self.assertGreater(result['queries_per_request'], 0)
+                self.assertIn('peak_memory_kib', result)
@@ -0,0 +1,124 @@
+"""Fixed-size image variants for listing grids.
+
+Uploads are stored as-is, so a card showing a 400px wide photo used to
+ship the full-size original. After an item's image changes, the worker
+pool (``market.tasks``) renders the variants in ``VARIANTS`` with Pillow
+and stores them next to the original under content-hashed names, e.g.
+``item_images/thumbs/3f/3f9a..._card.jpg``. Identical uploads share
+files and the URLs never change, so they can be cached forever.
+
+``Item.thumbnails`` records the generated names together with the
+original they were made from. Templates use the ``item_img`` tag (see
+``market_extras``), which falls back to the original and queues the
+generation if variants are missing (lazy backfill).
+"""
+import hashlib
+import io
+import logging
+import threading
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .catalog_stamp import touch_catalog
+from .models import Item
+from .tasks import submit, submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop). Uncropped variants keep the aspect ratio within the box.
+VARIANTS = {
+    'thumb': (160, 160, True),
+    'card': (400, 300, False),
+    'card_2x': (800, 600, False),
+}
+JPEG_QUALITY = 80
+THUMB_DIR = 'item_images/thumbs'
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def thumbnails_stale(item):
+    return bool(item.image) and (item.thumbnails or {}).get('src') != item.image.name
+
+
+def render_variant(image, width, height, crop):
+    if crop:
+        out = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        out = image.copy()
+        out.thumbnail((width, height), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    out.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_thumbnails(item_id):
+    """Renders all variants for one item and records them. Safe to call repeatedly."""
+    try:
+        item = Item.objects.only('id', 'image', 'thumbnails').filter(pk=item_id).first()
+        if item is None or not item.image:
+            return None
+        source = item.image.name
+        try:
+            with default_storage.open(source, 'rb') as fh:
+                data = fh.read()
+        except OSError:
+            data = b''
+
+        names = {'src': source}
+        digest = hashlib.sha1(data).hexdigest()[:20]
+        try:
+            # open() only reads the header; load() decodes now so corrupt or
+            # truncated pixel data fails here rather than while rendering
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Not a usable image: record the attempt so pages stop re-queueing it
+            logger.warning('Cannot make thumbnails for item %s from %s', item_id, source)
+            Item.objects.filter(pk=item_id, image=source).update(thumbnails=names)
+            return names
+
+        for variant, (width, height, crop) in VARIANTS.items():
+            name = f'{THUMB_DIR}/{digest[:2]}/{digest}_{variant}.jpg'
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(render_variant(image, width, height, crop)))
+            names[variant] = name
+
+        # Plain UPDATE: no save() signals. updated_at moves because the rendered card changed.
+        Item.objects.filter(pk=item_id, image=source).update(thumbnails=names, updated_at=timezone.now())
+        touch_catalog()
+        return names
+    finally:
+        with _pending_lock:
+            _pending.discard(item_id)
+
+
+def queue_thumbnails(item, on_commit=False):
+    """Schedules generation for ``item`` unless it is already queued in this process."""
+    with _pending_lock:
+        if item.pk in _pending:
+            return
+        _pending.add(item.pk)
+    if on_commit:
+        submit_on_commit(generate_thumbnails, item.pk)
+    else:
+        submit(generate_thumbnails, item.pk)
+
+
+def thumbnail_url(item, variant):
+    """URL of ``variant`` for ``item``; the original image while variants are pending."""
+    if not item.image:
+        return ''
+    thumbnails = item.thumbnails or {}
+    if thumbnails.get('src') != item.image.name:
+        queue_thumbnails(item)
+    elif variant in thumbnails:
+        return default_storage.url(thumbnails[variant])
+    return item.image.url
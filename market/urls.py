@@ -19,5 +19,13 @@ urlpatterns = [
 
     # API URL
     path('api/items/', views.api_item_list, name='api_item_list'),
+    path('api/items/export/', views.export_items, name='export_items'),
+    path('api/items/import/', views.api_item_import, name='api_item_import'),
     path('api/items/lookup/', views.api_lookup_by_barcode, name='api_item_lookup'),
+    path('api/items/lookup/batch/', views.api_lookup_batch, name='api_item_lookup_batch'),
+
+    # Async API (serve via core.asgi)
+    path('api/async/items/', views.api_item_list_async, name='api_item_list_async'),
+    path('api/async/items/lookup/', views.api_lookup_async, name='api_item_lookup_async'),
+    path('api/async/items/lookup/batch/', views.api_lookup_batch_async, name='api_item_lookup_batch_async'),
 ]
\ No newline at end of file
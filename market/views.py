@@ -1,66 +1,60 @@
+import hashlib
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum, Count, Avg
-from django.core.paginator import Paginator
-from .models import Item, Category, Wishlist
+from django.db import transaction
+from .models import Item, Wishlist, normalize_barcode
+from .barcodes import alookup_barcode, alookup_barcodes, lookup_barcode, lookup_barcodes
+from .catalog_stamp import get_catalog_stamp
+from .categories import get_catalog
+from .exports import EXPORT_FORMATS, export_chunks, parse_updated_since
+from .facets import CONDITIONS, PRICE_BUCKET_KEYS, build_facets, crosstab, price_bucket_filter
 from .forms import NewItemForm
+from .imports import decode_lines, detect_format, import_items
+from .pagination import CursorPaginator, KeysetPagination, ITEM_ORDERINGS
+from .search import search_items
+from .similarity import similar_items
+from .stats import get_seller_stats, record_item_changed, record_item_created, record_item_deleted, stats_snapshot
+from .wishlists import in_wishlist, mark_wishlisted
+from users.ratings import attach_seller_ratings
 
 # DRF Imports (For the API)
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from .serializers import ItemSerializer
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
 
 def index(request):
     # Take a small set of newest available items for the homepage
-    items_qs = Item.objects.filter(is_sold=False).order_by('-created_at')[:6]
-    items = list(items_qs)
-    categories = Category.objects.all()
-
-    # Compute seller ratings (avg and count) and attach to items so templates can read them easily
-    seller_ids = {it.seller_id for it in items}
-    from users.models import Review
-
-    seller_stats = {}
-    if seller_ids:
-        stats = Review.objects.filter(seller_id__in=seller_ids).values('seller_id').annotate(avg=Avg('rating'), count=Count('id'))
-        for s in stats:
-            seller_stats[s['seller_id']] = {
-                'avg': s['avg'] or 0,
-                'count': s['count'] or 0
-            }
-
-    # Attach attributes to item instances for template convenience
-    for it in items:
-        st = seller_stats.get(it.seller_id, {'avg': 0, 'count': 0})
-        setattr(it, 'seller_avg_rating', round(st['avg'] or 0, 2))
-        setattr(it, 'seller_review_count', st['count'] or 0)
-        # Build a simple star string (e.g. ★★★★☆ or ★★★½☆) for easy template rendering
-        avg = st['avg'] or 0
-        full = int(avg)
-        half = 1 if (avg - full) >= 0.5 else 0
-        empty = 5 - full - half
-        star_str = '★' * full + ('½' if half else '') + '☆' * empty
-        setattr(it, 'seller_star_str', star_str)
-
-        # Attach recent reviews (latest 3) for the seller to show in a tooltip
-        recent = Review.objects.filter(seller_id=it.seller_id).order_by('-created_at')[:3]
-        setattr(it, 'seller_recent_reviews', list(recent))
+    items = list(
+        Item.objects.filter(is_sold=False)
+        .select_related('category', 'seller__rating_summary')
+        .order_by('-created_at')[:6]
+    )
+
+    # Attach seller ratings (avg, count, stars, recent reviews) from the precomputed summaries
+    attach_seller_ratings(items)
+    mark_wishlisted(request.user, items)
 
     return render(request, 'market/index.html', {
         'items': items,
-        'categories': categories,
     })
 
 def detail(request, pk):
     item = get_object_or_404(Item, pk=pk)
-    related_items = Item.objects.filter(category=item.category, is_sold=False).exclude(pk=pk)[0:3]
+    # Precomputed neighbours (one indexed query); falls back to the same category
+    related_items = similar_items(item, limit=3)
     
-    # Check if the current user has wishlisted this item
-    is_wishlisted = False
-    if request.user.is_authenticated:
-        is_wishlisted = Wishlist.objects.filter(user=request.user, item=item).exists()
+    # Check if the current user has wishlisted this item (cached membership, no query)
+    is_wishlisted = in_wishlist(request.user, item.pk)
 
     return render(request, 'market/detail.html', {
         'item': item,
@@ -75,122 +69,129 @@ def new(request):
         if form.is_valid():
             item = form.save(commit=False)
             item.seller = request.user
-            item.save()
+            with transaction.atomic():
+                item.save()
+                record_item_created(item)
             return redirect('market:detail', pk=item.id)
     else:
         form = NewItemForm()
-    categories = Category.objects.all()
     return render(request, 'market/form.html', {
         'form': form,
         'title': 'New Item',
-        'categories': categories,
     })
 
 @login_required
 def edit(request, pk):
     item = get_object_or_404(Item, pk=pk, seller=request.user)
     if request.method == 'POST':
+        before = stats_snapshot(item)
         form = NewItemForm(request.POST, request.FILES, instance=item)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                record_item_changed(before, item)
             return redirect('market:detail', pk=item.id)
     else:
         form = NewItemForm(instance=item)
-    categories = Category.objects.all()
     return render(request, 'market/form.html', {
         'form': form,
         'title': 'Edit Item',
-        'categories': categories,
     })
 
 @login_required
 def delete(request, pk):
     item = get_object_or_404(Item, pk=pk, seller=request.user)
-    item.delete()
+    with transaction.atomic():
+        item.delete()
+        record_item_deleted(item)
     return redirect('market:dashboard')
 
 @login_required
 def dashboard(request):
-    items = Item.objects.filter(seller=request.user)
-    
-    metrics = items.aggregate(
-        total_items=Count('id'),
-        sold_items=Count('id', filter=Q(is_sold=True)),
-        total_revenue=Sum('price', filter=Q(is_sold=True)),
-        active_revenue=Sum('price', filter=Q(is_sold=False))
-    )
-    
-    revenue = metrics['total_revenue'] if metrics['total_revenue'] else 0
-    potential_revenue = metrics['active_revenue'] if metrics['active_revenue'] else 0
+    # Header metrics come from one SellerStats row; the item table is keyset-paginated
+    stats = get_seller_stats(request.user)
+    paginator = CursorPaginator(Item.objects.filter(seller=request.user), ITEM_ORDERINGS['newest'], 12)
+    page_obj = paginator.page(request.GET.get('cursor'))
 
     return render(request, 'market/dashboard.html', {
-        'items': items,
-        'metrics': metrics,
-        'revenue': revenue,
-        'potential_revenue': potential_revenue
+        'items': page_obj.object_list,
+        'page_obj': page_obj,
+        'stats': stats,
+        'revenue': stats.revenue,
+        'potential_revenue': stats.potential_revenue
     })
 
 @login_required
 def mark_sold(request, pk):
     item = get_object_or_404(Item, pk=pk, seller=request.user)
+    before = stats_snapshot(item)
     item.is_sold = not item.is_sold
-    item.save()
+    # Relisting must not collide with another active listing of the same product
+    if item.barcode_conflict() is not None:
+        messages.error(request, f'"{item.title}" cannot be relisted: another active listing already uses its barcode.')
+        return redirect('market:dashboard')
+    with transaction.atomic():
+        item.save(update_fields=['is_sold', 'updated_at'])
+        record_item_changed(before, item)
     return redirect('market:dashboard')
 
 def browse(request):
     query = request.GET.get('query', '')
     category_id = request.GET.get('category', 0)
-    sort = request.GET.get('sort', 'newest')
-    categories = Category.objects.all()
-    items = Item.objects.filter(is_sold=False)
-
+    condition = request.GET.get('condition', '')
+    if condition not in CONDITIONS:
+        condition = ''
+    price = request.GET.get('price', '')
+    if price not in PRICE_BUCKET_KEYS:
+        price = ''
+    # Searches default to relevance order; plain browsing defaults to newest
+    sort = request.GET.get('sort') or ('relevance' if query else 'newest')
+    items = Item.objects.filter(is_sold=False).select_related('category', 'seller__rating_summary')
+
+    search_text = ''
     if query:
         # If the query exactly matches a category name, prefer that category
-        category_match = Category.objects.filter(name__iexact=query).first()
+        category_match = get_catalog().by_name(query)
         if category_match:
-            items = items.filter(category=category_match, is_sold=False)
             # set category_id so the UI reflects the selected category
-            try:
-                category_id = int(category_match.id)
-            except Exception:
-                category_id = category_match.id
+            category_id = category_match.id
         else:
-            # otherwise search title, description, or category name
-            items = items.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+            # otherwise search title, description, or category name via the search index
+            items = search_items(items, query)
+            search_text = query
+
+    # Facet counts are computed before the facet filters, from one cached cross-tab
+    facets = build_facets(crosstab(items, search_text), int(category_id), condition, price)
 
     if category_id:
         items = items.filter(category_id=category_id)
-
-    if sort == 'price_asc':
-        items = items.order_by('price')
-    elif sort == 'price_desc':
-        items = items.order_by('-price')
-    else:
-        items = items.order_by('-created_at')
-
-    paginator = Paginator(items, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # Pass the user's wishlisted item IDs so cards can show filled/empty hearts
-    wishlisted_ids = set()
-    if request.user.is_authenticated:
-        wishlisted_ids = set(
-            Wishlist.objects.filter(user=request.user).values_list('item_id', flat=True)
-        )
+    if condition:
+        items = items.filter(condition=condition)
+    if price:
+        items = items.filter(**price_bucket_filter(price))
+
+    if sort == 'relevance' and 'search_rank' not in items.query.annotations:
+        # e.g. the query matched a category name, so there is nothing to rank
+        sort = 'newest'
+    ordering = ITEM_ORDERINGS.get(sort, ITEM_ORDERINGS['newest'])
+
+    # Keyset pagination: page N costs the same as page 1. The "(N found)"
+    # total comes from the facet counts instead of a COUNT query.
+    paginator = CursorPaginator(items, ordering, 6)
+    page_obj = paginator.page(request.GET.get('cursor'))
+    attach_seller_ratings(page_obj.object_list, recent=False)
+    # Filled/empty hearts for the items on this page only, from the cached wishlist
+    mark_wishlisted(request.user, page_obj.object_list)
 
     return render(request, 'market/browse.html', {
         'items': page_obj,
         'page_obj': page_obj,
         'query': query,
-        'categories': categories,
         'category_id': int(category_id),
+        'condition': condition,
+        'price': price,
+        'facets': facets,
         'sort': sort,
-        'wishlisted_ids': wishlisted_ids,
     })
 
 
@@ -220,19 +221,100 @@ def toggle_wishlist(request, pk):
 @login_required
 def wishlist(request):
     """Shows the user's saved items."""
-    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('item').order_by('-created_at')
+    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('item__category', 'item__seller')
+    paginator = CursorPaginator(wishlist_items, ('-created_at', '-id'), 12, with_count=True)
+    page_obj = paginator.page(request.GET.get('cursor'))
     return render(request, 'market/wishlist.html', {
-        'wishlist_items': wishlist_items,
+        'wishlist_items': page_obj,
+        'items': [entry.item for entry in page_obj],
+        'page_obj': page_obj,
     })
 
 
 # --- API VIEW ---
+STREAM_BATCH_SIZE = 500
+
+
+def _catalog_state(request):
+    """The catalog change stamp, fetched once per request (a cache read, no query)."""
+    if not hasattr(request, '_catalog_state'):
+        request._catalog_state = get_catalog_stamp()
+    return request._catalog_state
+
+
+def _catalog_last_modified(request):
+    return _catalog_state(request)['last_modified']
+
+
+def _catalog_etag(request):
+    state = _catalog_state(request)
+    if state['last_modified'] is None:
+        return None
+    # The token changes with every committed item change, deletions included;
+    # the query string keeps pages, sorts and field selections apart.
+    key = f"{state['token']}:{sorted(request.GET.lists())}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _requested_fields(request):
+    fields = request.GET.get('fields', '')
+    return [name.strip() for name in fields.split(',') if name.strip()]
+
+
+def _encode_batch(rows, fmt, first):
+    if fmt == 'ndjson':
+        return ''.join(row + '\n' for row in rows)
+    return ('' if first else ',') + ','.join(rows)
+
+
+def _stream_items(items, fields, fmt):
+    """Yields the catalog as NDJSON lines or as one JSON array, a batch at a time."""
+    serializer = ItemSerializer(fields=fields)
+    encoder = JSONEncoder(separators=(',', ':'))
+    if fmt == 'json':
+        yield '['
+    first = True
+    batch = []
+    for item in items.iterator(chunk_size=STREAM_BATCH_SIZE):
+        batch.append(encoder.encode(serializer.to_representation(item)))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield _encode_batch(batch, fmt, first)
+            first = False
+            batch = []
+    if batch:
+        yield _encode_batch(batch, fmt, first)
+    if fmt == 'json':
+        yield ']'
+
+
+def _item_ordering(request):
+    sort = request.GET.get('sort', 'newest')
+    return ITEM_ORDERINGS['newest'] if sort == 'relevance' else ITEM_ORDERINGS.get(sort, ITEM_ORDERINGS['newest'])
+
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
 @api_view(['GET'])
 def api_item_list(request):
-    """Returns JSON data for Mobile Apps"""
+    """Returns JSON data for Mobile Apps
+
+    Results are keyset-paginated (``cursor``, ``page_size`` and ``sort`` of
+    newest, price_asc or price_desc). ``fields=id,title,...`` selects a subset
+    of fields, and ``stream=ndjson`` or ``stream=json`` streams the whole
+    catalog instead of paging. Responses carry ETag/Last-Modified, so an
+    unchanged catalog is answered with 304 before anything is serialized.
+    """
     items = Item.objects.filter(is_sold=False)
-    serializer = ItemSerializer(items, many=True)
-    return Response(serializer.data)
+    fields = _requested_fields(request)
+
+    stream = request.query_params.get('stream')
+    if stream in ('ndjson', 'json'):
+        content_type = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return StreamingHttpResponse(_stream_items(items.order_by('id'), fields, stream), content_type=content_type)
+
+    paginator = KeysetPagination(ordering=_item_ordering(request))
+    page = paginator.paginate_queryset(items, request)
+    serializer = ItemSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -242,14 +324,151 @@ def api_lookup_by_barcode(request):
     if not barcode:
         return Response({'error': 'Provide barcode or q parameter'}, status=400)
 
-    # Try exact barcode match first
-    item = Item.objects.filter(barcode__iexact=barcode, is_sold=False).first()
-    if not item:
-        # Fallback: search title or slug-like match
-        item = Item.objects.filter(Q(title__icontains=barcode) | Q(category__name__icontains=barcode), is_sold=False).first()
-
-    if not item:
-        return Response({}, status=404)
-
-    serializer = ItemSerializer(item)
-    return Response(serializer.data)
\ No newline at end of file
+    # Try exact (normalized) barcode match first; hits and misses are cached
+    data = lookup_barcode(barcode)
+    if data is None:
+        # Fallback: best-ranked full-text match on title, description or category
+        item = search_items(Item.objects.filter(is_sold=False), barcode).order_by('search_rank').first()
+        if not item:
+            return Response({}, status=404)
+        data = ItemSerializer(item).data
+
+    return Response(data)
+
+
+BATCH_LOOKUP_LIMIT = 100
+
+
+@api_view(['POST'])
+def api_lookup_batch(request):
+    """Resolves many scanned barcodes in one round trip.
+
+    Body: ``{"barcodes": ["4006381333931", ...]}``. Response maps every
+    requested code to its unsold item, or null when nothing matches.
+    """
+    codes, error = _batch_codes(request.data)
+    if error:
+        return Response({'error': error}, status=400)
+
+    found = lookup_barcodes(codes)
+    return Response(_batch_results(codes, found))
+
+
+def _batch_codes(data):
+    """``(codes, error)`` from a batch lookup body."""
+    codes = data.get('barcodes') if hasattr(data, 'get') else None
+    if not isinstance(codes, list) or not all(isinstance(c, (str, int)) for c in codes):
+        return None, 'Provide a "barcodes" list'
+    if len(codes) > BATCH_LOOKUP_LIMIT:
+        return None, f'At most {BATCH_LOOKUP_LIMIT} barcodes per request'
+    return codes, None
+
+
+def _batch_results(codes, found):
+    return {'results': {str(code): found.get(normalize_barcode(code)) for code in codes}}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def api_item_import(request):
+    """Bulk-creates or updates the caller's items from an uploaded file.
+
+    Multipart body: ``file`` (CSV with a header row, or JSON Lines) and an
+    optional ``format`` of csv or jsonl when the file name does not tell.
+    Rows are upserted on barcode; see ``market.imports`` for the columns.
+    The response counts created and updated items and lists row errors.
+    Unreadable input answers 400 with ``error`` and the counts of what was
+    imported before it.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload a "file"'}, status=400)
+    fmt = request.data.get('format') or detect_format(upload.name)
+    if fmt not in ('csv', 'jsonl'):
+        return Response({'error': 'Format must be csv or jsonl'}, status=400)
+
+    report = import_items(decode_lines(upload), fmt, request.user)
+    return Response(report.as_dict(), status=400 if report.error else 200)
+
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def export_items(request):
+    """Streams the catalog for partners as CSV or NDJSON.
+
+    ``output`` is csv (default) or ndjson, ``compress=gzip`` gzips the
+    stream, ``updated_since`` (ISO date or datetime) limits it to recent
+    changes and ``include_sold=1`` adds sold items. This is a plain Django
+    view because DRF reserves the ``format`` parameter for its renderers.
+    """
+    fmt = request.GET.get('output', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'output must be csv or ndjson'}, status=400)
+    try:
+        updated_since = parse_updated_since(request.GET.get('updated_since'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    compress = request.GET.get('compress') == 'gzip'
+
+    chunks = export_chunks(fmt, updated_since, request.GET.get('include_sold') == '1', compress)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+    filename = f'catalog.{fmt}'
+    if compress:
+        # A download of a .gz file, not a transfer encoding the client should undo
+        response['Content-Type'] = 'application/gzip'
+        filename += '.gz'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Async API. Same contracts as the DRF endpoints above, written against the
+# async ORM so they can be served from core.asgi without tying up a worker
+# thread per request. DRF views are sync-only, so these are plain Django views.
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+@require_GET
+async def api_item_list_async(request):
+    """Async ``api_item_list``: keyset pages with ``cursor``, ``page_size``, ``sort`` and ``fields``.
+
+    Streaming and ETag revalidation stay on the sync endpoint.
+    """
+    paginator = KeysetPagination(ordering=_item_ordering(request))
+    page = await paginator.apaginate_queryset(Item.objects.filter(is_sold=False), request)
+    # The serializer only reads loaded columns, so it is safe on the event loop
+    serializer = ItemSerializer(page, many=True, fields=_requested_fields(request))
+    return _json(paginator.get_paginated_data(serializer.data))
+
+
+@require_GET
+async def api_lookup_async(request):
+    """Async ``api_lookup_by_barcode``."""
+    barcode = request.GET.get('barcode') or request.GET.get('q')
+    if not barcode:
+        return _json({'error': 'Provide barcode or q parameter'}, status=400)
+
+    data = await alookup_barcode(barcode)
+    if data is None:
+        item = await search_items(Item.objects.filter(is_sold=False), barcode).order_by('search_rank').afirst()
+        if not item:
+            return _json({}, status=404)
+        data = ItemSerializer(item).data
+    return _json(data)
+
+
+@csrf_exempt
+@require_POST
+async def api_lookup_batch_async(request):
+    """Async ``api_lookup_batch``; takes the same JSON body."""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return _json({'error': 'Body must be JSON'}, status=400)
+    codes, error = _batch_codes(data)
+    if error:
+        return _json({'error': error}, status=400)
+
+    found = await alookup_barcodes(codes)
+    return _json(_batch_results(codes, found))
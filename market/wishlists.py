@@ -0,0 +1,105 @@
+"""Cached wishlist membership for drawing hearts on item cards.
+
+Each user's wishlisted item ids are kept in the cache backend as a sorted
+``array('Q')`` (8 bytes per id). Membership checks for the items on a page
+are binary searches, so browse/detail/index need no wishlist query.
+
+The array is stored under a per-user generation, a random token in its
+own cache key, and rebuilt from the database on a miss. Committed wishlist
+saves and deletes (``toggle_wishlist``, admin, cascades) replace the token
+through ``market.signals`` instead of patching the array, so two toggles at
+once cannot lose one, and a rebuild that read the database before a toggle
+committed lands under the old token, which no reader asks for any more.
+Configure with ``MARKET_WISHLIST_CACHE`` (``CACHE`` alias and ``TIMEOUT``).
+"""
+import uuid
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.routers import read_from_primary
+
+from .models import Wishlist
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'MARKET_WISHLIST_CACHE', {})}
+
+
+def _generation_key(user_id):
+    return f'market:wishlist:generation:{user_id}'
+
+
+def _generation(cache, user_id, timeout):
+    generation = cache.get(_generation_key(user_id))
+    if generation is None:
+        cache.add(_generation_key(user_id), uuid.uuid4().hex, timeout)
+        generation = cache.get(_generation_key(user_id))
+    return generation
+
+
+def _key(user_id, generation):
+    return f'market:wishlist:{user_id}:{generation}'
+
+
+def _contains(ids, item_id):
+    i = bisect_left(ids, item_id)
+    return i < len(ids) and ids[i] == item_id
+
+
+def _load(data):
+    ids = array('Q')
+    ids.frombytes(data)
+    return ids
+
+
+def get_wishlist_ids(user_id):
+    """Sorted ``array`` of the user's wishlisted item ids (cached)."""
+    options = _options()
+    cache = caches[options['CACHE']]
+    # The generation is read before the rows, so a toggle committing in between retires this entry
+    generation = _generation(cache, user_id, options['TIMEOUT'])
+    data = cache.get(_key(user_id, generation)) if generation else None
+    if data is not None:
+        return _load(data)
+    # From the primary: a lagging replica would cache a list without the latest toggle
+    with read_from_primary():
+        ids = array('Q', Wishlist.objects.filter(user_id=user_id).order_by('item_id').values_list('item_id', flat=True))
+    if generation:
+        cache.set(_key(user_id, generation), ids.tobytes(), options['TIMEOUT'])
+    return ids
+
+
+def wishlisted_among(user, item_ids):
+    """The subset of ``item_ids`` the user has wishlisted; empty for anonymous users."""
+    if not user.is_authenticated:
+        return set()
+    ids = get_wishlist_ids(user.pk)
+    return {item_id for item_id in item_ids if _contains(ids, item_id)}
+
+
+def in_wishlist(user, item_id):
+    return bool(wishlisted_among(user, [item_id]))
+
+
+def mark_wishlisted(user, items):
+    """Sets ``item.is_wishlisted`` on each item for signed-in users (used by the card heart slot)."""
+    if not user.is_authenticated:
+        return items
+    wished = wishlisted_among(user, [item.pk for item in items])
+    for item in items:
+        item.is_wishlisted = item.pk in wished
+    return items
+
+
+def invalidate_wishlist(user_id):
+    """Retires the user's cached array; call after the wishlist change committed."""
+    options = _options()
+    caches[options['CACHE']].set(_generation_key(user_id), uuid.uuid4().hex, options['TIMEOUT'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from market.imports import detect_format, iter_rows
+from users.provisioning import BATCH_SIZE, provision_users
+
+
+class Command(BaseCommand):
+    help = 'Create or refresh user accounts and profiles in bulk from a CSV or JSON Lines export (SSO sync).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a .jsonl/.ndjson file; needs a username column')
+        parser.add_argument('--format', dest='fmt', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--group', action='append', default=[], help='Add every account to this group (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Accounts written per transaction (default: {BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        fmt = options['fmt'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                records = (row or {} for _, row in iter_rows(fh, fmt))
+                report = provision_users(records, options['group'], max(1, options['batch_size']))
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+        for number, message in report.errors[:50]:
+            self.stdout.write(self.style.WARNING(f'Record {number}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Provisioned {report.records} records in {report.elapsed:.1f}s ({report.records_per_second:.0f}/s): '
+            f'{report.created} created, {report.updated} updated, {len(report.errors)} rejected.'
+        ))
@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+RECENT_REVIEWS = 3
+
+
+def backfill_seller_ratings(apps, schema_editor):
+    Review = apps.get_model('users', 'Review')
+    SellerRating = apps.get_model('users', 'SellerRating')
+    seller_ids = Review.objects.values_list('seller_id', flat=True).distinct()
+    for seller_id in seller_ids:
+        reviews = Review.objects.filter(seller_id=seller_id)
+        stats = reviews.aggregate(count=Count('id'), total=Sum('rating'))
+        histogram = dict(reviews.values('rating').annotate(n=Count('id')).values_list('rating', 'n'))
+        SellerRating.objects.create(
+            seller_id=seller_id,
+            review_count=stats['count'] or 0,
+            rating_total=stats['total'] or 0,
+            recent_review_ids=list(reviews.order_by('-created_at', '-id').values_list('id', flat=True)[:RECENT_REVIEWS]),
+            **{f'stars_{stars}': histogram.get(stars, 0) for stars in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_review'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerRating',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('recent_review_ids', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_seller_ratings, migrations.RunPython.noop),
+    ]
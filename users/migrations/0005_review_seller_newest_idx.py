@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_sellerrating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['seller', 'created_at', 'id'], name='review_seller_newest_idx'),
+        ),
+    ]
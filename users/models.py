@@ -39,6 +39,61 @@ class Review(models.Model):
         # One review per buyer per seller
         unique_together = ('seller', 'reviewer')
         ordering = ['-created_at']
+        # The storefront's review feed, newest first with keyset pagination
+        indexes = [models.Index(fields=['seller', 'created_at', 'id'], name='review_seller_newest_idx')]
 
     def __str__(self):
-        return f"{self.reviewer.username} → {self.seller.username} ({self.rating}★)"
\ No newline at end of file
+        return f"{self.reviewer.username} → {self.seller.username} ({self.rating}★)"
+
+class SellerRating(models.Model):
+    """Denormalized rating summary for a seller, maintained from Review signals.
+
+    Lets every page show averages, counts and recent reviews without
+    aggregating over ``Review`` on each request.
+    """
+    RECENT_REVIEWS = 3
+
+    seller = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    # Histogram: number of reviews per star value
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    # Newest first, at most RECENT_REVIEWS ids
+    recent_review_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.seller.username}: {self.average} ({self.review_count})"
+
+    @property
+    def average(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_total / self.review_count, 2)
+
+    @property
+    def star_str(self):
+        """Simple star string (e.g. ★★★★☆ or ★★★½☆) for easy template rendering."""
+        return star_string(self.average)
+
+    @property
+    def histogram(self):
+        """List of (stars, count, percent) from 5 stars down to 1."""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'stars_{stars}')
+            percent = round(100 * count / self.review_count) if self.review_count else 0
+            rows.append((stars, count, percent))
+        return rows
+
+
+def star_string(avg):
+    avg = avg or 0
+    full = int(avg)
+    half = 1 if (avg - full) >= 0.5 else 0
+    empty = 5 - full - half
+    return '★' * full + ('½' if half else '') + '☆' * empty
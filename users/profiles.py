@@ -0,0 +1,19 @@
+"""Lazy profile creation.
+
+Profiles used to be created and re-saved from ``post_save`` on ``User``,
+which cost a profile write on every user save (each login updates
+``last_login``). Now a profile row exists only once something needs one:
+``get_profile`` creates it on first access, and bulk provisioning
+(``users.provisioning``) creates them in batches. Read-only pages treat a
+missing profile as an empty one.
+"""
+from .models import Profile
+
+
+def get_profile(user):
+    """The user's Profile, created on first access."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(user=user)
+        return profile
@@ -0,0 +1,113 @@
+"""Bulk account provisioning for the nightly SSO sync.
+
+``provision_users`` takes an iterable of account records (dicts with a
+``username`` and optionally ``email``, ``first_name``, ``last_name``,
+``location`` and ``bio``) and writes them in batches:
+
+- users are upserted on username with one ``bulk_create`` per batch, so
+  existing accounts get their SSO-owned fields refreshed and new ones are
+  created with an unusable password (they sign in through SSO);
+- missing profiles are created with a second ``bulk_create`` (existing
+  profiles are left alone; users may have edited them);
+- optional groups are added through the membership table directly.
+
+Bulk writes skip model signals, so the roles version is bumped once at
+the end (see users.roles) instead of once per membership.
+"""
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+
+from .models import Profile, User
+from .roles import invalidate_roles
+
+BATCH_SIZE = 1000
+# Columns the SSO directory owns; refreshed on every sync
+USER_FIELDS = ('email', 'first_name', 'last_name')
+PROFILE_FIELDS = ('location', 'bio')
+
+
+class ProvisioningReport:
+    """Counts, rejected records and timing of one provisioning run."""
+
+    def __init__(self):
+        self.records = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def records_per_second(self):
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+
+def _clean(record):
+    return {key: str(value).strip() for key, value in record.items() if value is not None}
+
+
+def _write_batch(batch, groups, report):
+    usernames = [record['username'] for record in batch]
+    with transaction.atomic():
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=record['username'],
+                    # Cheap: an unusable password is a random marker, not a hash
+                    password=make_password(None),
+                    **{name: record.get(name, '') for name in USER_FIELDS},
+                )
+                for record in batch
+            ],
+            update_conflicts=True, unique_fields=['username'], update_fields=USER_FIELDS,
+        )
+        Profile.objects.bulk_create(
+            [
+                Profile(user=user, **{name: record.get(name, '') for name in PROFILE_FIELDS})
+                for user, record in zip(users, batch)
+            ],
+            ignore_conflicts=True,
+        )
+        if groups:
+            Membership = User.groups.through
+            Membership.objects.bulk_create(
+                [Membership(user_id=user.pk, group_id=group.pk) for user in users for group in groups],
+                ignore_conflicts=True,
+            )
+    report.updated += len(existing)
+    report.created += len(batch) - len(existing)
+
+
+def provision_users(records, group_names=(), batch_size=BATCH_SIZE):
+    """Creates or refreshes accounts and profiles from ``records``; returns a ProvisioningReport."""
+    report = ProvisioningReport()
+    groups = [Group.objects.get_or_create(name=name)[0] for name in group_names]
+    batch = []
+    # Records are keyed on username; later duplicates would update the same row twice
+    seen = set()
+    for number, record in enumerate(records, start=1):
+        report.records += 1
+        record = _clean(record)
+        username = record.get('username')
+        if not username:
+            report.errors.append((number, 'Missing username'))
+            continue
+        if username in seen:
+            report.errors.append((number, f'Duplicate username {username}'))
+            continue
+        seen.add(username)
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _write_batch(batch, groups, report)
+            batch = []
+    if batch:
+        _write_batch(batch, groups, report)
+
+    if groups and (report.created or report.updated):
+        invalidate_roles()
+    report.elapsed = time.monotonic() - report.started
+    return report
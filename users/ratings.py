@@ -0,0 +1,97 @@
+"""Maintenance and lookup helpers for the SellerRating summary.
+
+Review signals (see users.signals) keep each seller's summary up to date
+inside the same transaction as the Review write, so pages read ratings
+from one row instead of aggregating reviews per request.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Review, SellerRating, star_string
+
+
+def _recent_review_ids(seller_id):
+    return list(
+        Review.objects.filter(seller_id=seller_id)
+        .order_by('-created_at', '-id')
+        .values_list('id', flat=True)[:SellerRating.RECENT_REVIEWS]
+    )
+
+
+def record_review_added(review):
+    with transaction.atomic():
+        summary, _ = SellerRating.objects.select_for_update().get_or_create(seller_id=review.seller_id)
+        SellerRating.objects.filter(pk=summary.pk).update(
+            review_count=F('review_count') + 1,
+            rating_total=F('rating_total') + review.rating,
+            recent_review_ids=([review.pk] + summary.recent_review_ids)[:SellerRating.RECENT_REVIEWS],
+            **{f'stars_{review.rating}': F(f'stars_{review.rating}') + 1},
+        )
+
+
+def record_review_removed(review):
+    with transaction.atomic():
+        summary = SellerRating.objects.select_for_update().filter(seller_id=review.seller_id).first()
+        if summary is None:
+            return
+        updates = {
+            'review_count': F('review_count') - 1,
+            'rating_total': F('rating_total') - review.rating,
+            f'stars_{review.rating}': F(f'stars_{review.rating}') - 1,
+        }
+        if review.pk in summary.recent_review_ids:
+            updates['recent_review_ids'] = _recent_review_ids(review.seller_id)
+        SellerRating.objects.filter(pk=summary.pk).update(**updates)
+
+
+def refresh_seller_rating(seller_id):
+    """Recomputes one seller's summary from scratch (used for edits and repairs)."""
+    stats = Review.objects.filter(seller_id=seller_id).aggregate(count=Count('id'), total=Sum('rating'))
+    histogram = dict(
+        Review.objects.filter(seller_id=seller_id)
+        .values('rating').annotate(n=Count('id')).values_list('rating', 'n')
+    )
+    with transaction.atomic():
+        SellerRating.objects.update_or_create(seller_id=seller_id, defaults={
+            'review_count': stats['count'] or 0,
+            'rating_total': stats['total'] or 0,
+            'recent_review_ids': _recent_review_ids(seller_id),
+            **{f'stars_{stars}': histogram.get(stars, 0) for stars in range(1, 6)},
+        })
+
+
+def get_seller_rating(user):
+    """Returns the user's SellerRating or None, using a select_related cache when present."""
+    try:
+        return user.rating_summary
+    except SellerRating.DoesNotExist:
+        return None
+
+
+def attach_seller_ratings(items, recent=True):
+    """Attaches seller rating attributes to items for template convenience.
+
+    Items should be fetched with ``select_related('seller__rating_summary')``;
+    recent reviews for all sellers are then loaded in a single query, so the
+    cost is constant regardless of how many items are passed in.
+    """
+    summaries = {}
+    for it in items:
+        if it.seller_id not in summaries:
+            summaries[it.seller_id] = get_seller_rating(it.seller)
+
+    recent_reviews = {}
+    if recent:
+        review_ids = [pk for s in summaries.values() if s for pk in s.recent_review_ids]
+        if review_ids:
+            recent_reviews = Review.objects.select_related('reviewer').in_bulk(review_ids)
+
+    for it in items:
+        summary = summaries[it.seller_id]
+        it.seller_avg_rating = summary.average if summary else 0
+        it.seller_review_count = summary.review_count if summary else 0
+        it.seller_star_str = summary.star_str if summary else star_string(0)
+        it.seller_recent_reviews = [
+            recent_reviews[pk] for pk in (summary.recent_review_ids if summary else []) if pk in recent_reviews
+        ]
+    return items
@@ -0,0 +1,92 @@
+"""Role (group membership) lookups for permission checks.
+
+A user's roles are their group names. ``get_roles`` loads them at most
+once per request and keeps them between requests in two places:
+
+- the session, next to the auth data the session middleware already
+  loaded, so browser requests pay nothing extra;
+- the cache (``USER_ROLES['CACHE']``), for clients without a session and
+  for the first request of a new session.
+
+Both copies are stamped with a global roles version held in the cache.
+Group membership changes (``m2m_changed`` on ``User.groups``) and group
+renames or deletions bump it (see users.signals), so stale copies are
+reloaded with one query the next time each user is checked. An evicted
+version is reseeded, never reused, so old session copies stay stale (see
+core.cache_versions). Use a cache shared between workers in production,
+as for the other version stamps.
+
+Staff users always hold the ``Admin`` role.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache_versions import bump_version, current_version
+from core.routers import read_from_primary
+
+VERSION_KEY = 'users:roles:version'
+SESSION_KEY = '_user_roles'
+ADMIN_ROLE = 'Admin'
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'TIMEOUT': 60 * 60,
+}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'USER_ROLES', {})}
+
+
+def _cache():
+    return caches[_options()['CACHE']]
+
+
+def invalidate_roles():
+    bump_version(_cache(), VERSION_KEY)
+
+
+def _load_roles(request):
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    cache = _cache()
+    version = current_version(cache, VERSION_KEY)
+    session = getattr(request, 'session', None)
+    if session is not None:
+        stored = session.get(SESSION_KEY)
+        if stored and stored[0] == version and stored[1] == user.pk:
+            return frozenset(stored[2])
+
+    key = f'users:roles:{version}:{user.pk}'
+    names = cache.get(key)
+    if names is None:
+        # From the primary, or a lagging replica could cache the old groups under the new version
+        with read_from_primary():
+            names = sorted(user.groups.values_list('name', flat=True))
+        cache.set(key, names, _options()['TIMEOUT'])
+    if session is not None:
+        session[SESSION_KEY] = [version, user.pk, names]
+    return frozenset(names)
+
+
+def get_roles(request):
+    """Frozenset of the request user's group names (``Admin`` included for staff)."""
+    roles = getattr(request, '_user_roles', None)
+    if roles is None:
+        roles = _load_roles(request)
+        if request.user.is_authenticated and request.user.is_staff:
+            roles |= {ADMIN_ROLE}
+        request._user_roles = roles
+    return roles
+
+
+def has_roles(request, any_of=(), all_of=()):
+    """True if the user holds at least one of ``any_of`` and every role in ``all_of``.
+
+    An empty ``any_of`` places no constraint.
+    """
+    roles = get_roles(request)
+    if any_of and roles.isdisjoint(any_of):
+        return False
+    return roles.issuperset(all_of)
@@ -1,13 +1,38 @@
-from django.db.models.signals import post_save
-from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.dispatch import receiver
-from .models import Profile
+from .models import Review
+from .ratings import record_review_added, record_review_removed, refresh_seller_rating
+from .roles import invalidate_roles
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+# Keep the denormalized SellerRating summary in step with reviews
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
     if created:
-        Profile.objects.create(user=instance)
+        record_review_added(instance)
+    else:
+        refresh_seller_rating(instance.seller_id)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    record_review_removed(instance)
+
+
+# Cached role names (users.roles) go stale when memberships or group names change.
+# Bump the version only once the change is visible, or a concurrent request
+# could cache the old roles under the new version.
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_roles_on_membership(sender, action, using, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_roles, using=using)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, using, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(invalidate_roles, using=using)
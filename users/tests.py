@@ -1,3 +1,196 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import Category, Item
+from .models import Profile, Review, SellerRating, User
+from .provisioning import provision_users
+from .roles import VERSION_KEY as ROLES_VERSION_KEY, invalidate_roles
+from .utils import role_required
+
+
+class SellerStorefrontTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Books', slug='books')
+        cls.small = cls.make_seller('small', items=2, reviews=1)
+        cls.large = cls.make_seller('large', items=40, reviews=30)
+        cls.visitor = User.objects.create_user(username='visitor', password='password123')
+
+    @classmethod
+    def make_seller(cls, username, items, reviews):
+        seller = User.objects.create_user(username=username, password='password123')
+        for i in range(items):
+            Item.objects.create(
+                seller=seller, category=cls.category, title=f'{username} item {i}',
+                description='For sale', price=Decimal(10 + i),
+            )
+        reviewers = User.objects.bulk_create([User(username=f'{username}-reviewer-{i}') for i in range(reviews)])
+        for i, reviewer in enumerate(reviewers):
+            # Review signals keep the SellerRating summary current
+            Review.objects.create(seller=seller, reviewer=reviewer, rating=i % 5 + 1, comment=f'Review {i}')
+        return seller
+
+    def storefront(self, seller, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('users:seller_profile', args=[seller.username]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_seller_size(self):
+        for login in (False, True):
+            with self.subTest(login=login):
+                if login:
+                    self.client.force_login(self.visitor)
+                _, small = self.storefront(self.small)
+                _, large = self.storefront(self.large)
+                self.assertEqual(small, large)
+
+    def test_items_and_reviews_page_independently(self):
+        response, _ = self.storefront(self.large)
+        items_page = response.context['items_page']
+        reviews_page = response.context['reviews_page']
+        self.assertTrue(items_page.has_next())
+        self.assertTrue(reviews_page.has_next())
+
+        response, _ = self.storefront(self.large, reviews_cursor=reviews_page.next_cursor)
+        self.assertEqual(
+            [item.pk for item in response.context['items']],
+            [item.pk for item in items_page.object_list],
+        )
+        seen = {review.pk for review in reviews_page.object_list}
+        self.assertTrue(seen.isdisjoint(review.pk for review in response.context['reviews']))
+
+    def test_histogram_and_totals_come_from_summaries(self):
+        response, _ = self.storefront(self.large)
+        self.assertEqual(response.context['review_count'], 30)
+        self.assertEqual(response.context['active_items'], 40)
+        self.assertEqual([count for _, count, _ in response.context['rating'].histogram], [6, 6, 6, 6, 6])
+
+
+class RatingSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(username='seller', password='password123')
+        cls.reviewers = User.objects.bulk_create([User(username=f'reviewer-{i}') for i in range(4)])
+
+    def summary(self):
+        return SellerRating.objects.get(seller=self.seller)
+
+    def test_summary_follows_review_add_edit_and_delete(self):
+        reviews = [
+            Review.objects.create(seller=self.seller, reviewer=reviewer, rating=rating, comment='ok')
+            for reviewer, rating in zip(self.reviewers, (5, 4, 4, 1))
+        ]
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.average), (4, 3.5))
+        self.assertEqual(summary.recent_review_ids, [reviews[3].pk, reviews[2].pk, reviews[1].pk])
+
+        reviews[1].rating = 2
+        reviews[1].save()
+        self.assertEqual([count for _, count, _ in self.summary().histogram], [1, 1, 0, 1, 1])
+
+        reviews[3].delete()
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_total), (3, 11))
+        self.assertEqual([count for _, count, _ in summary.histogram], [1, 1, 0, 1, 0])
+        # The deleted review drops out of the recent list, which refills from older ones
+        self.assertEqual(summary.recent_review_ids, [reviews[2].pk, reviews[1].pk, reviews[0].pk])
+
+
+@role_required('Support Agent')
+@role_required(any_of=['Billing', 'Support Agent'])
+def support_view(request):
+    return HttpResponse('ok')
+
+
+@role_required(all_of=['Support Agent', 'Billing'])
+def billing_support_view(request):
+    return HttpResponse('ok')
+
+
+@role_required('Admin')
+def admin_view(request):
+    return HttpResponse('ok')
+
+
+class RoleRequiredTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(username='agent', password='password123')
+        cls.support = Group.objects.create(name='Support Agent')
+        cls.billing = Group.objects.create(name='Billing')
+        cls.agent.groups.add(cls.support)
+
+    def setUp(self):
+        # Test rollbacks undo memberships without signals; start from a fresh version
+        invalidate_roles()
+        self.session = SessionStore()
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=(user or self.agent).pk)
+        request.session = self.session
+        return request
+
+    def test_stacked_checks_cost_no_queries_once_cached(self):
+        self.assertEqual(support_view(self.request()).status_code, 200)
+        first, second = self.request(), self.request()
+        with self.assertNumQueries(0):
+            self.assertEqual(support_view(first).status_code, 200)
+            self.assertEqual(billing_support_view(second).status_code, 403)
+
+    def test_membership_change_is_seen_on_next_request(self):
+        self.assertEqual(billing_support_view(self.request()).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.billing.user_set.add(self.agent)
+        self.assertEqual(billing_support_view(self.request()).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.agent.groups.remove(self.support)
+        # The version is bumped on commit, not inside the transaction
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(support_view(self.request()).status_code, 403)
+
+    def test_evicted_version_does_not_revive_session_roles(self):
+        cache.delete(ROLES_VERSION_KEY)
+        self.assertEqual(billing_support_view(self.request()).status_code, 403)
+        # A membership change whose bump was missed, then the version key is evicted
+        self.agent.groups.through.objects.create(user=self.agent, group=self.billing)
+        cache.delete(ROLES_VERSION_KEY)
+        self.assertEqual(billing_support_view(self.request()).status_code, 200)
+
+    def test_staff_count_as_admin(self):
+        self.assertEqual(admin_view(self.request()).status_code, 403)
+        staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        self.assertEqual(admin_view(self.request(staff)).status_code, 200)
+
+
+class ProvisioningTests(TestCase):
+
+    def test_provision_creates_then_refreshes_accounts(self):
+        records = [{'username': f'sso{i}', 'email': f'sso{i}@example.com', 'location': 'Lagos'} for i in range(5)]
+        report = provision_users(records, group_names=['Customer'], batch_size=2)
+        self.assertEqual((report.created, report.updated), (5, 0))
+        self.assertEqual(Profile.objects.filter(location='Lagos').count(), 5)
+        self.assertEqual(User.objects.filter(groups__name='Customer').count(), 5)
+        self.assertFalse(User.objects.get(username='sso0').has_usable_password())
+
+        report = provision_users([{'username': 'sso0', 'email': 'new@example.com'}, {'email': 'x@example.com'}])
+        self.assertEqual((report.created, report.updated, len(report.errors)), (0, 1, 1))
+        self.assertEqual(User.objects.get(username='sso0').email, 'new@example.com')
+
+    def test_user_save_does_not_write_profile(self):
+        user = User.objects.create_user(username='plain', password='password123')
+        self.assertFalse(Profile.objects.filter(user=user).exists())
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
@@ -1,22 +1,34 @@
 from functools import wraps
 from django.http import HttpResponseForbidden
 
+from .roles import has_roles
 
-def role_required(role_name):
+
+def role_required(role_name=None, *, any_of=(), all_of=()):
     """Decorator to require a user to be in a given group/role.
 
     Usage:
         @role_required('Support Agent')
         def my_view(request):
             ...
+
+        @role_required(any_of=['Support Agent', 'Admin'])
+        @role_required(all_of=['Support Agent', 'Billing'])
+
+    Roles are resolved through ``users.roles``, so stacked checks cost no
+    queries once the user's roles are cached. Staff users count as Admin.
     """
+    any_of = tuple(any_of) + ((role_name,) if role_name else ())
+    all_of = tuple(all_of)
+    if not any_of and not all_of:
+        raise ValueError('role_required needs a role name, any_of or all_of')
+
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped(request, *args, **kwargs):
-            user = request.user
-            if not user.is_authenticated:
+            if not request.user.is_authenticated:
                 return HttpResponseForbidden('Authentication required')
-            if user.groups.filter(name=role_name).exists() or (role_name == 'Admin' and user.is_staff):
+            if has_roles(request, any_of=any_of, all_of=all_of):
                 return view_func(request, *args, **kwargs)
             return HttpResponseForbidden('Permission denied')
         return _wrapped
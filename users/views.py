@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg
-from .models import User, Profile, Review
+from .models import User, Review
 from .forms import SignupForm, ProfileForm, ReviewForm
+from .profiles import get_profile
+from .ratings import get_seller_rating
+from market.pagination import CursorPaginator, ITEM_ORDERINGS
+from market.stats import get_seller_stats
 
 
 def signup(request):
@@ -25,7 +28,7 @@ def logout_view(request):
 
 @login_required
 def edit_profile(request):
-    profile, created = Profile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
         if form.is_valid():
@@ -36,14 +39,31 @@ def edit_profile(request):
     return render(request, 'users/edit_profile.html', {'form': form})
 
 
-def seller_profile(request, username):
-    seller = get_object_or_404(User, username=username)
-    items = seller.items.filter(is_sold=False)
-    reviews = seller.reviews_received.all()
+STOREFRONT_ITEMS_PER_PAGE = 12
+STOREFRONT_REVIEWS_PER_PAGE = 10
 
-    # Calculate average rating
-    avg_rating = reviews.aggregate(avg=Avg('rating'))['avg']
-    avg_rating = round(avg_rating, 1) if avg_rating else None
+
+def seller_profile(request, username):
+    # Profile, rating summary and listing totals come with the seller row
+    seller = get_object_or_404(
+        User.objects.select_related('profile', 'rating_summary', 'market_stats'), username=username,
+    )
+
+    # Items and reviews page independently, each with its own cursor parameter
+    items_page = CursorPaginator(
+        seller.items.filter(is_sold=False).select_related('category'),
+        ITEM_ORDERINGS['newest'], STOREFRONT_ITEMS_PER_PAGE,
+    ).page(request.GET.get('items_cursor'))
+    reviews_page = CursorPaginator(
+        seller.reviews_received.select_related('reviewer'),
+        ('-created_at', '-id'), STOREFRONT_REVIEWS_PER_PAGE,
+    ).page(request.GET.get('reviews_cursor'))
+
+    # Average, count and histogram come from the precomputed summaries
+    rating = get_seller_rating(seller)
+    review_count = rating.review_count if rating else 0
+    avg_rating = round(rating.average, 1) if review_count else None
+    stats = get_seller_stats(seller)
 
     # Check if the current user has already left a review
     user_review = None
@@ -58,8 +78,13 @@ def seller_profile(request, username):
 
     return render(request, 'users/seller_profile.html', {
         'seller': seller,
-        'items': items,
-        'reviews': reviews,
+        'items': items_page.object_list,
+        'items_page': items_page,
+        'active_items': stats.active_items,
+        'reviews': reviews_page.object_list,
+        'reviews_page': reviews_page,
+        'rating': rating,
+        'review_count': review_count,
         'avg_rating': avg_rating,
         'review_form': review_form,
         'can_review': can_review,